@@ -1,10 +1,22 @@
+import hashlib
 import os
+import time
+
 import jwt
-from fastapi import Request, HTTPException
+from cryptography.hazmat.primitives.serialization import load_pem_public_key
+from fastapi import Depends, Request, HTTPException
 from dotenv import load_dotenv
 
+from services.cache import TTLCache
+
 load_dotenv()
 
+# We allow a small 'leeway' for clock differences between servers
+LEEWAY = 10
+
+# Verified tokens are remembered (by SHA-256) until their `exp`
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+
 # ---------------------------------------------------------
 # 1. Load and Format the Public Key
 # ---------------------------------------------------------
@@ -17,16 +29,72 @@ else:
     print("⚠️ WARNING: CLERK_PEM_PUBLIC_KEY is missing in .env")
     PUBLIC_KEY = None
 
+
+def _load_key(pem):
+    # Parsing the PEM is a good part of a jwt.decode call; do it once
+    if not pem:
+        return None
+    try:
+        return load_pem_public_key(pem.encode())
+    except ValueError as e:
+        print(f"⚠️ WARNING: CLERK_PEM_PUBLIC_KEY could not be parsed: {e}")
+        return None
+
+
+VERIFY_KEY = _load_key(PUBLIC_KEY)
+
+claims_cache = TTLCache(max_size=AUTH_CACHE_SIZE)
+
+
+def set_public_key(pem: str):
+    """Swap the verification key (key rotation); forgets every cached token."""
+    global PUBLIC_KEY, VERIFY_KEY
+    PUBLIC_KEY = pem
+    VERIFY_KEY = _load_key(pem)
+    claims_cache.clear()
+
+
+def verify_token(token: str) -> dict:
+    """User dict for a valid RS256 token; raises jwt.InvalidTokenError otherwise."""
+    key = hashlib.sha256(token.encode()).digest()
+    user = claims_cache.get(key)
+    if user is not None:
+        return dict(user)
+
+    payload = jwt.decode(token, VERIFY_KEY, algorithms=["RS256"], leeway=LEEWAY)
+
+    # We map Clerk's 'sub' (Subject ID) to our database '_id' concept
+    user = {
+        "_id": payload.get("sub"),
+        "email": payload.get("email", "")
+    }
+
+    # Tokens without an expiry are verified every time
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)) and exp > time.time():
+        claims_cache.set(key, user, ttl=exp - time.time())
+    return dict(user)
+
+
 # ---------------------------------------------------------
 # 2. The Main Auth Function
 # ---------------------------------------------------------
 async def get_current_user_optional(request: Request):
     """
-    Checks the 'Authorization' header. 
+    Checks the 'Authorization' header.
     - If valid token: Returns user dict (with '_id' and 'email').
     - If no token or invalid: Returns None (does not block the user).
+    The result is kept on request.state, so later calls in the same
+    request are free.
     """
-    
+    if hasattr(request.state, "user"):
+        return request.state.user
+
+    request.state.user = _resolve_user(request)
+    return request.state.user
+
+
+def _resolve_user(request: Request):
     # 1. Get the header
     auth_header = request.headers.get("Authorization")
     if not auth_header:
@@ -37,19 +105,24 @@ async def get_current_user_optional(request: Request):
         scheme, token = auth_header.split()
         if scheme.lower() != "bearer":
             return None
-        
-        # 3. Verify Token using the Public Key
-        # We allow a small 'leeway' for clock differences between servers
-        payload = jwt.decode(token, PUBLIC_KEY, algorithms=["RS256"], leeway=10)
-
-        # 4. Return User Info
-        # We map Clerk's 'sub' (Subject ID) to our database '_id' concept
-        return {
-            "_id": payload.get("sub"),
-            "email": payload.get("email", "")
-        }
+
+        # 3. Verify Token using the Public Key (cached until it expires)
+        return verify_token(token)
 
     except (jwt.ExpiredSignatureError, jwt.DecodeError, Exception) as e:
         # If token is invalid, just treat them as a guest (don't crash)
         print(f"Auth Error: {str(e)}")
-        return None
\ No newline at end of file
+        return None
+
+
+async def require_user(request: Request):
+    # Security Check: If not logged in, reject access
+    user = await get_current_user_optional(request)
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return user
+
+
+# Route parameters: `user: Optional[dict] = OptionalUser` / `user: dict = RequiredUser`
+OptionalUser = Depends(get_current_user_optional)
+RequiredUser = Depends(require_user)
@@ -0,0 +1,113 @@
+# ================================================================
+#  BENCHMARK: Auth overhead per request
+#   legacy   jwt.decode(token, <PEM string>) on every call, and every
+#            route called it again after its LLM call
+#   parsed   jwt.decode with the key object parsed once at startup
+#   cached   verify_token(): verified claims cached by token hash
+#            until the token's exp
+#  Then end to end: N authenticated GET /api/history/get requests
+#  with the claims cache cleared before each one vs kept warm.
+#  Also checks that expired, tampered and re-keyed tokens are still
+#  rejected with the cache on.
+#
+#  Run:  python benchmarks/bench_auth.py [CALLS] [REQUESTS]
+# ================================================================
+
+import asyncio
+import statistics
+import sys
+import time
+
+import stubs
+import httpx
+import jwt
+
+import auth_utils
+from main import app
+from services.history_service import ensure_history_indexes
+
+
+def per_call(fn, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls
+
+
+async def route_latency(client, headers, requests: int, cold: bool):
+    times = []
+    for _ in range(requests):
+        if cold:
+            auth_utils.claims_cache.clear()
+        start = time.perf_counter()
+        r = await client.get("/api/history/get", params={"limit": 5}, headers=headers)
+        times.append(time.perf_counter() - start)
+        assert r.status_code == 200, r.text
+    return statistics.median(times)
+
+
+def check_rejections(token):
+    raw = token("student")[len("Bearer "):]
+    auth_utils.verify_token(raw)  # cached now
+
+    header, payload, signature = raw.split(".")
+    tampered = ".".join([header, payload, signature[:-4] + ("AAAA" if signature[-4:] != "AAAA" else "BBBB")])
+    try:
+        auth_utils.verify_token(tampered)
+        raise AssertionError("tampered token accepted")
+    except jwt.InvalidTokenError:
+        pass
+
+    expired = token("student", ttl=-60)[len("Bearer "):]
+    try:
+        auth_utils.verify_token(expired)
+        raise AssertionError("expired token accepted")
+    except jwt.ExpiredSignatureError:
+        pass
+
+    # Key rotation forgets every cached token
+    stubs.install_test_auth()
+    try:
+        auth_utils.verify_token(raw)
+        raise AssertionError("token signed by the old key accepted")
+    except jwt.InvalidTokenError:
+        pass
+
+
+async def main(calls: int, requests: int):
+    token = stubs.install_test_auth()
+    stubs.install_memory_mongo(latency=0.0)
+    await ensure_history_indexes()
+    bearer = token("student")
+    raw = bearer[len("Bearer "):]
+    pem = auth_utils.PUBLIC_KEY
+
+    legacy = per_call(lambda: jwt.decode(raw, pem, algorithms=["RS256"], leeway=10), calls)
+    parsed = per_call(lambda: jwt.decode(raw, auth_utils.VERIFY_KEY, algorithms=["RS256"], leeway=10), calls)
+    auth_utils.verify_token(raw)
+    cached = per_call(lambda: auth_utils.verify_token(raw), calls)
+
+    print(f"auth cost per call ({calls} calls)")
+    print(f"  legacy  decode with PEM string : {legacy * 1e6:>8.1f} µs")
+    print(f"  parsed  decode with key object : {parsed * 1e6:>8.1f} µs")
+    print(f"  cached  verified-claims hit    : {cached * 1e6:>8.1f} µs  ({legacy / cached:.0f}x faster than legacy)")
+
+    headers = {"Authorization": bearer}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        await route_latency(client, headers, 5, cold=False)  # warm-up
+        cold = await route_latency(client, headers, requests, cold=True)
+        warm = await route_latency(client, headers, requests, cold=False)
+
+    print(f"\nGET /api/history/get, median of {requests} requests")
+    print(f"  claims cache cleared each time : {cold * 1000:>8.2f} ms")
+    print(f"  claims cache warm              : {warm * 1000:>8.2f} ms")
+    print(f"  cache: {auth_utils.claims_cache.stats()}")
+
+    check_rejections(token)
+    print("✅ tampered, expired and old-key tokens are still rejected")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000,
+                     int(sys.argv[2]) if len(sys.argv) > 2 else 200))
@@ -0,0 +1,73 @@
+# ================================================================
+#  BENCHMARK: Concurrent LLM requests on one worker
+#  Fires N concurrent /api/study/* requests at the real FastAPI app
+#  against a slow stub model. With the async LLM path, the batch
+#  finishes in roughly the time of a single completion.
+#
+#  Run:  python benchmarks/bench_concurrency.py [N] [LATENCY_SECONDS]
+# ================================================================
+
+import asyncio
+import sys
+import time
+
+import stubs  # noqa: F401  (sets env + sys.path before app import)
+import httpx
+
+from main import app
+
+ROUTES = [
+    ("/api/study/explain", {"topic": "Photosynthesis"}),
+    ("/api/study/make-notes", {"text": "Plants convert light into energy."}),
+    ("/api/study/make-mcq", {"text": "Plants convert light into energy.", "num_questions": 5}),
+    ("/api/study/summarize-text", {"text": "Plants convert light into energy."}),
+    ("/api/study/qna", {"text": "Plants convert light into energy.", "question": "What do plants convert?"}),
+    ("/api/study/make-mindmap", {"text": "Plants convert light into energy."}),
+    ("/api/study/make-flashcards", {"text": "Plants convert light into energy."}),
+]
+
+
+async def main(n: int, latency: float):
+    fake = stubs.install_fake_llm(latency=latency)
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        # Single request baseline
+        start = time.perf_counter()
+        r = await client.post(ROUTES[0][0], json=ROUTES[0][1])
+        single = time.perf_counter() - start
+        assert r.status_code == 200, r.text
+
+        # N concurrent requests spread across every LLM route, plus a
+        # health check that must not wait behind them.
+        async def health():
+            await asyncio.sleep(latency / 4)
+            t0 = time.perf_counter()
+            await client.get("/")
+            return time.perf_counter() - t0
+
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(client.post(ROUTES[i % len(ROUTES)][0], json=ROUTES[i % len(ROUTES)][1]) for i in range(n)),
+            health(),
+        )
+        batch = time.perf_counter() - start
+        health_latency = results[-1]
+
+    failures = [r for r in results[:-1] if r.status_code != 200 or "error" in r.json()]
+
+    print(f"stub latency        : {latency:.2f}s")
+    print(f"single request      : {single:.3f}s")
+    print(f"{n:>3} concurrent      : {batch:.3f}s ({batch / single:.2f}x single)")
+    print(f"peak in-flight LLM  : {fake.max_in_flight}")
+    print(f"GET / during batch  : {health_latency * 1000:.1f}ms")
+    print(f"failures            : {len(failures)}")
+
+    if failures or batch > single * 2:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+    asyncio.run(main(n, latency))
@@ -0,0 +1,58 @@
+# ================================================================
+#  BENCHMARK: PDF extraction cache
+#  Uploads a synthetic course PDF to /api/documents/upload
+#   1. first time (every page parsed);
+#   2. again, unchanged (served from the file-hash entry, no parsing);
+#   3. with a few pages edited (only those pages parsed).
+#  Prints upload time and the cache's hit ratios after each step.
+#
+#  Run:  python benchmarks/bench_extraction_cache.py [PAGES] [EDITED_PAGES]
+# ================================================================
+
+import asyncio
+import sys
+import time
+
+import stubs
+import httpx
+
+from main import app
+from services.extraction_cache import extraction_cache
+
+
+async def upload(client, data: bytes):
+    start = time.perf_counter()
+    r = await client.post("/api/documents/upload", files={"file": ("course.pdf", data, "application/pdf")})
+    assert r.status_code == 200, r.text
+    return time.perf_counter() - start, r.json()
+
+
+async def main(pages: int, edited_pages: int):
+    stubs.install_fake_llm()
+    original = stubs.make_pdf(pages)
+    edits = {i * (pages // edited_pages): f"Chapter X\nRevised page {i}." for i in range(edited_pages)}
+    edited = stubs.make_pdf(pages, overrides=edits)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+        print(f"{'upload':<28}{'time':>8}{'doc hits':>10}{'page hits':>11}{'page misses':>13}")
+        results = {}
+        for label, data in (("first upload", original),
+                            ("re-upload (same file)", original),
+                            (f"re-upload ({edited_pages} pages edited)", edited)):
+            elapsed, doc = await upload(client, data)
+            results[label] = (elapsed, doc)
+            s = extraction_cache.stats()
+            print(f"{label:<28}{elapsed:>7.2f}s{s['doc_hits']:>10}{s['page_hits']:>11}{s['page_misses']:>13}")
+
+        first, cached = results["first upload"], results["re-upload (same file)"]
+        assert first[1]["doc_id"] == cached[1]["doc_id"], "cached pages must give the same document"
+
+        stats = (await client.get("/api/pdf/stats")).json()["extraction_cache"]
+    print(f"speedup on re-upload: {first[0] / cached[0]:.1f}x")
+    print(f"cache stats: {stats}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 300,
+                     int(sys.argv[2]) if len(sys.argv) > 2 else 3))
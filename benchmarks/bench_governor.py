@@ -0,0 +1,59 @@
+# ================================================================
+#  BENCHMARK: LLM admission control under an exam-week spike
+#  Fires a burst of requests at /api/study/explain with a small
+#  in-flight cap and queue, and checks that:
+#  - the provider never sees more than max_in_flight calls,
+#  - queued requests complete, the overflow gets a fast 429 with
+#    Retry-After instead of a provider failure.
+#
+#  Run:  python benchmarks/bench_governor.py [BURST] [MAX_IN_FLIGHT] [MAX_QUEUE]
+# ================================================================
+
+import asyncio
+import sys
+import time
+from collections import Counter
+
+import stubs
+import httpx
+
+from main import app
+from services.llm_governor import llm_governor
+
+
+async def main(burst: int, max_in_flight: int, max_queue: int):
+    fake = stubs.install_fake_llm(latency=0.5)
+    llm_governor.max_in_flight = max_in_flight
+    llm_governor.max_queue = max_queue
+    llm_governor.queue_timeout = 3.0
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+
+        async def one(i):
+            start = time.perf_counter()
+            r = await client.post("/api/study/explain", json={"topic": f"Topic {i}"})
+            return r, time.perf_counter() - start
+
+        results = await asyncio.gather(*(one(i) for i in range(burst)))
+        stats = (await client.get("/api/llm/stats")).json()["governor"]
+
+    statuses = Counter(r.status_code for r, _ in results)
+    shed = [t for r, t in results if r.status_code == 429]
+    served = [t for r, t in results if r.status_code == 200]
+    retry_after = {r.headers.get("retry-after") for r, _ in results if r.status_code == 429}
+
+    print(f"burst                : {burst} requests, cap {max_in_flight} in flight, queue {max_queue}")
+    print(f"status codes         : {dict(statuses)}")
+    print(f"provider peak        : {fake.max_in_flight} concurrent calls")
+    print(f"served latency (max) : {max(served):.2f}s" if served else "served: none")
+    print(f"429 latency (max)    : {max(shed) * 1000:.1f}ms, Retry-After {sorted(retry_after)}" if shed else "429: none")
+    print(f"governor stats       : {stats}")
+
+    if fake.max_in_flight > max_in_flight:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]] + [None] * 3
+    asyncio.run(main(args[0] or 100, args[1] or 4, args[2] or 20))
@@ -0,0 +1,99 @@
+# ================================================================
+#  BENCHMARK: Concurrent history reads, sync vs async Mongo access
+#  N signed-in users hit GET /api/history/get at once against an
+#  in-memory Mongo stand-in with a fixed round-trip latency.
+#   legacy  the old handler: sync pymongo-style cursor iterated
+#           inside `async def` (blocks the event loop per round trip)
+#   async   the current handler on the AsyncMongoClient API
+#  With a blocking driver the requests serialize (~N x RTT); with the
+#  async driver they overlap (~1 x RTT).
+#
+#  Run:  python benchmarks/bench_history_async.py [USERS] [RTT_MS]
+# ================================================================
+
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import stubs
+import httpx
+from fastapi import FastAPI, HTTPException, Request
+
+from main import app
+from auth_utils import get_current_user_optional
+from services.history_service import save_history
+
+
+def seed(collection, users):
+    start = datetime.now(timezone.utc)
+    for u in range(users):
+        for i in range(60):
+            collection.docs.append({
+                "_id": f"{u}-{i}",
+                "user_id": f"user_{u}",
+                "type": "notes",
+                "input": {"text": "..."},
+                "result": {"title": f"Notes {i}"},
+                "created_at": start - timedelta(minutes=i),
+            })
+
+
+def legacy_app(collection):
+    """The pre-async handler, verbatim apart from the collection."""
+    legacy = FastAPI()
+
+    @legacy.get("/api/history/get")
+    async def get_user_history(req: Request):
+        user = await get_current_user_optional(req)
+        if not user:
+            raise HTTPException(status_code=401, detail="Not authenticated")
+        cursor = collection.find({"user_id": user["_id"]}).sort("created_at", -1).limit(50)
+        history_list = []
+        for doc in cursor:
+            doc["_id"] = str(doc["_id"])
+            history_list.append(doc)
+        return {"history": history_list}
+
+    return legacy
+
+
+async def burst(target_app, headers):
+    transport = httpx.ASGITransport(app=target_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        start = time.perf_counter()
+        responses = await asyncio.gather(*(client.get("/api/history/get", headers=h) for h in headers))
+        elapsed = time.perf_counter() - start
+    assert all(r.status_code == 200 and len(r.json()["history"]) == 50 for r in responses)
+    return elapsed
+
+
+async def main(users: int, rtt_ms: float):
+    token = stubs.install_test_auth()
+    headers = [{"Authorization": token(f"user_{u}")} for u in range(users)]
+    latency = rtt_ms / 1000
+
+    blocking = stubs.BlockingMemoryCollection(latency)
+    seed(blocking, users)
+    collections = stubs.install_memory_mongo(latency)
+    seed(collections["history"], users)
+
+    print(f"{users} concurrent history reads, {rtt_ms:.0f} ms per Mongo round trip")
+    print(f"{'driver':<10}{'time':>9}{'max concurrent round trips':>30}")
+    legacy_time = await burst(legacy_app(blocking), headers)
+    print(f"{'legacy':<10}{legacy_time:>8.2f}s{1:>30}")
+    async_time = await burst(app, headers)
+    print(f"{'async':<10}{async_time:>8.2f}s{collections['history'].max_in_flight:>30}")
+    print(f"speedup: {legacy_time / async_time:.1f}x")
+
+    history = collections["history"]
+    before = history.round_trips
+    start = time.perf_counter()
+    await asyncio.gather(*(save_history(f"user_{u}", "notes", {"text": "x"}, {"title": "t"}) for u in range(users)))
+    print(f"{users} concurrent save_history: {time.perf_counter() - start:.2f}s, "
+          f"{history.round_trips - before} round trips")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 50,
+                     float(sys.argv[2]) if len(sys.argv) > 2 else 20))
@@ -0,0 +1,74 @@
+# ================================================================
+#  BENCHMARK: History write-behind buffer
+#  N signed-in requests to /api/study/explain each save one history
+#  record. Counts Mongo round trips on the history collection:
+#   legacy  one insert_one per request          -> N round trips
+#   batched insert_many from the write buffer   -> ~N / batch size
+#  Then floods a tiny buffer in front of a slow Mongo to show
+#  backpressure and the dropped-record metric.
+#
+#  Run:  python benchmarks/bench_history_batching.py [REQUESTS] [BATCH_SIZE]
+# ================================================================
+
+import asyncio
+import math
+import sys
+import time
+
+import stubs
+import httpx
+
+from main import app
+from services.history_service import history_writer, save_history
+
+
+async def requests(client, token, n):
+    start = time.perf_counter()
+    responses = await asyncio.gather(*(
+        client.post("/api/study/explain", json={"topic": f"Topic {i % 10}"},
+                    headers={"Authorization": token(f"user_{i % 25}")})
+        for i in range(n)
+    ))
+    assert all(r.status_code == 200 for r in responses)
+    return time.perf_counter() - start
+
+
+async def main(n: int, batch_size: int):
+    stubs.install_fake_llm(latency=0.01)
+    token = stubs.install_test_auth()
+    history = stubs.install_memory_mongo(latency=0.005)["history"]
+    history_writer.batch_size = batch_size
+    history_writer.flush_interval = 0.2
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        elapsed = await requests(client, token, n)
+        await history_writer.close()
+
+    print(f"{n} requests in {elapsed:.2f}s, batch size {batch_size}")
+    print(f"{'writer':<10}{'round trips':>13}{'records':>10}")
+    print(f"{'legacy':<10}{n:>13}{n:>10}")
+    # Slack: a timed flush may send a partial batch once per interval,
+    # and close() flushes what is left
+    slack = math.ceil(elapsed / history_writer.flush_interval) + 1
+    expected = math.ceil(n / batch_size)
+    print(f"{'batched':<10}{history.round_trips:>13}{len(history.docs):>10}"
+          f"   (expected ~{expected}, at most {expected + slack})")
+    assert len(history.docs) == n, "every record must be written"
+    assert history.round_trips <= expected + slack, f"{history.round_trips} round trips for {n} records"
+    print(f"writer stats: {history_writer.stats()}")
+
+    # Overload: 20-record buffer, 0.5 s per insert, 50 ms max enqueue wait
+    slow = stubs.MemoryCollection(latency=0.5)
+    history_writer.collection = slow
+    history_writer.max_queue, history_writer.batch_size, history_writer.enqueue_timeout = 20, 10, 0.05
+    dropped_before = history_writer.dropped
+    await asyncio.gather(*(save_history(f"user_{i}", "notes", {}, {}) for i in range(200)))
+    await history_writer.close()
+    print(f"\noverload: 200 saves into a 20-record buffer -> {len(slow.docs)} written, "
+          f"{history_writer.dropped - dropped_before} dropped, {history_writer.backpressured} waited for space")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000,
+                     int(sys.argv[2]) if len(sys.argv) > 2 else 100))
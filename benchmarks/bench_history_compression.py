@@ -0,0 +1,100 @@
+# ================================================================
+#  BENCHMARK: Compressed history results
+#  1. Per result type (notes, summary, MCQ, flashcards, mind map,
+#     explanation): raw JSON size, compressed size, ratio and the
+#     encode/decode cost per record for each available codec.
+#  2. Runs the backfill (scripts/migrate_history_compression.py) over
+#     a synthetic history in the in-memory Mongo stand-in, checks that
+#     every record decodes back to the original and prints its report.
+#
+#  Run:  python benchmarks/bench_history_compression.py [RECORDS]
+# ================================================================
+
+import copy
+import os
+import random
+import sys
+import time
+
+import stubs
+
+sys.path.insert(0, os.path.join(stubs.ROOT, "scripts"))
+
+from services.history_codec import encode_result, decode_record, serialize, zstandard
+from migrate_history_compression import compress_all
+
+rng = random.Random(7)
+VOCAB = sorted(set(stubs.LOREM.lower().replace(".", "").replace(",", "").split())) + [
+    "".join(rng.choice("aeioubcdfghklmnprstvw") for _ in range(rng.randint(3, 9))) for _ in range(1500)
+]
+
+
+def sentence(words=14):
+    return " ".join(rng.choice(VOCAB) for _ in range(words)).capitalize() + "."
+
+
+def payloads():
+    return {
+        "make_notes": {
+            "title": sentence(4),
+            "summary": sentence(40),
+            "sections": [{"heading": sentence(3), "content": sentence(60),
+                          "bullets": [sentence(12) for _ in range(6)]} for _ in range(8)],
+            "key_takeaways": [sentence(10) for _ in range(6)],
+        },
+        "pdf_summarize": {
+            "title": sentence(5), "overview": sentence(80),
+            "sections": [{"heading": sentence(3), "content": sentence(50)} for _ in range(12)],
+        },
+        "make_mcq": [{"question": sentence(16) + "?", "options": [sentence(5) for _ in range(4)],
+                      "correctAnswer": "A", "explanation": sentence(25)} for _ in range(10)],
+        "flashcards": [{"front": sentence(6), "back": sentence(20)} for _ in range(20)],
+        "mindmap": "graph TD\n" + "\n".join(f"N{i}[{sentence(3)}] --> N{i + 1}({sentence(3)})" for i in range(40)),
+        "explain": [{"title": sentence(3), "paragraph": sentence(70), "bullets": [sentence(10) for _ in range(5)],
+                     "examples": [sentence(15)], "faqs": [], "important_terms": []} for _ in range(3)],
+    }
+
+
+def timed(fn, loops=200):
+    start = time.perf_counter()
+    for _ in range(loops):
+        out = fn()
+    return out, (time.perf_counter() - start) / loops
+
+
+def codec_table():
+    codecs = ["zlib"] + (["zstd"] if zstandard else [])
+    print(f"{'type':<15}{'codec':<7}{'raw':>9}{'stored':>9}{'ratio':>8}{'encode':>10}{'decode':>10}")
+    for kind, result in payloads().items():
+        raw = len(serialize(result))
+        for codec in codecs:
+            fields, enc = timed(lambda: encode_result(result, codec=codec, min_bytes=0))
+            stored = len(fields["result_z"]["data"]) if "result_z" in fields else raw
+            _, dec = timed(lambda: decode_record(copy.copy(fields)))
+            assert decode_record(copy.copy(fields))["result"] == result
+            print(f"{kind:<15}{codec:<7}{raw:>9}{stored:>9}{raw / stored:>7.2f}x"
+                  f"{enc * 1e6:>8.0f}µs{dec * 1e6:>8.0f}µs")
+    if not zstandard:
+        print("(zstd skipped: `zstandard` is not installed)")
+
+
+def backfill(records: int):
+    collection = stubs.BlockingMemoryCollection(latency=0.0)
+    samples = list(payloads().items())
+    originals = {}
+    for i in range(records):
+        kind, result = samples[i % len(samples)]
+        originals[i] = result
+        collection._insert({"_id": i, "user_id": f"user_{i % 50}", "type": kind, "result": result})
+
+    report = compress_all(collection, "zlib", min_bytes=2048, batch_size=500)
+    report.print(f"Backfill of {records} records (zlib, >= 2048 bytes)")
+
+    for doc in collection.docs:
+        assert decode_record(copy.copy(doc))["result"] == originals[doc["_id"]]
+    print(f"   verified          : all {records} records decode to their original result")
+
+
+if __name__ == "__main__":
+    codec_table()
+    backfill(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,102 @@
+# ================================================================
+#  BENCHMARK: History listing, offset pages of full documents vs
+#  keyset pages of projected items
+#  A heavy user with thousands of records (plus other users' rows)
+#  in the in-memory Mongo stand-in, which keeps the compound index
+#  {user_id, created_at, _id} as sorted buckets and counts docs
+#  examined per query.
+#   legacy  find(user).sort(created_at).skip(page * 50).limit(50),
+#           full documents (result payloads included)
+#   keyset  GET /api/history/get?before=<created_at,_id>, list projection
+#  Reports latency, docs examined and response size at page 1 and 100.
+#
+#  Run:  python benchmarks/bench_history_pagination.py [USER_RECORDS] [OTHER_RECORDS]
+# ================================================================
+
+import asyncio
+import json
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import stubs
+import httpx
+
+from main import app
+from services.history_service import ensure_history_indexes, history_title
+
+PAGE = 50
+
+
+def seed(collection, user_records: int, other_records: int):
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    notes = {"title": "Photosynthesis", "sections": [{"heading": f"Part {i}", "content": "x" * 400} for i in range(10)]}
+    for i in range(user_records + other_records):
+        user = "heavy_user" if i < user_records else f"user_{i % 500}"
+        input_data = {"text": "Chlorophyll absorbs light..."}
+        collection._insert({
+            "_id": f"{i:012x}",
+            "user_id": user,
+            "type": "make_notes",
+            "title": history_title("make_notes", input_data, notes),
+            "input": input_data,
+            "result": notes,
+            "created_at": start + timedelta(seconds=i),
+        })
+
+
+def legacy_page(collection, page: int):
+    examined = collection.docs_examined
+    start = time.perf_counter()
+    docs = list(collection.find({"user_id": "heavy_user"}).sort("created_at", -1).skip(page * PAGE).limit(PAGE))
+    body = json.dumps(docs, default=str)
+    return time.perf_counter() - start, collection.docs_examined - examined, len(body)
+
+
+async def keyset_pages(client, collection, headers, pages: int):
+    before, rows = None, {}
+    for page in range(pages):
+        examined = collection.docs_examined
+        start = time.perf_counter()
+        r = await client.get("/api/history/get", params={"limit": PAGE, **({"before": before} if before else {})},
+                             headers=headers)
+        elapsed = time.perf_counter() - start
+        assert r.status_code == 200, r.text
+        body = r.json()
+        assert len(body["history"]) == PAGE
+        rows[page] = (elapsed, collection.docs_examined - examined, len(r.content))
+        before = body["next_before"]
+    return rows
+
+
+async def main(user_records: int, other_records: int):
+    token = stubs.install_test_auth()
+    history = stubs.install_memory_mongo(latency=0.0)["history"]
+    seed(history, user_records, other_records)
+    headers = {"Authorization": token("heavy_user")}
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        print(f"history: {user_records} records for the heavy user, {other_records} for others")
+
+        no_index = legacy_page(history, 0)
+        await ensure_history_indexes()
+        await client.get("/api/history/get", params={"limit": 1}, headers=headers)  # warm-up
+        legacy = {p: legacy_page(history, p) for p in (0, 99)}
+        keyset = await keyset_pages(client, history, headers, 100)
+
+        detail_id = (await client.get("/api/history/get", params={"limit": 1}, headers=headers)).json()["history"][0]["_id"]
+        detail = await client.get(f"/api/history/{detail_id}", headers=headers)
+        assert detail.status_code == 200 and "result" in detail.json()
+
+    print(f"{'query':<34}{'latency':>10}{'docs examined':>15}{'bytes':>10}")
+    rows = [("legacy page 1, no index", no_index),
+            ("legacy page 1 (skip)", legacy[0]), ("legacy page 100 (skip)", legacy[99]),
+            ("keyset page 1 (route)", keyset[0]), ("keyset page 100 (route)", keyset[99])]
+    for label, (elapsed, examined, size) in rows:
+        print(f"{label:<34}{elapsed * 1000:>8.1f}ms{examined:>15}{size:>10}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000,
+                     int(sys.argv[2]) if len(sys.argv) > 2 else 50000))
@@ -0,0 +1,149 @@
+# ================================================================
+#  BENCHMARK: History search, regex scan vs compound text index
+#  The history collection grows to TOTAL records (a fifth of them
+#  belong to one heavy user) in the in-memory Mongo stand-in, which
+#  keeps the {user_id: 1, search_text: "text"} index as per-user
+#  postings and counts docs examined per query.
+#   regex   find({user_id, search_text: {$regex}}) over the
+#           {user_id, created_at, _id} index (walks the user's rows)
+#   search  GET /api/history/search?q=...  ($text + keyset page)
+#  Queries: a rare term planted in a fixed 20 records, a topic term
+#  whose matches grow with the history, and the topic term filtered
+#  to one type. Reports median latency and docs examined per size.
+#
+#  Run:  python benchmarks/bench_history_search.py [TOTAL] [REPEATS]
+# ================================================================
+
+import asyncio
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import stubs
+import httpx
+
+from main import app
+from services.history_service import ensure_history_indexes, history_search_text, history_title
+
+TYPES = ("make_notes", "summarize", "qna", "make_mcq", "flashcards", "mindmap", "explain")
+TOPICS = [f"{stem}{suffix}" for stem in ("photo", "thermo", "electro", "bio", "geo", "astro", "hydro", "neuro")
+          for suffix in ("synthesis", "dynamics", "chemistry", "physics", "logy", "metry", "graphy", "nomy")]
+FILLER = ("energy cell light matter force field wave particle reaction structure system process "
+          "theory model law equation cycle layer membrane signal pressure").split()
+NEEDLE = "quasicrystal"
+NEEDLES = 20
+PAGE = 20
+
+
+def make_record(i: int, user: str, rng, needle: bool):
+    action_type = TYPES[i % len(TYPES)]
+    topic = rng.choice(TOPICS)
+    words = rng.choices(FILLER, k=120) + [topic] * 3 + ([NEEDLE] if needle else [])
+    rng.shuffle(words)
+    step = len(words) // 4 + 1
+    input_data = {"topic": f"{topic} basics"}
+    result = {"title": f"{topic.title()} notes",
+              "sections": [{"heading": f"Part {s}", "content": " ".join(words[s * step:(s + 1) * step])} for s in range(4)]}
+    return {
+        "_id": f"{i:012x}",
+        "user_id": user,
+        "type": action_type,
+        "title": history_title(action_type, input_data, result),
+        "input": input_data,
+        "search_text": history_search_text(action_type, input_data, result),
+        "result": result,
+        "created_at": datetime(2025, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=i),
+    }
+
+
+def grow(collection, start: int, stop: int, rng, needles):
+    for i in range(start, stop):
+        user = "heavy_user" if i % 5 == 0 else f"user_{i % 997}"
+        collection._insert(make_record(i, user, rng, i in needles))
+
+
+async def regex_scan(collection, term: str):
+    cursor = (collection.find({"user_id": "heavy_user", "search_text": {"$regex": term, "$options": "i"}},
+                              {"title": 1, "type": 1, "created_at": 1})
+              .sort([("created_at", -1), ("_id", -1)]).limit(PAGE + 1))
+    return await cursor.to_list(PAGE + 1)
+
+
+async def route_search(client, headers, params):
+    r = await client.get("/api/history/search", params={"limit": PAGE, **params}, headers=headers)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+async def timed(collection, repeats: int, call):
+    examined, times = collection.docs_examined, []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        await call()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), (collection.docs_examined - examined) // repeats
+
+
+async def check(client, token, topic):
+    headers = {"Authorization": token("heavy_user")}
+    # Every planted needle is found (across pages), and only the caller's records
+    found, before = [], None
+    while True:
+        body = await route_search(client, headers, {"q": NEEDLE, **({"before": before} if before else {})})
+        found += body["results"]
+        before = body["next_before"]
+        if not before:
+            break
+    assert len(found) == NEEDLES, len(found)
+    assert len({item["_id"] for item in found}) == NEEDLES
+
+    body = await route_search(client, headers, {"q": topic, "type": ["qna", "mindmap"]})
+    assert body["results"] and all(item["type"] in ("qna", "mindmap") for item in body["results"])
+
+    other = {"Authorization": token("user_1")}
+    assert not (await route_search(client, other, {"q": NEEDLE}))["results"]
+
+
+async def main(total: int, repeats: int):
+    token = stubs.install_test_auth()
+    history = stubs.install_memory_mongo(latency=0.0)["history"]
+    await ensure_history_indexes()
+    headers = {"Authorization": token("heavy_user")}
+
+    rng = random.Random(7)
+    sizes = [total // 8, total // 4, total // 2, total]
+    # Needles sit in the heavy user's first records, so their count never grows
+    needles = set(rng.sample(range(0, sizes[0], 5), NEEDLES))
+    topic = TOPICS[0]
+
+    print(f"history search: up to {total} records, heavy user owns 1/5; median of {repeats} runs")
+    print(f"{'records':>8}{'user rows':>11}  {'query':<24}{'regex':>10}{'examined':>10}{'search':>10}{'examined':>10}")
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        done = 0
+        for size in sizes:
+            grow(history, done, size, rng, needles)
+            done = size
+            await route_search(client, headers, {"q": NEEDLE})  # warm-up
+
+            queries = [
+                (f"rare '{NEEDLE}'", NEEDLE, {"q": NEEDLE}),
+                (f"topic '{topic}'", topic, {"q": topic}),
+                ("topic, type=qna", topic, {"q": topic, "type": "qna"}),
+            ]
+            for label, term, params in queries:
+                regex = await timed(history, repeats, lambda: regex_scan(history, term))
+                search = await timed(history, repeats, lambda: route_search(client, headers, params))
+                print(f"{size:>8}{size // 5:>11}  {label:<24}"
+                      f"{regex[0] * 1000:>8.1f}ms{regex[1]:>10}{search[0] * 1000:>8.1f}ms{search[1]:>10}")
+
+        await check(client, token, topic)
+    print("✅ all planted records found across pages; type filter and per-user isolation hold")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000,
+                     int(sys.argv[2]) if len(sys.argv) > 2 else 5))
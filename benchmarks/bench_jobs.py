@@ -0,0 +1,264 @@
+# ================================================================
+#  BENCHMARK: Background summary jobs
+#  Large-PDF summaries through POST /api/pdf/summarize?async=1 against
+#  the stub model and in-memory Mongo:
+#    1. submit   time to the 202 vs time until the job is done, with
+#                progress polled from GET /api/jobs/{id}
+#    2. restart  workers stopped mid-job (process restart): the job is
+#                handed back to 'queued', the next start resumes it
+#    3. workers  a second manager (another app process) on the same
+#                collection: every job is claimed and run exactly once
+#    4. crash    a 'running' job whose owner died is left alone while
+#                its lease is live, then taken over by the sweep
+#    5. outage   the provider fails for a while: the job goes back to
+#                'queued' with a retry_at instead of failing, keeps
+#                waiting across a restart, then finishes once the
+#                provider recovers
+#    6. failure  a provider that never recovers fails the job after
+#                JOB_MAX_ATTEMPTS runs; a broken PDF fails at once; a
+#                job already interrupted JOB_MAX_ATTEMPTS times is
+#                failed on pickup; every upload is removed
+#
+#  Run:  python benchmarks/bench_jobs.py [JOBS] [PAGES] [LATENCY_SECONDS]
+# ================================================================
+
+import asyncio
+import io
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import stubs
+import httpx
+
+from main import app
+from services import ai_service
+from services.jobs import JOB_DIR, JOB_MAX_ATTEMPTS, JobManager, job_manager
+from services.llm_resilience import CircuitBreaker, ResilientCaller
+from services.pdf_service import spool_upload
+
+POLL = 0.05
+LEASE = 0.5
+
+
+def book(label: str, pages: int) -> bytes:
+    # Distinct first page per job, so nothing comes from the caches
+    return stubs.make_pdf(pages, overrides={0: f"{label}\nA different opening page for every job."})
+
+
+async def submit(client, data: bytes):
+    start = time.perf_counter()
+    r = await client.post("/api/pdf/summarize", params={"async": "1"},
+                          files={"file": ("book.pdf", data, "application/pdf")})
+    assert r.status_code == 202, r.text
+    return r.json()["job_id"], time.perf_counter() - start
+
+
+async def poll(client, job_id, until=("done", "failed"), timeout=120):
+    """Poll the job until its status is in `until`; returns (job, every status seen)."""
+    seen = []
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        r = await client.get(f"/api/jobs/{job_id}")
+        assert r.status_code == 200, r.text
+        job = r.json()
+        if not seen or seen[-1] != job["status"]:
+            seen.append(job["status"])
+        if job["status"] in until:
+            return job, seen
+        await asyncio.sleep(POLL)
+    raise AssertionError(f"job {job_id} still {seen[-1]} after {timeout}s")
+
+
+def record(jobs, job_id):
+    return next(doc for doc in jobs.docs if doc["_id"] == job_id)
+
+
+async def submit_and_poll(client, count, pages):
+    accepted, finished = [], []
+    for i in range(count):
+        start = time.perf_counter()
+        job_id, accept = await submit(client, book(f"Submit {i}", pages))
+        job, seen = await poll(client, job_id)
+        assert job["status"] == "done" and job["result"]["summary"].get("title"), job
+        progress = job["progress"]
+        assert progress["pages_extracted"] == progress["pages_total"] == pages, progress
+        assert progress["chunks_summarized"] == progress["chunks_total"], progress
+        accepted.append(accept)
+        finished.append(time.perf_counter() - start)
+    print(f"[submit]   202 in {statistics.median(accepted) * 1000:.0f} ms (median), "
+          f"done in {statistics.median(finished):.2f}s; statuses {' -> '.join(seen)}")
+
+
+async def restart(client, jobs, pages):
+    job_id, _ = await submit(client, book("Restart", pages))
+    job, _ = await poll(client, job_id, until=("running",))
+    while not job["progress"].get("chunks_summarized"):
+        await asyncio.sleep(POLL)
+        job = (await client.get(f"/api/jobs/{job_id}")).json()
+
+    resumed = job_manager.resumed
+    await job_manager.stop()
+    assert record(jobs, job_id)["status"] == "queued", "a clean stop hands the job back"
+    path = record(jobs, job_id)["params"]["path"]
+    assert os.path.exists(path), "the upload must survive a restart"
+
+    await job_manager.start()
+    job, _ = await poll(client, job_id)
+    assert job["status"] == "done", job
+    assert job_manager.resumed == resumed + 1 and record(jobs, job_id)["attempts"] == 2
+    assert not os.path.exists(path)
+    print(f"[restart]  stopped after {job['progress']['chunks_summarized']} chunks of "
+          f"{job['progress'].get('chunks_total')}; resumed on start and finished (2 attempts)")
+
+
+async def two_workers(client, jobs, count, pages):
+    # Another app process: its own manager and workers, same collection
+    other = JobManager(jobs, workers=2)
+    other._handlers, other._cleanups, other.lease = job_manager._handlers, job_manager._cleanups, LEASE
+    done_here, done_there = job_manager.completed, 0
+
+    ids = [(await submit(client, book(f"Shared {i}", pages)))[0] for i in range(count)]
+    await other.start()   # picks up every queued job, racing this process for them
+    for job_id in ids:
+        job, _ = await poll(client, job_id)
+        assert job["status"] == "done", job
+    done_there = other.completed
+    done_here = job_manager.completed - done_here
+    attempts = [record(jobs, job_id)["attempts"] for job_id in ids]
+    assert attempts == [1] * count, f"a job ran more than once: {attempts}"
+    assert done_here + done_there == count
+
+    # Both read the same queued record before either claims it: the
+    # atomic claim lets exactly one of them run it
+    job_id, _ = await orphan(jobs, "Race", pages, status="queued", attempts=0, owner=None, lease_until=None)
+    lost = job_manager.lost_claims + other.lost_claims
+    await asyncio.gather(job_manager._run(job_id), other._run(job_id))
+    assert record(jobs, job_id)["status"] == "done" and record(jobs, job_id)["attempts"] == 1
+    assert job_manager.lost_claims + other.lost_claims >= lost + 1  # (the sweep may join the race)
+    await other.stop()
+
+    print(f"[workers]  {count} jobs, 2 managers: {done_here} + {done_there} runs, "
+          f"each job claimed once; simultaneous pickups of one job: 1 claim won, the rest lost")
+
+
+async def orphan(jobs, label, pages, **fields):
+    """A job record as a crashed process leaves it, with a real spooled upload."""
+    path, digest = await spool_upload(io.BytesIO(book(label, pages)), directory=JOB_DIR)
+    now = datetime.now(timezone.utc)
+    job = {
+        "_id": uuid.uuid4().hex, "type": "pdf_summarize", "status": "running", "user_id": None,
+        "params": {"path": path, "digest": digest, "filename": "book.pdf", "regenerate": False},
+        "progress": {}, "attempts": 1, "result": None, "error": None,
+        "owner": "crashed-host:1:abc", "lease_until": now + timedelta(seconds=LEASE),
+        "created_at": now, "updated_at": now, **fields,
+    }
+    await jobs.insert_one(job)
+    return job["_id"], path
+
+
+async def crash(client, jobs, pages):
+    job_id, path = await orphan(jobs, "Crashed", pages)
+    await job_manager.start()   # startup sweep: the lease is still live
+    await asyncio.sleep(LEASE / 2)
+    assert record(jobs, job_id)["owner"] == "crashed-host:1:abc", "a live lease must not be taken over"
+
+    job, _ = await poll(client, job_id)
+    assert job["status"] == "done" and record(jobs, job_id)["attempts"] == 2, job
+    assert not os.path.exists(path)
+    print(f"[crash]    job of a dead worker left alone for its {LEASE}s lease, then taken over and finished")
+
+
+async def outage(client, fake, jobs, pages, down):
+    retried = job_manager.retried
+    fake.fail_rate = 1.0
+    job_id, _ = await submit(client, book("Outage", pages))
+
+    # Wait for the first failed run to put the job back in the queue
+    deadline = time.perf_counter() + 30
+    while not record(jobs, job_id).get("retry_at"):
+        assert time.perf_counter() < deadline, record(jobs, job_id)
+        await asyncio.sleep(POLL)
+    queued = (await client.get(f"/api/jobs/{job_id}")).json()
+    assert queued["status"] in ("queued", "running") and queued["error"], queued
+    path = record(jobs, job_id)["params"]["path"]
+    assert os.path.exists(path), "a job waiting to retry must keep its upload"
+
+    # Restart while the job waits out its delay: it is resumed, not lost
+    await job_manager.stop()
+    await job_manager.start()
+
+    await asyncio.sleep(down)
+    fake.fail_rate = 0.0
+    job, seen = await poll(client, job_id)
+    assert job["status"] == "done" and job["error"] is None, job
+    attempts = record(jobs, job_id)["attempts"]
+    assert 2 <= attempts <= JOB_MAX_ATTEMPTS and job_manager.retried > retried
+    print(f"[outage]   provider down {down}s, restart mid-wait: re-queued {job_manager.retried - retried}x, "
+          f"done after {attempts} attempts; statuses {' -> '.join(seen)}")
+
+
+async def failure(client, fake, jobs, pages):
+    failed = job_manager.failed
+    fake.fail_rate = 1.0
+    job_id, _ = await submit(client, book("Down for good", pages))
+    path = record(jobs, job_id)["params"]["path"]
+    job, _ = await poll(client, job_id)
+    fake.fail_rate = 0.0
+    assert job["status"] == "failed" and job["error"], job
+    assert record(jobs, job_id)["attempts"] == JOB_MAX_ATTEMPTS
+    assert not os.path.exists(path)
+
+    job_id, _ = await submit(client, b"%PDF-1.4 this is not really a pdf")
+    path = record(jobs, job_id)["params"]["path"]
+    broken, _ = await poll(client, job_id)
+    assert broken["status"] == "failed" and record(jobs, job_id)["attempts"] == 1, broken
+    assert not os.path.exists(path)
+
+    job_id, path = await orphan(jobs, "Interrupted", pages, attempts=JOB_MAX_ATTEMPTS,
+                                lease_until=datetime.now(timezone.utc) - timedelta(seconds=1))
+    await job_manager.start()
+    interrupted, _ = await poll(client, job_id)
+    assert interrupted["status"] == "failed" and "interrupted" in interrupted["error"], interrupted
+    assert not os.path.exists(path), "a job that gives up must remove its upload"
+    assert job_manager.failed == failed + 3
+    print(f"[failure]  provider down for good: failed after {JOB_MAX_ATTEMPTS} attempts "
+          f"({job['error'][:60]}...); broken PDF failed after 1 attempt; "
+          f"{JOB_MAX_ATTEMPTS}x interrupted job failed on pickup; uploads removed")
+
+
+async def main(count: int, pages: int, latency: float):
+    fake = stubs.install_fake_llm(latency=latency)
+    jobs = stubs.install_memory_mongo(latency=0.002)["jobs"]
+
+    # No in-call retries and a quick breaker, so an outage reaches the job
+    # manager at once; short job retry delays keep the run quick (each
+    # retry still waits at least the error's Retry-After of 1s)
+    ai_service.llm_caller = ResilientCaller(timeout=10, max_retries=0,
+                                            breaker=CircuitBreaker(failure_threshold=1, reset_timeout=0.5))
+    job_manager.retry_delay = 0.2
+    job_manager.lease = LEASE
+    await job_manager.start()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        await submit_and_poll(client, count, pages)
+        await restart(client, jobs, pages)
+        await two_workers(client, jobs, count, pages)
+        await crash(client, jobs, pages)
+        await outage(client, fake, jobs, pages, down=1.5)
+        await failure(client, fake, jobs, pages)
+    await job_manager.stop()
+
+    print(f"jobs: {job_manager.stats()}")
+    print("✅ jobs run once across processes, resume after a restart or crash, "
+          "wait out provider outages and fail only for good")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5,
+                     int(sys.argv[2]) if len(sys.argv) > 2 else 60,
+                     float(sys.argv[3]) if len(sys.argv) > 3 else 0.2))
@@ -0,0 +1,98 @@
+# ================================================================
+#  MICRO-BENCHMARK: JSON extraction from model output
+#  Legacy regex-based force_json (copied below, as it was) against
+#  the single-pass extractor in services/json_stream.py, on the
+#  output shapes we actually see from the model.
+#
+#  Run:  python benchmarks/bench_json_extract.py [REPEAT]
+# ================================================================
+
+import json
+import re
+import sys
+import timeit
+
+import stubs  # noqa: F401
+from services.json_stream import extract_json
+from services.metrics import json_repairs
+
+
+def legacy_force_json(output: str):
+    try:
+        return json.loads(output)
+    except:
+        pass
+    try:
+        match = re.search(r"\{.*\}", output, re.DOTALL)
+        if match:
+            return json.loads(match.group(0))
+    except:
+        pass
+    try:
+        match = re.search(r"\[.*\]", output, re.DOTALL)
+        if match:
+            return json.loads(match.group(0))
+    except:
+        pass
+    return None
+
+
+MCQS = [
+    {
+        "question": f"Which statement about topic {i} is correct? (see {{note}})",
+        "options": ["Option A", "Option B", "Option C", "Option D"],
+        "correctAnswer": "Option A",
+        "explanation": "Because the text says so. " * 5,
+    }
+    for i in range(200)
+]
+NOTES = {
+    "title": "Photosynthesis",
+    "summary": "How plants make food.",
+    "sections": [{"heading": f"Part {i}", "points": ["**Key** fact {x}"] * 5} for i in range(60)],
+}
+
+CASES = {
+    "clean object": (json.dumps(NOTES), NOTES),
+    "clean array (200 MCQs)": (json.dumps(MCQS), MCQS),
+    "prose + ```json fence": ("Sure! Here are your notes:\n```json\n" + json.dumps(NOTES) + "\n```\nGood luck!", NOTES),
+    "stray {brace} in prose": ("Sets use {curly braces}. Output:\n" + json.dumps(NOTES) + "\nDone {ok}.", NOTES),
+    "array + trailing {note}": (json.dumps(MCQS) + "\nNote: {see above}", MCQS),
+    "stray [ before payload": ("See note [1 for details.\n" + json.dumps(NOTES), NOTES),
+    "citation [1] before object": ("As noted in [1], here it is:\n" + json.dumps(NOTES), NOTES),
+    "empty {} in prose": ("Use {} for sets. Output:\n" + json.dumps(NOTES), NOTES),
+    "truncated array": (json.dumps(MCQS)[:-400], None),
+    "truncated object": (json.dumps(NOTES)[:-300], None),
+}
+
+
+def main(repeat: int):
+    print(f"{'case':<26}{'legacy':>12}{'new':>12}   legacy ok / new ok")
+    for name, (text, expected) in CASES.items():
+        legacy_time = min(timeit.repeat(lambda: legacy_force_json(text), number=repeat, repeat=3)) / repeat
+        new_time = min(timeit.repeat(lambda: extract_json(text), number=repeat, repeat=3)) / repeat
+
+        legacy_value = legacy_force_json(text)
+        new_value = extract_json(text)
+        if expected is None and name == "truncated array":
+            # Truncated: anything that keeps the complete questions counts
+            legacy_ok = isinstance(legacy_value, list) and len(legacy_value) >= 190
+            new_ok = isinstance(new_value, list) and len(new_value) >= 190
+        elif expected is None:
+            legacy_ok = isinstance(legacy_value, dict) and len(legacy_value.get("sections", [])) >= 55
+            new_ok = isinstance(new_value, dict) and len(new_value.get("sections", [])) >= 55
+        else:
+            legacy_ok, new_ok = legacy_value == expected, new_value == expected
+
+        print(f"{name:<26}{legacy_time * 1e6:>10.0f}us{new_time * 1e6:>10.0f}us   {legacy_ok!s:>9} / {new_ok}")
+        assert new_ok, name
+        if name == "stray [ before payload":
+            # Prose openers are skipped at C speed, not scanned in Python
+            assert new_time < legacy_time * 1.5, (new_time, legacy_time)
+
+    assert extract_json('See note [1 for details. {"a": 1}') == {"a": 1}
+    print(f"repairs: {dict(json_repairs.values)}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -0,0 +1,340 @@
+# ================================================================
+#  LOAD TEST: every route of the real app under concurrency
+#  Runs main.app (with its lifespan) against the stub Groq client
+#  (configurable latency) and the in-memory Mongo stand-in, or a real
+#  MongoDB at MONGO_URI (--mongo real, e.g. a local mongod). Workers
+#  pick routes from a weighted mix:
+#    /api/study/*  (buffered + /stream)   synthetic texts, unique per
+#                                         request unless --repeat-ratio
+#    /api/pdf/summarize, /api/documents/upload   synthetic PDFs
+#    /api/history/get, /api/history/search       signed-in users
+#  Reports throughput, p50/p95/p99 latency and TTFB per route, status
+#  codes and peak RSS of the app process, and saves it all
+#  as JSON. --compare prints the change against an earlier run.
+#
+#  Run:  python benchmarks/bench_load.py [--requests 500] [--concurrency 16]
+#            [--llm-latency 0.2] [--mongo-latency 0.002] [--routes explain,notes]
+#            [--server] [--output run.json] [--compare baseline.json]
+# ================================================================
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import stubs
+import httpx
+
+from main import app
+from services.ai_service import llm_cache, inflight
+from services.history_service import history_writer
+from services.llm_governor import llm_governor
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+TOPICS = ["Photosynthesis", "Osmosis", "Mitosis", "Thermodynamics", "Plate tectonics", "Enzymes",
+          "Electromagnetism", "The French Revolution", "Supply and demand", "Neural networks"]
+
+
+# ================================================================
+#  WORKLOAD
+# ================================================================
+class Workload:
+    def __init__(self, args, token):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.counter = itertools.count()
+        self.users = [f"load_user_{i}" for i in range(args.users)]
+        self.token = token
+        self.recent = []  # payloads kept for --repeat-ratio
+        print(f"📄 Building {args.pdf_pool} synthetic PDFs of {args.pdf_pages} pages...")
+        self.pdfs = [stubs.make_pdf(args.pdf_pages, overrides={0: f"Handout {i}\n" + stubs.synthetic_page_text(i)})
+                     for i in range(args.pdf_pool)]
+
+    def headers(self):
+        if self.rng.random() >= self.args.auth_ratio:
+            return {}
+        return {"Authorization": self.token(self.rng.choice(self.users))}
+
+    def text(self):
+        if self.recent and self.rng.random() < self.args.repeat_ratio:
+            return self.rng.choice(self.recent)
+        n = next(self.counter)
+        topic = self.rng.choice(TOPICS)
+        words = stubs.synthetic_page_text(n, self.args.text_words)
+        text = f"Study session {n} on {topic}.\n{words}"
+        self.recent = (self.recent + [text])[-50:]
+        return text
+
+    # route name -> (method, path, request kwargs); weights come from --routes
+    def build(self, name):
+        h = self.headers()
+        if name == "explain":
+            topic = self.rng.choice(TOPICS)
+            if self.rng.random() >= self.args.repeat_ratio:
+                topic = f"{topic} ({next(self.counter)})"
+            return "POST", "/api/study/explain", {"json": {"topic": topic}, "headers": h}
+        if name in ("notes", "mcq", "summarize_text", "mindmap", "flashcards"):
+            path = {"notes": "make-notes", "mcq": "make-mcq", "summarize_text": "summarize-text",
+                    "mindmap": "make-mindmap", "flashcards": "make-flashcards"}[name]
+            return "POST", f"/api/study/{path}", {"json": {"text": self.text()}, "headers": h}
+        if name == "qna":
+            body = {"text": self.text(), "question": f"What is {self.rng.choice(TOPICS).lower()}?"}
+            return "POST", "/api/study/qna", {"json": body, "headers": h}
+        if name == "explain_stream":
+            return "POST", "/api/study/explain/stream", {"json": {"topic": f"{self.rng.choice(TOPICS)} {next(self.counter)}"}, "headers": h}
+        if name == "notes_stream":
+            return "POST", "/api/study/make-notes/stream", {"json": {"text": self.text()}, "headers": h}
+        if name == "qna_stream":
+            body = {"text": self.text(), "question": "Why does it matter?"}
+            return "POST", "/api/study/qna/stream", {"json": body, "headers": h}
+        if name in ("pdf_summarize", "document_upload"):
+            i = self.rng.randrange(len(self.pdfs))
+            path = "/api/pdf/summarize" if name == "pdf_summarize" else "/api/documents/upload"
+            files = {"file": (f"handout_{i}.pdf", self.pdfs[i], "application/pdf")}
+            return "POST", path, {"files": files, "headers": h}
+        if name == "history_get":
+            return "GET", "/api/history/get", {"params": {"limit": 20},
+                                               "headers": {"Authorization": self.token(self.rng.choice(self.users))}}
+        if name == "history_search":
+            return "GET", "/api/history/search", {"params": {"q": self.rng.choice(TOPICS)},
+                                                  "headers": {"Authorization": self.token(self.rng.choice(self.users))}}
+        raise ValueError(f"unknown route: {name}")
+
+
+ROUTES = ["explain", "notes", "mcq", "summarize_text", "qna", "mindmap", "flashcards",
+          "explain_stream", "notes_stream", "qna_stream",
+          "pdf_summarize", "document_upload", "history_get", "history_search"]
+
+
+def parse_mix(spec: str):
+    """'explain,notes:3,pdf_summarize' -> {name: weight}; 'all' = every route once."""
+    if spec == "all":
+        return {name: 1.0 for name in ROUTES}
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition(":")
+        if name not in ROUTES:
+            raise SystemExit(f"unknown route '{name}', choose from: {', '.join(ROUTES)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+# ================================================================
+#  DRIVER
+# ================================================================
+async def one_request(client, workload, name):
+    method, path, kwargs = workload.build(name)
+    start = time.perf_counter()
+    ttfb = None
+    try:
+        async with client.stream(method, path, **kwargs) as r:
+            async for _ in r.aiter_raw():
+                if ttfb is None:
+                    ttfb = time.perf_counter() - start
+            status = r.status_code
+    except Exception as e:
+        status = f"error:{type(e).__name__}"
+    elapsed = time.perf_counter() - start
+    return {"route": name, "status": status, "latency": elapsed, "ttfb": ttfb if ttfb is not None else elapsed}
+
+
+async def run(client, workload, mix, args):
+    names, weights = list(mix), list(mix.values())
+    samples = []
+    issued = itertools.count()
+    deadline = time.perf_counter() + args.duration if args.duration else None
+
+    async def worker():
+        while True:
+            if deadline is not None:
+                if time.perf_counter() >= deadline:
+                    return
+            elif next(issued) >= args.requests:
+                return
+            samples.append(await one_request(client, workload, workload.rng.choices(names, weights)[0]))
+
+    for _ in range(args.warmup):
+        await one_request(client, workload, workload.rng.choices(names, weights)[0])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    return samples, time.perf_counter() - start
+
+
+# ================================================================
+#  REPORT
+# ================================================================
+def percentile(sorted_values, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(q / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[rank]
+
+
+def summarize(samples, elapsed):
+    latencies = sorted(s["latency"] for s in samples)
+    ttfbs = sorted(s["ttfb"] for s in samples)
+    statuses = {}
+    for s in samples:
+        statuses[str(s["status"])] = statuses.get(str(s["status"]), 0) + 1
+    ok = sum(1 for s in samples if isinstance(s["status"], int) and s["status"] < 400)
+    return {
+        "requests": len(samples),
+        "ok": ok,
+        "errors": len(samples) - ok,
+        "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(1000 * percentile(latencies, 50), 2),
+        "p95_ms": round(1000 * percentile(latencies, 95), 2),
+        "p99_ms": round(1000 * percentile(latencies, 99), 2),
+        "max_ms": round(1000 * latencies[-1], 2) if latencies else 0.0,
+        "ttfb_p50_ms": round(1000 * percentile(ttfbs, 50), 2),
+        "statuses": statuses,
+    }
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux (bytes on macOS)
+    scale = 1 if sys.platform == "darwin" else 1024
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2**20, 1)
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=stubs.ROOT, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def print_report(report):
+    print(f"\n{'route':<18}{'reqs':>6}{'err':>5}{'rps':>8}{'p50':>10}{'p95':>10}{'p99':>10}{'ttfb p50':>10}")
+    rows = list(report["routes"].items()) + [("ALL", report["overall"])]
+    for name, r in rows:
+        print(f"{name:<18}{r['requests']:>6}{r['errors']:>5}{r['throughput_rps']:>8.1f}"
+              f"{r['p50_ms']:>8.1f}ms{r['p95_ms']:>8.1f}ms{r['p99_ms']:>8.1f}ms{r['ttfb_p50_ms']:>8.1f}ms")
+    print(f"\nstatuses: {report['overall']['statuses']}")
+    # PDF workers are spawned (fork + exec), so RUSAGE_CHILDREN would just echo the parent
+    print(f"peak RSS: {report['peak_rss_mb']} MB")
+
+
+def print_comparison(report, baseline_path):
+    with open(baseline_path) as f:
+        base = json.load(f)
+    print(f"\nvs {baseline_path} ({base.get('git') or '?'}, {base.get('started_at', '?')})")
+    print(f"{'route':<18}{'rps':>16}{'p50':>20}{'p95':>20}{'p99':>20}")
+
+    def delta(new, old, unit):
+        change = f"{(new - old) / old * 100:+.0f}%" if old else "n/a"
+        return f"{old:.1f}->{new:.1f}{unit} {change}"
+
+    rows = [(n, r, base["routes"].get(n)) for n, r in report["routes"].items()]
+    rows.append(("ALL", report["overall"], base["overall"]))
+    for name, new, old in rows:
+        if not old:
+            continue
+        print(f"{name:<18}{delta(new['throughput_rps'], old['throughput_rps'], ''):>16}"
+              f"{delta(new['p50_ms'], old['p50_ms'], 'ms'):>20}{delta(new['p95_ms'], old['p95_ms'], 'ms'):>20}"
+              f"{delta(new['p99_ms'], old['p99_ms'], 'ms'):>20}")
+    print(f"{'peak RSS':<18}{delta(report['peak_rss_mb'], base['peak_rss_mb'], ' MB'):>16}")
+
+
+# ================================================================
+#  MAIN
+# ================================================================
+async def main(args):
+    mix = parse_mix(args.routes)
+    fake = stubs.install_fake_llm(latency=args.llm_latency, per_char_latency=args.llm_per_char,
+                                  first_token_latency=min(args.llm_latency, 0.05), seed=args.seed)
+    token = stubs.install_test_auth()
+    if args.mongo == "memory":
+        stubs.install_memory_mongo(latency=args.mongo_latency)
+    workload = Workload(args, token)
+
+    config = {k: v for k, v in vars(args).items() if k not in ("output", "compare")}
+    config["mix"] = mix
+    started_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    print(f"🚀 {args.requests if not args.duration else f'{args.duration}s of'} requests, "
+          f"concurrency {args.concurrency}, LLM {args.llm_latency}s, mongo={args.mongo}, "
+          f"{'uvicorn' if args.server else 'in-process ASGI'}")
+
+    async def drive(base_url, transport=None):
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=args.timeout, limits=limits) as client:
+            return await run(client, workload, mix, args)
+
+    if args.server:
+        # uvicorn runs the lifespan itself (in its own thread and loop)
+        with stubs.serve_app(app) as base_url:
+            samples, elapsed = await drive(base_url)
+    else:
+        async with app.router.lifespan_context(app):
+            samples, elapsed = await drive("http://load", httpx.ASGITransport(app=app))
+            await history_writer.close()
+
+    routes = {}
+    for name in mix:
+        picked = [s for s in samples if s["route"] == name]
+        if picked:
+            routes[name] = summarize(picked, elapsed)
+
+    report = {
+        "started_at": started_at,
+        "git": git_revision(),
+        "config": config,
+        "duration_s": round(elapsed, 2),
+        "overall": summarize(samples, elapsed),
+        "routes": routes,
+        "peak_rss_mb": peak_rss_mb(),
+        "llm": {"completions": fake.calls, "max_in_flight": fake.max_in_flight,
+                "cache": llm_cache.memory.stats(), "governor": llm_governor.stats(),
+                "singleflight": inflight.stats()},
+        "history": history_writer.stats(),
+    }
+    print_report(report)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"load_{started_at.replace(':', '')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"💾 Saved {output}")
+
+    if args.compare:
+        print_comparison(report, args.compare)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load test every route of the app against stub services.")
+    parser.add_argument("--requests", type=int, default=500, help="total requests (ignored with --duration)")
+    parser.add_argument("--duration", type=float, default=None, help="run for this many seconds instead")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=5, help="requests before timing starts")
+    parser.add_argument("--routes", default="all", help="'all' or e.g. 'explain,notes:3,pdf_summarize'")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="stub model seconds per completion")
+    parser.add_argument("--llm-per-char", type=float, default=0.0, help="extra stub seconds per prompt char")
+    parser.add_argument("--mongo", choices=("memory", "real"), default="memory",
+                        help="in-memory stand-in, or the MongoDB at MONGO_URI")
+    parser.add_argument("--mongo-latency", type=float, default=0.002, help="stand-in seconds per round trip")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--auth-ratio", type=float, default=0.8, help="share of study requests signed in")
+    parser.add_argument("--repeat-ratio", type=float, default=0.0, help="share of texts reused (LLM cache hits)")
+    parser.add_argument("--text-words", type=int, default=400)
+    parser.add_argument("--pdf-pages", type=int, default=20)
+    parser.add_argument("--pdf-pool", type=int, default=4, help="distinct synthetic PDFs")
+    parser.add_argument("--server", action="store_true", help="serve over real HTTP with uvicorn")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help=f"JSON report path (default {RESULTS_DIR}/load_<time>.json)")
+    parser.add_argument("--compare", help="earlier JSON report to diff against")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,87 @@
+# ================================================================
+#  BENCHMARK: Map-reduce summarization of large PDFs
+#  1. Uploads a synthetic multi-hundred-page PDF to /api/pdf/summarize.
+#  2. Re-uploads it with ONE page edited and counts how many upstream
+#     completions that costs (only the edited chunk + the merge).
+#  3. Checks failed chunks: one whose first answer holds no JSON is
+#     retried and the summary is complete; one that never parses
+#     leaves a summary marked partial, naming that chunk's pages.
+#
+#  Run:  python benchmarks/bench_map_reduce.py [PAGES] [LATENCY_SECONDS]
+# ================================================================
+
+import asyncio
+import sys
+import time
+
+import stubs
+import httpx
+
+from main import app
+
+
+async def upload(client, data: bytes):
+    start = time.perf_counter()
+    r = await client.post(
+        "/api/pdf/summarize",
+        files={"file": ("book.pdf", data, "application/pdf")},
+    )
+    assert r.status_code == 200, r.text
+    return time.perf_counter() - start, r.json()["summary"]
+
+
+def garbling(marker: str, times: int):
+    """Stub responder: the first `times` answers to prompts containing `marker` are prose."""
+    left = {"n": times}
+
+    def respond(prompt: str) -> str:
+        if marker in prompt and left["n"]:
+            left["n"] -= 1
+            return "Sorry, I could not summarize this part."
+        return stubs.default_responder(prompt)
+    return respond
+
+
+async def failed_chunks(client, fake, pages: int):
+    page = pages // 3
+
+    fake.responder = garbling("FLAKY-PAGE", 1)
+    _, summary = await upload(client, stubs.make_pdf(pages, overrides={page: "FLAKY-PAGE\nAnswered on retry."}))
+    assert not summary.get("partial") and not summary.get("error"), summary
+
+    fake.responder = garbling("BROKEN-PAGE", 10)
+    _, summary = await upload(client, stubs.make_pdf(pages, overrides={page: "BROKEN-PAGE\nNever parses."}))
+    fake.responder = stubs.default_responder
+    assert summary.get("partial") is True and len(summary["failed_chunks"]) == 1, summary
+    lost = summary["failed_chunks"][0]
+    assert lost["page_start"] <= page + 1 <= lost["page_end"], lost
+    return lost
+
+
+async def main(pages: int, latency: float):
+    fake = stubs.install_fake_llm(latency=latency)
+    original = stubs.make_pdf(pages)
+    edited = stubs.make_pdf(pages, overrides={pages // 2: "Chapter X\nThis page was rewritten by the teacher."})
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+        first_time, summary = await upload(client, original)
+        first_calls = fake.calls
+
+        second_time, _ = await upload(client, edited)
+        second_calls = fake.calls - first_calls
+
+        lost = await failed_chunks(client, fake, pages)
+
+    print(f"pages                    : {pages}")
+    print(f"first upload             : {first_time:.2f}s, {first_calls} completions")
+    print(f"re-upload, 1 page edited : {second_time:.2f}s, {second_calls} completions")
+    print(f"summary title            : {summary.get('title')}")
+    print("chunk failing once       : retried, summary complete")
+    print(f"chunk failing twice      : summary partial, failed_chunks pages {lost['page_start']}-{lost['page_end']}")
+
+
+if __name__ == "__main__":
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+    asyncio.run(main(pages, latency))
@@ -0,0 +1,132 @@
+# ================================================================
+#  BENCHMARK: Metrics overhead on the hot path
+#  1. Primitives: stage() enter/exit, histogram observe, counter inc,
+#     Server-Timing header, /metrics render.
+#  2. End to end: the same requests with METRICS_ENABLED on and off
+#     (toggled at runtime, alternating request by request), against
+#     the in-memory Mongo stand-in and the stub model at zero latency,
+#     so only framework and instrumentation cost is left:
+#       GET  /                      no stages
+#       GET  /api/history/get       auth + db stage
+#       POST /api/study/make-notes  cache + parse stages (cached result)
+#  Also checks that every response carries Server-Timing and that
+#  the exposition is well formed (cumulative buckets, +Inf = count).
+#
+#  Run:  python benchmarks/bench_metrics.py [REQUESTS] [CALLS]
+# ================================================================
+
+import asyncio
+import statistics
+import sys
+import time
+
+import stubs
+import httpx
+
+import services.metrics as metrics
+from main import app
+from services.history_service import ensure_history_indexes
+
+
+def per_call(fn, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls
+
+
+def primitives(calls: int):
+    hist = metrics.Histogram("bench_seconds", "bench", ("route", "stage"))
+    counter = metrics.Counter("bench_total", "bench", ("task",))
+    timings = metrics.RequestTimings()
+    for name in ("upload", "extract", "prompt", "cache", "llm_queue", "llm", "parse", "db"):
+        timings.add(name, 0.0123)
+
+    def enter_exit():
+        with metrics.stage("parse"):
+            pass
+
+    rows = [
+        ("stage() enter/exit", per_call(enter_exit, calls)),
+        ("histogram observe", per_call(lambda: hist.observe(0.042, "/api/x", "llm"), calls)),
+        ("counter inc", per_call(lambda: counter.inc("notes", amount=512), calls)),
+        ("Server-Timing (8 stages)", per_call(lambda: timings.server_timing(0.5), calls)),
+        ("/metrics render", per_call(metrics.registry.render, max(calls // 1000, 10))),
+    ]
+    print(f"primitives ({calls} calls)")
+    for label, seconds in rows:
+        print(f"  {label:<26}{seconds * 1e6:>10.2f} µs")
+
+
+async def request(client, method, path, **kwargs) -> float:
+    start = time.perf_counter()
+    r = await client.request(method, path, **kwargs)
+    elapsed = time.perf_counter() - start
+    assert r.status_code == 200, r.text
+    assert ("server-timing" in r.headers) == metrics.METRICS_ENABLED
+    return elapsed
+
+
+async def compare(client, method, path, requests: int, **kwargs):
+    """Median latency (off, on), alternating per request so drift hits both equally."""
+    times = {False: [], True: []}
+    for _ in range(requests):
+        for enabled in (False, True):
+            metrics.METRICS_ENABLED = enabled
+            times[enabled].append(await request(client, method, path, **kwargs))
+    metrics.METRICS_ENABLED = True
+    return statistics.median(times[False]), statistics.median(times[True])
+
+
+def check_exposition(text: str):
+    counts = {}
+    last = {}
+    for line in text.splitlines():
+        if line.startswith("#") or not line:
+            continue
+        name, value = line.rsplit(" ", 1)
+        if "_bucket{" in name:
+            series = name.split('le="')[0]
+            assert float(value) >= last.get(series, 0), line
+            last[series] = float(value)
+            if 'le="+Inf"' in name:
+                counts[series.replace("_bucket{", "_count{").rstrip(",") + "}"] = float(value)
+        elif "_count{" in name and name in counts:
+            assert counts[name] == float(value), line
+
+
+async def main(requests: int, calls: int):
+    primitives(calls)
+
+    stubs.install_fake_llm(latency=0.0)
+    token = stubs.install_test_auth()
+    stubs.install_memory_mongo(latency=0.0)
+    await ensure_history_indexes()
+    headers = {"Authorization": token("student")}
+    notes = {"json": {"text": "Osmosis moves water across a membrane. " * 40}, "headers": headers}
+
+    routes = [("GET /", "GET", "/", {}),
+              ("GET /api/history/get", "GET", "/api/history/get", {"headers": headers}),
+              ("POST /api/study/make-notes", "POST", "/api/study/make-notes", notes)]
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        print(f"\nmedian latency of {requests} requests")
+        print(f"  {'route':<30}{'metrics off':>12}{'metrics on':>12}{'overhead':>12}")
+        for label, method, path, kwargs in routes:
+            for _ in range(10):  # warm-up (and cache the notes)
+                await request(client, method, path, **kwargs)
+            off, on = await compare(client, method, path, requests, **kwargs)
+            print(f"  {label:<30}{off * 1000:>10.3f}ms{on * 1000:>10.3f}ms{(on - off) * 1e6:>10.1f}µs")
+
+        r = await client.post("/api/study/make-notes", **notes)
+        print(f"\nServer-Timing: {r.headers['server-timing']}")
+        exposition = (await client.get("/metrics")).text
+        check_exposition(exposition)
+        print(f"/metrics: {len(exposition.splitlines())} lines, {len(exposition)} bytes")
+    print("✅ Server-Timing on every response; buckets cumulative and +Inf == _count")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 300,
+                     int(sys.argv[2]) if len(sys.argv) > 2 else 100000))
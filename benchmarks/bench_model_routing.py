@@ -0,0 +1,146 @@
+# ================================================================
+#  BENCHMARK: Tiered model routing
+#  The same request mix (flashcards, mind map, short QnA, notes, MCQ)
+#  against a stub provider where the small model answers in
+#  SMALL_LATENCY and the large one in LARGE_LATENCY:
+#    all-large   LLM_ROUTING=0, the old behaviour
+#    routed      light tasks on the small model
+#    routed+bad  as routed, but GARBLE of the small model's answers
+#                contain no JSON and must be escalated
+#  Reports per-route median/p95 latency, completions and tokens per
+#  model and a relative cost using the per-1M-token prices below
+#  (assumptions; edit to match your plan). Also checks that a long
+#  document sends even flashcards to the large model and that no
+#  garbled answer was cached.
+#
+#  Run:  python benchmarks/bench_model_routing.py [REQUESTS] [LARGE_LATENCY] [SMALL_LATENCY] [GARBLE]
+# ================================================================
+
+import asyncio
+import statistics
+import sys
+import time
+
+import stubs
+import httpx
+
+from main import app
+from services.ai_service import llm_cache
+from services.metrics import llm_tokens
+from services.model_router import model_router
+
+# USD per 1M (prompt, completion) tokens
+PRICES = {
+    model_router.small_model: (0.05, 0.08),
+    model_router.large_model: (0.59, 0.79),
+}
+
+ROUTES = [
+    ("flashcards", "/api/study/make-flashcards", lambda text: {"text": text}),
+    ("mindmap", "/api/study/make-mindmap", lambda text: {"text": text}),
+    ("qna", "/api/study/qna", lambda text: {"text": text, "question": "What does chlorophyll absorb?"}),
+    ("notes", "/api/study/make-notes", lambda text: {"text": text}),
+    ("mcq", "/api/study/make-mcq", lambda text: {"text": text}),
+]
+
+
+def valid(task: str, body: dict) -> bool:
+    value = body.get({"flashcards": "flashcards", "mindmap": "mermaid_code", "qna": "answer_data",
+                      "notes": "notes_data", "mcq": "mcqs"}[task])
+    if task == "mindmap":
+        return isinstance(value, str) and value.startswith("graph")
+    if task in ("flashcards", "mcq"):
+        return isinstance(value, list) and bool(value)
+    return isinstance(value, dict) and not value.get("error")
+
+
+def tokens_by_model():
+    totals = {}
+    for (_, model, kind), value in llm_tokens.values.items():
+        totals.setdefault(model, {"prompt": 0, "completion": 0})[kind] += value
+    return totals
+
+
+def cost(tokens) -> float:
+    total = 0.0
+    for model, t in tokens.items():
+        prompt_price, completion_price = PRICES.get(model, PRICES[model_router.large_model])
+        total += (t["prompt"] * prompt_price + t["completion"] * completion_price) / 1e6
+    return total
+
+
+async def scenario(client, fake, label, requests, routing, garble):
+    model_router.enabled = routing
+    fake.garble_rate = {model_router.small_model: garble}
+    llm_cache.memory.clear()
+    llm_tokens.values.clear()
+    calls_before = dict(fake.calls_by_model)
+    escalations_before = sum(model_router.escalations.values())
+
+    semaphore = asyncio.Semaphore(16)
+    times = {task: [] for task, _, _ in ROUTES}
+    invalid = 0
+
+    async def one(i):
+        nonlocal invalid
+        task, path, body = ROUTES[i % len(ROUTES)]
+        # Unique text per request, so every call reaches the model
+        text = f"Lecture {label} {i}. " + stubs.synthetic_page_text(i, 300)
+        async with semaphore:
+            start = time.perf_counter()
+            r = await client.post(path, json=body(text))
+            times[task].append(time.perf_counter() - start)
+        if r.status_code != 200 or not valid(task, r.json()):
+            invalid += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+
+    calls = {m: n - calls_before.get(m, 0) for m, n in fake.calls_by_model.items() if n - calls_before.get(m, 0)}
+    tokens = tokens_by_model()
+    print(f"\n{label}  ({requests} requests in {elapsed:.2f}s, {invalid} invalid, "
+          f"{sum(model_router.escalations.values()) - escalations_before} escalated)")
+    for task, samples in times.items():
+        samples.sort()
+        p95 = samples[min(len(samples) - 1, int(0.95 * len(samples)))]
+        print(f"  {task:<12} median {statistics.median(samples) * 1000:>7.0f} ms   p95 {p95 * 1000:>7.0f} ms")
+    print(f"  completions by model: {calls}")
+    print(f"  tokens by model     : {tokens}")
+    all_times = [t for samples in times.values() for t in samples]
+    return statistics.median(all_times), cost(tokens), invalid
+
+
+async def main(requests: int, large_latency: float, small_latency: float, garble: float):
+    fake = stubs.install_fake_llm(latency=large_latency, model_latency={model_router.small_model: small_latency})
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        base_median, base_cost, _ = await scenario(client, fake, "all-large", requests, routing=False, garble=0.0)
+        routed_median, routed_cost, _ = await scenario(client, fake, "routed", requests, routing=True, garble=0.0)
+        bad_median, bad_cost, invalid = await scenario(client, fake, "routed+bad", requests, routing=True, garble=garble)
+
+        # A long document goes to the large model even for flashcards
+        before = dict(fake.calls_by_model)
+        long_text = " ".join(stubs.synthetic_page_text(p) for p in range(40))
+        r = await client.post("/api/study/make-flashcards", json={"text": long_text})
+        assert r.status_code == 200
+        assert fake.calls_by_model.get(model_router.large_model, 0) == before.get(model_router.large_model, 0) + 1
+
+    print(f"\n{'scenario':<14}{'median':>10}{'rel. cost':>12}")
+    for label, median, total in (("all-large", base_median, base_cost),
+                                 ("routed", routed_median, routed_cost),
+                                 ("routed+bad", bad_median, bad_cost)):
+        print(f"{label:<14}{median * 1000:>8.0f}ms{total / base_cost:>11.2f}x")
+    assert invalid == 0, "escalation should repair every garbled answer"
+    assert llm_cache.rejected == fake.garbled, (llm_cache.rejected, fake.garbled)
+    print(f"✅ garbled small-model answers escalated and kept out of the cache ({llm_cache.rejected}); "
+          f"long input routed to {model_router.large_model}")
+    print(f"router: {model_router.stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200,
+                     float(sys.argv[2]) if len(sys.argv) > 2 else 1.0,
+                     float(sys.argv[3]) if len(sys.argv) > 3 else 0.2,
+                     float(sys.argv[4]) if len(sys.argv) > 4 else 0.2))
@@ -0,0 +1,81 @@
+# ================================================================
+#  BENCHMARK: PDF extraction, serial vs page-parallel process pool
+#  Synthetic multi-hundred-page PDFs are parsed
+#   1. serially on the event loop, one document walk;
+#   2. with parse_pages() on pools of 1 (one task, no split), 2, 4 ...
+#      up to all cores.
+#  Reports pages/s and the worst event-loop stall seen by a 10 ms
+#  ticker running alongside the extraction.
+#
+#  Run:  python benchmarks/bench_pdf_extract.py [PAGES ...]
+# ================================================================
+
+import asyncio
+import io
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import stubs
+
+from services.pdf_service import _extract_pages, parse_pages, spooled_pdf
+
+
+async def ticker(stop: asyncio.Event, lags: list):
+    """Sleeps 10 ms at a time and records how late each wake-up was."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.01)
+        lags.append(time.perf_counter() - started - 0.01)
+
+
+async def measure(extract):
+    stop, lags = asyncio.Event(), []
+    tick = asyncio.create_task(ticker(stop, lags))
+    await asyncio.sleep(0.05)
+    start = time.perf_counter()
+    pages = await extract()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await tick
+    return pages, elapsed, max(lags, default=0.0)
+
+
+async def main(sizes):
+    cores = os.cpu_count() or 1
+    worker_counts = sorted({1, cores} | {n for n in (2, 4, 8, 16) if n <= cores})
+    ctx = multiprocessing.get_context("spawn")
+    pools = {n: ProcessPoolExecutor(max_workers=n, mp_context=ctx) for n in worker_counts}
+
+    # Warm the workers up (spawn + import fitz) outside the timings
+    with spooled_pdf(io.BytesIO(stubs.make_pdf(64))) as warm:
+        for n, pool in pools.items():
+            await parse_pages(warm, workers=n, pool=pool)
+
+    print(f"cores: {cores}")
+    print(f"{'pages':>6} {'mode':<18}{'time':>8}{'pages/s':>10}{'speedup':>9}{'max loop stall':>16}")
+    for num_pages in sizes:
+        data = stubs.make_pdf(num_pages)
+
+        with spooled_pdf(io.BytesIO(data)) as path:
+            async def serial():
+                return _extract_pages(path)
+
+            baseline, base_time, stall = await measure(serial)
+            print(f"{num_pages:>6} {'serial (blocking)':<18}{base_time:>7.2f}s{num_pages / base_time:>10.0f}"
+                  f"{1.0:>8.2f}x{stall * 1000:>14.0f}ms")
+
+            for n, pool in pools.items():
+                pages, elapsed, stall = await measure(lambda: parse_pages(path, workers=n, pool=pool))
+                assert pages == baseline, "parallel extraction must reassemble pages in order"
+                print(f"{num_pages:>6} {f'pool x{n}':<18}{elapsed:>7.2f}s{num_pages / elapsed:>10.0f}"
+                      f"{base_time / elapsed:>8.2f}x{stall * 1000:>14.0f}ms")
+
+    for pool in pools.values():
+        pool.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main([int(n) for n in sys.argv[1:]] or [200, 500]))
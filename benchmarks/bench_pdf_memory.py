@@ -0,0 +1,115 @@
+# ================================================================
+#  BENCHMARK: Peak memory of PDF extraction per request
+#  legacy   file.read() -> fitz.open(stream=bytes) -> list of pages
+#           -> cleanup -> "\n\n".join(...)   (full copies alive at once)
+#  spooled  extract_pages_async: upload copied to a temp file in 1 MB
+#           chunks, parsed by path in the process pool, cleanup, join
+#  Both sides apply the same page cleanup, so the text is comparable.
+#  Each mode runs in a fresh process so tracemalloc peaks (Python
+#  allocations) and ru_maxrss (whole process, incl. MuPDF) are clean;
+#  the spooled parse runs in a pool worker, whose whole-process peak
+#  (interpreter and MuPDF included) is reported as worker RSS.
+#
+#  Run:  python benchmarks/bench_pdf_memory.py [PAGES] [IMAGE_KB_PER_PAGE]
+# ================================================================
+
+import asyncio
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import tracemalloc
+
+import stubs
+
+
+def make_heavy_pdf(num_pages: int, image_kb: int) -> bytes:
+    """Text pages plus an incompressible image each, to reach real upload sizes."""
+    import fitz
+
+    doc = fitz.open()
+    side = max(8, int((image_kb * 1024 / 3) ** 0.5))
+    for i in range(num_pages):
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(40, 40, 560, 400), stubs.synthetic_page_text(i, 200), fontsize=8)
+        pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, side, side), False)
+        pix.set_rect(pix.irect, (0, 0, 0))
+        pix.samples_mv[:] = os.urandom(len(pix.samples_mv))
+        page.insert_image(fitz.Rect(40, 420, 300, 680), pixmap=pix)
+    data = doc.tobytes(deflate=False)
+    doc.close()
+    return data
+
+
+def join_pages(pages):
+    return "\n\n".join(text for text in pages if text.strip()).strip()
+
+
+def legacy_extract(file_obj):
+    import fitz
+    from services.text_cleanup import clean_pages
+
+    file_bytes = file_obj.read()
+    with fitz.open(stream=file_bytes, filetype="pdf") as pdf:
+        pages = [page.get_text("text", sort=True) for page in pdf]
+    pages, _ = clean_pages(pages)
+    return join_pages(pages)
+
+
+def spooled_extract(file_obj):
+    from services.pdf_service import extract_pages_async
+
+    return join_pages(asyncio.run(extract_pages_async(file_obj)))
+
+
+def run(mode, path, queue):
+    extract = legacy_extract if mode == "legacy" else spooled_extract
+    import fitz  # noqa: F401  (import cost is not part of the request)
+    from services import pdf_service
+
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with open(path, "rb") as upload:
+        tracemalloc.start()
+        text = extract(upload)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if pdf_service._pool is not None:
+        pdf_service._pool.shutdown(wait=True)   # so the worker shows up in RUSAGE_CHILDREN
+    worker = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    queue.put((peak, (rss - baseline_rss) * 1024, worker * 1024, len(text)))
+
+
+def main(num_pages: int, image_kb: int):
+    data = make_heavy_pdf(num_pages, image_kb)
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+        f.write(data)
+        path = f.name
+
+    # A fresh extraction cache, so the spooled run parses every page
+    os.environ["PDF_CACHE_DIR"] = tempfile.mkdtemp(prefix="bench-pdf-cache-")
+    ctx = multiprocessing.get_context("spawn")
+    print(f"upload: {num_pages} pages, {len(data) / 1e6:.1f} MB")
+    print(f"{'mode':<10}{'tracemalloc peak':>18}{'RSS growth':>14}{'worker RSS':>14}{'text chars':>12}")
+    results = {}
+    try:
+        for mode in ("legacy", "spooled"):
+            queue = ctx.Queue()
+            proc = ctx.Process(target=run, args=(mode, path, queue))
+            proc.start()
+            peak, rss, worker, chars = queue.get()
+            proc.join()
+            worker = f"{worker / 1e6:.1f}MB" if worker else "-"
+            print(f"{mode:<10}{peak / 1e6:>16.1f}MB{rss / 1e6:>12.1f}MB{worker:>14}{chars:>12}")
+            results[mode] = chars
+    finally:
+        os.unlink(path)
+        shutil.rmtree(os.environ["PDF_CACHE_DIR"], ignore_errors=True)
+    assert results["legacy"] == results["spooled"], "both sides must produce the same cleaned text"
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 100)
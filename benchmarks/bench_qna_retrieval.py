@@ -0,0 +1,81 @@
+# ================================================================
+#  BENCHMARK: Retrieval-backed QnA vs full-document prompts
+#  Asks 10 questions about a synthetic 80-page document, first with
+#  the old path (whole text in every prompt), then with the BM25
+#  top-k path. The stub model charges latency per prompt character,
+#  like a real provider does for prefill.
+#
+#  Run:  python benchmarks/bench_qna_retrieval.py [PAGES] [QUESTIONS]
+# ================================================================
+
+import asyncio
+import sys
+import time
+
+import stubs
+from services import ai_service
+from services.chunking import CHARS_PER_TOKEN, PAGE_BREAK
+from services.retrieval import get_index
+
+SUBJECTS = [
+    "mitochondria", "ribosome", "osmosis", "enzyme", "chloroplast", "neuron", "glacier",
+    "volcano", "tectonic", "monsoon", "photon", "isotope", "catalyst", "polymer", "alloy",
+    "magnetism", "inertia", "friction", "refraction", "entropy",
+]
+
+
+def build_document(pages: int) -> str:
+    texts = []
+    for i in range(pages):
+        subject = SUBJECTS[i % len(SUBJECTS)]
+        texts.append(
+            f"The {subject} section {i} explains how {subject} {i} behaves under exam conditions. "
+            + stubs.synthetic_page_text(i, 300)
+        )
+    return PAGE_BREAK.join(texts)
+
+
+async def run(text: str, questions, full_context: bool):
+    fake = stubs.install_fake_llm(latency=0.3, per_char_latency=0.00002)
+    ai_service.QNA_FULL_CONTEXT_TOKENS = 10**9 if full_context else 3000
+
+    start = time.perf_counter()
+    for _, question in questions:
+        await ai_service.answer_question(text, question, use_cache=False)
+    elapsed = time.perf_counter() - start
+
+    return {"seconds": elapsed, "prompt_tokens": fake.prompt_chars // CHARS_PER_TOKEN}
+
+
+def retrieval_recall(text: str, questions) -> int:
+    """How many questions had their target page among the top-k passages."""
+    index = get_index(text)
+    hits = 0
+    for page, question in questions:
+        pages = {chunk.page_start for _, chunk in index.search(question, k=ai_service.QNA_TOP_K)}
+        hits += (page + 1) in pages
+    return hits
+
+
+async def main(pages: int, n_questions: int):
+    text = build_document(pages)
+    questions = [
+        (i * 7 % pages, f"How does {SUBJECTS[(i * 7 % pages) % len(SUBJECTS)]} {i * 7 % pages} behave?")
+        for i in range(n_questions)
+    ]
+
+    full = await run(text, questions, full_context=True)
+    retrieval = await run(text, questions, full_context=False)
+
+    print(f"document                 : {pages} pages, ~{len(text) // CHARS_PER_TOKEN} tokens")
+    print(f"questions                : {n_questions}")
+    print(f"full-document prompts    : {full['prompt_tokens']:>9} tokens  {full['seconds']:.2f}s")
+    print(f"top-k retrieval prompts  : {retrieval['prompt_tokens']:>9} tokens  {retrieval['seconds']:.2f}s")
+    print(f"prompt token reduction   : {full['prompt_tokens'] / max(retrieval['prompt_tokens'], 1):.1f}x")
+    print(f"target page in top-k     : {retrieval_recall(text, questions)}/{n_questions}")
+
+
+if __name__ == "__main__":
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 80
+    n_questions = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    asyncio.run(main(pages, n_questions))
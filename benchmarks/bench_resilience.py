@@ -0,0 +1,162 @@
+# ================================================================
+#  BENCHMARK: Resilient Groq client against a fault-injecting stub
+#  1. Transient 503s: success rate with classified retries.
+#  2. Slow tail: p50/p99 with and without hedged requests.
+#  3. Outage: the circuit breaker opens and later calls fail fast.
+#  4. Cancellation: a half-open probe cancelled mid-flight (client
+#     left a /stream route) must not wedge the breaker, a stale probe
+#     is given up after reset_timeout, and a cancelled hedged call
+#     leaves no attempt running upstream. A 400 is no verdict either:
+#     it neither closes a half-open circuit nor resets the failure count.
+#
+#  Run:  python benchmarks/bench_resilience.py [CALLS]
+# ================================================================
+
+import asyncio
+import statistics
+import sys
+import time
+
+import stubs
+from services import ai_service
+from services.llm_resilience import CircuitBreaker, LLMUnavailable, ResilientCaller
+
+
+def fresh_caller(**kwargs):
+    defaults = dict(timeout=10, max_retries=3, backoff_base=0.05, backoff_max=0.5,
+                    breaker=CircuitBreaker(failure_threshold=5, reset_timeout=30))
+    defaults.update(kwargs)
+    ai_service.llm_caller = ResilientCaller(**defaults)
+    return ai_service.llm_caller
+
+
+async def run_calls(n: int, concurrency: int = 10):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+
+    async def one(i):
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await ai_service.ai(f"Explain topic {i}", use_cache=False)
+                latencies.append(time.perf_counter() - start)
+            except LLMUnavailable:
+                failures += 1
+
+    await asyncio.gather(*(one(i) for i in range(n)))
+    return latencies, failures
+
+
+def pct(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))] if ordered else float("nan")
+
+
+async def main(n: int):
+    # 1. Transient errors
+    fake = stubs.install_fake_llm(latency=0.05, fail_rate=0.2, fail_status=503)
+    caller = fresh_caller(max_retries=0)
+    _, failed_plain = await run_calls(n)
+    fake = stubs.install_fake_llm(latency=0.05, fail_rate=0.2, fail_status=503)
+    caller = fresh_caller()
+    _, failed_retry = await run_calls(n)
+    print(f"[transient 20% 503]  no retries: {n - failed_plain}/{n} ok   "
+          f"with retries: {n - failed_retry}/{n} ok ({caller.retries} retries)")
+
+    # 2. Slow tail (3% of calls stall for 3 s; hedging fires after the p95 latency)
+    #    Each run is warmed up first so the p95 estimate has samples.
+    stubs.install_fake_llm(latency=0.1)
+    fresh_caller(hedge=False)
+    await run_calls(30)
+    stubs.install_fake_llm(latency=0.1, slow_rate=0.03, slow_latency=3.0)
+    plain, _ = await run_calls(n)
+
+    stubs.install_fake_llm(latency=0.1)
+    caller = fresh_caller(hedge=True, hedge_min_delay=0.15)
+    await run_calls(30)
+    stubs.install_fake_llm(latency=0.1, slow_rate=0.03, slow_latency=3.0)
+    hedged, _ = await run_calls(n)
+    print(f"[slow tail 3% x 3s]   p50 {statistics.median(plain):.2f}s p99 {pct(plain, 0.99):.2f}s   "
+          f"hedged: p50 {statistics.median(hedged):.2f}s p99 {pct(hedged, 0.99):.2f}s "
+          f"({caller.hedges} hedges, {caller.hedge_wins} won)")
+
+    # 3. Outage
+    fake = stubs.install_fake_llm(latency=0.05, fail_rate=1.0, fail_status=503)
+    caller = fresh_caller()
+    start = time.perf_counter()
+    _, failed = await run_calls(n, concurrency=1)
+    elapsed = time.perf_counter() - start
+    print(f"[outage 100% 503]    {failed}/{n} failed in {elapsed:.2f}s, provider saw {fake.calls} calls, "
+          f"breaker {caller.breaker.stats()['state']}")
+
+    # 4. Cancellation
+    await cancellation()
+
+
+async def cancelled(caller, fake, after: float):
+    """Start one provider call through `caller` and cancel it after `after` seconds."""
+    task = asyncio.ensure_future(caller.call(lambda: fake.chat.completions.create(
+        model="stub", messages=[{"role": "user", "content": "Explain osmosis"}])))
+    await asyncio.sleep(after)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+async def cancellation():
+    # Cancelled probe: threshold 1, so one 503 opens the circuit
+    fake = stubs.install_fake_llm(latency=0.05, fail_rate=1.0, fail_status=503)
+    caller = fresh_caller(max_retries=0, breaker=CircuitBreaker(failure_threshold=1, reset_timeout=0.2))
+    _, failed = await run_calls(1, concurrency=1)
+    assert failed == 1 and caller.breaker.state == "open"
+    await asyncio.sleep(0.25)
+    fake = stubs.install_fake_llm(latency=1.0)
+    await cancelled(caller, fake, 0.05)
+    assert caller.breaker.state == "half_open" and not caller.breaker._probe_in_flight
+    fake.latency = 0.05
+    _, failed = await run_calls(1, concurrency=1)
+    assert failed == 0 and caller.breaker.state == "closed", caller.breaker.stats()
+
+    # Our own 400 as the probe: the circuit stays half-open, slot freed
+    fake = stubs.install_fake_llm(latency=0.05, fail_rate=1.0, fail_status=503)
+    caller = fresh_caller(max_retries=0, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=0.2))
+    await run_calls(2, concurrency=1)
+    assert caller.breaker.state == "open"
+    await asyncio.sleep(0.25)
+    fake.fail_status = 400
+    [error] = await asyncio.gather(ai_service.ai("Explain osmosis", use_cache=False), return_exceptions=True)
+    assert getattr(error, "status_code", None) == 400, error
+    assert caller.breaker.state == "half_open" and not caller.breaker._probe_in_flight, caller.breaker.stats()
+    # ... and while closed, a 400 between two 503s does not reset the count
+    caller.breaker.record_success()
+    for status in (503, 400, 503):
+        fake.fail_status = status
+        await asyncio.gather(ai_service.ai("Explain osmosis", use_cache=False), return_exceptions=True)
+    assert caller.breaker.state == "open", caller.breaker.stats()
+
+    # Stale probe (lost without any exception reaching the caller)
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.1)
+    breaker.record_failure()
+    await asyncio.sleep(0.15)
+    assert breaker.before_call() is True
+    try:
+        breaker.before_call()
+        raise AssertionError("second probe let through while the first is fresh")
+    except LLMUnavailable:
+        pass
+    await asyncio.sleep(0.15)
+    assert breaker.before_call() is True
+
+    # Cancelled hedged call: both primary and backup must stop
+    fake = stubs.install_fake_llm(latency=1.0)
+    caller = fresh_caller(hedge=True, hedge_min_delay=0.05)
+    caller.hedge_delay = lambda: 0.05
+    await cancelled(caller, fake, 0.2)
+    await asyncio.sleep(0.01)
+    assert caller.hedges == 1 and fake.in_flight == 0, fake.in_flight
+    print("[cancellation]        cancelled probe frees the breaker, a 400 is no verdict, "
+          "stale probe expires, cancelled hedge leaves 0 calls upstream")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
@@ -0,0 +1,57 @@
+# ================================================================
+#  LOAD TEST: A class of students posting the same shared PDF text
+#  40 concurrent identical POSTs to /summarize-text and
+#  /make-flashcards must cost ONE upstream completion each; distinct
+#  texts must not be coalesced.
+#
+#  Run:  python benchmarks/bench_singleflight.py [STUDENTS]
+# ================================================================
+
+import asyncio
+import sys
+import time
+
+import stubs
+import httpx
+
+from main import app
+
+LECTURE = "Newton's laws describe the relationship between a body and the forces acting on it. " * 40
+
+
+async def burst(client, path, bodies):
+    start = time.perf_counter()
+    responses = await asyncio.gather(*(client.post(path, json=body) for body in bodies))
+    assert all(r.status_code == 200 and "error" not in r.json() for r in responses)
+    return time.perf_counter() - start
+
+
+async def main(students: int):
+    fake = stubs.install_fake_llm(latency=1.0)
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        print(f"{'scenario':<44}{'time':>8}{'upstream calls':>16}")
+        for path in ("/api/study/summarize-text", "/api/study/make-flashcards"):
+            before = fake.calls
+            # Same text, sent a few characters differently (whitespace
+            # normalization still maps them to one key)
+            bodies = [{"text": LECTURE + " " * (i % 3)} for i in range(students)]
+            elapsed = await burst(client, path, bodies)
+            calls = fake.calls - before
+            print(f"{students} identical -> {path:<28}{elapsed:>7.2f}s{calls:>16}")
+            assert calls == 1, f"{students} identical requests to {path} made {calls} upstream calls"
+
+        before = fake.calls
+        bodies = [{"text": f"{LECTURE} Student note {i}."} for i in range(students)]
+        elapsed = await burst(client, "/api/study/make-flashcards", bodies)
+        calls = fake.calls - before
+        print(f"{students} distinct  -> {'/api/study/make-flashcards':<28}{elapsed:>7.2f}s{calls:>16}")
+        assert calls == students, f"{students} distinct texts made {calls} upstream calls (coalesced?)"
+
+        stats = (await client.get("/api/llm/stats")).json()["singleflight"]
+    print(f"singleflight stats: {stats}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 40))
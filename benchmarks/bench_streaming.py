@@ -0,0 +1,76 @@
+# ================================================================
+#  BENCHMARK: Time-to-first-byte, buffered vs streaming routes
+#  Compares /api/study/{explain,make-notes,qna} against their
+#  /stream variants using a fake streaming model, and reports when
+#  the first token and the first parsed section reached the client.
+#
+#  Run:  python benchmarks/bench_streaming.py [LATENCY_SECONDS]
+# ================================================================
+
+import asyncio
+import json
+import sys
+import time
+
+import stubs
+import httpx
+
+from main import app
+
+TEXT = "Plants convert light energy into chemical energy through photosynthesis."
+
+ROUTES = [
+    ("/api/study/explain", {"topic": "Photosynthesis"}),
+    ("/api/study/make-notes", {"text": TEXT}),
+    ("/api/study/qna", {"text": TEXT, "question": "What do plants convert?"}),
+]
+
+
+async def buffered(client, path, body):
+    start = time.perf_counter()
+    r = await client.post(path, json=body, params={"regenerate": "true"})
+    assert r.status_code == 200, r.text
+    return time.perf_counter() - start
+
+
+async def streamed(client, path, body):
+    start = time.perf_counter()
+    first_token = first_section = None
+    result = None
+
+    params = {"regenerate": "true", "format": "ndjson"}
+    async with client.stream("POST", path + "/stream", json=body, params=params) as r:
+        assert r.status_code == 200
+        async for line in r.aiter_lines():
+            if not line:
+                continue
+            event = json.loads(line)
+            now = time.perf_counter() - start
+            if event["type"] == "token" and first_token is None:
+                first_token = now
+            elif event["type"] == "section" and first_section is None:
+                first_section = now
+            elif event["type"] == "done":
+                result = event["result"]
+
+    assert result is not None
+    return first_token, first_section, time.perf_counter() - start
+
+
+async def main(base_url: str, latency: float):
+    print(f"{'route':<24}{'buffered':>10}{'1st token':>11}{'1st section':>13}{'stream end':>12}")
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        for path, body in ROUTES:
+            total = await buffered(client, path, body)
+            token, section, end = await streamed(client, path, body)
+            section = f"{section:.2f}s" if section is not None else "-"
+            print(f"{path:<24}{total:>9.2f}s{token:>10.2f}s{section:>13}{end:>11.2f}s")
+
+
+if __name__ == "__main__":
+    latency = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+    stubs.install_fake_llm(latency=latency, first_token_latency=latency / 20)
+
+    # A real server: ASGITransport would buffer the stream and hide TTFB
+    with stubs.serve_app(app) as base_url:
+        asyncio.run(main(base_url, latency))
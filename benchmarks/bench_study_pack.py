@@ -0,0 +1,140 @@
+# ================================================================
+#  BENCHMARK: Study pack vs four sequential calls
+#  A signed-in student turns one lecture into notes, MCQs, flashcards
+#  and a mind map, against the stub provider (small model answers in
+#  SMALL_LATENCY, large model in LARGE_LATENCY) and in-memory Mongo:
+#    sequential  POST /make-notes, /make-mcq, /make-flashcards,
+#                /make-mindmap back to back (today's frontend flow)
+#    pack        one POST /study-pack?format=ndjson, artifacts read
+#                as they stream in
+#  Served by uvicorn over real HTTP so streamed artifacts are timed as
+#  they arrive. Every trial uses a fresh text, so nothing comes from
+#  the cache.
+#  Reports wall-clock per trial, time to the first artifact, token
+#  verifications and history records written; then checks that a
+#  second pack on the same text is served from the cache entries the
+#  single routes wrote, and that parts whose output cannot be parsed
+#  come back as error events and stay out of the history record.
+#
+#  Run:  python benchmarks/bench_study_pack.py [TRIALS] [LARGE_LATENCY] [SMALL_LATENCY]
+# ================================================================
+
+import asyncio
+import json
+import statistics
+import sys
+import time
+
+import stubs
+import httpx
+
+import auth_utils
+from main import app
+from services.history_service import history_writer
+from services.model_router import model_router
+
+SEQUENTIAL = [
+    ("notes", "/api/study/make-notes", "notes_data"),
+    ("mcqs", "/api/study/make-mcq", "mcqs"),
+    ("flashcards", "/api/study/make-flashcards", "flashcards"),
+    ("mindmap", "/api/study/make-mindmap", "mermaid_code"),
+]
+
+
+def lecture(trial: int) -> str:
+    return f"Lecture {trial}.\n\n" + "\n\n".join(stubs.synthetic_page_text(trial * 10 + p, 250) for p in range(3))
+
+
+async def sequential(client, headers, text):
+    start = time.perf_counter()
+    first = None
+    results = {}
+    for name, path, key in SEQUENTIAL:
+        r = await client.post(path, json={"text": text}, headers=headers)
+        assert r.status_code == 200 and key in r.json(), r.text
+        results[name] = r.json()[key]
+        first = first or time.perf_counter() - start
+    return time.perf_counter() - start, first, results
+
+
+async def pack(client, headers, text, errors=None):
+    start = time.perf_counter()
+    first = None
+    results = {}
+    async with client.stream("POST", "/api/study/study-pack", params={"format": "ndjson"},
+                             json={"text": text}, headers=headers) as r:
+        assert r.status_code == 200
+        async for line in r.aiter_lines():
+            if not line:
+                continue
+            event = json.loads(line)
+            if errors is not None and event["type"] == "error":
+                errors.append(event["name"])
+                continue
+            assert event["type"] != "error", event
+            if event["type"] == "artifact":
+                results[event["name"]] = event["result"]
+                first = first or time.perf_counter() - start
+    return time.perf_counter() - start, first, results
+
+
+async def measure(label, run, client, headers, history, trials, offset):
+    decodes_before = auth_utils.claims_cache.misses + auth_utils.claims_cache.hits
+    records_before = len(history.docs)
+    totals, firsts = [], []
+    for trial in range(trials):
+        total, first, results = await run(client, headers, lecture(offset + trial))
+        assert set(results) == {"notes", "mcqs", "flashcards", "mindmap"}, results.keys()
+        totals.append(total)
+        firsts.append(first)
+    await asyncio.sleep(history_writer.flush_interval + 0.2)  # let the batch writer catch up
+    verifications = auth_utils.claims_cache.misses + auth_utils.claims_cache.hits - decodes_before
+    print(f"{label:<12}{statistics.median(totals) * 1000:>10.0f}ms{statistics.median(firsts) * 1000:>14.0f}ms"
+          f"{verifications / trials:>12.0f}{(len(history.docs) - records_before) / trials:>15.0f}")
+    return statistics.median(totals)
+
+
+async def main(trials: int, large_latency: float, small_latency: float):
+    fake = stubs.install_fake_llm(latency=large_latency, model_latency={model_router.small_model: small_latency})
+    token = stubs.install_test_auth()
+    history = stubs.install_memory_mongo(latency=0.002)["history"]
+    headers = {"Authorization": token("student")}
+    history_writer.flush_interval = 0.05
+
+    with stubs.serve_app(app) as base_url:
+        async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+            await run_all(client, fake, headers, history, trials, large_latency, small_latency)
+    print("✅ one history record per pack; repeat pack served from the single-route cache; "
+          "unparseable parts reported as errors")
+
+
+async def run_all(client, fake, headers, history, trials, large_latency, small_latency):
+    print(f"median of {trials} trials (large model {large_latency}s, small model {small_latency}s)")
+    print(f"{'flow':<12}{'wall-clock':>12}{'1st artifact':>16}{'auth/trial':>12}{'history/trial':>15}")
+    seq = await measure("sequential", sequential, client, headers, history, trials, 0)
+    fused = await measure("pack", pack, client, headers, history, trials, 1000)
+    print(f"study pack is {seq / fused:.1f}x faster end to end")
+
+    # The pack shares cache entries with the single routes
+    calls = fake.calls
+    _, _, results = await pack(client, headers, lecture(0))
+    assert fake.calls == calls, "pack on a text the single routes already saw should be all cache hits"
+    assert len(results) == 4
+
+    # Every model answers with prose: each part is an error event and the
+    # pack writes no history
+    fake.garble_rate = {model_router.small_model: 1.0, model_router.large_model: 1.0}
+    await asyncio.sleep(history_writer.flush_interval + 0.2)
+    records = len(history.docs)
+    errors = []
+    _, _, results = await pack(client, headers, lecture(5000), errors)
+    fake.garble_rate = {}
+    await asyncio.sleep(history_writer.flush_interval + 0.2)
+    assert results == {} and sorted(errors) == ["flashcards", "mcqs", "mindmap", "notes"], (results, errors)
+    assert len(history.docs) == records, "a pack with no usable parts should not be saved"
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 10,
+                     float(sys.argv[2]) if len(sys.argv) > 2 else 1.0,
+                     float(sys.argv[3]) if len(sys.argv) > 3 else 0.3))
@@ -0,0 +1,107 @@
+# ================================================================
+#  CORPUS CHECKS + BENCHMARK: PDF text cleanup
+#  Runs clean_pages() over a small corpus of page layouts we see in
+#  course PDFs and asserts what must be stripped and what must
+#  survive, then measures throughput and chars/tokens saved on a
+#  large synthetic book.
+#
+#  Run:  python benchmarks/bench_text_cleanup.py [PAGES]
+# ================================================================
+
+import sys
+import time
+
+import stubs
+
+from services.text_cleanup import clean_pages
+
+
+def lecture_notes(n=12):
+    """Same header on every page, 'Page N of M' footer."""
+    return [
+        f"CS101 Data Structures  -  Fall 2024\n\n"
+        f"Lecture {i + 1}\n{stubs.synthetic_page_text(i, 80)}\n"
+        f"Definition: a heap is a tree.\n{stubs.synthetic_page_text(i + 100, 40)}\n\n"
+        f"Page {i + 1} of {n}"
+        for i in range(n)
+    ]
+
+
+def textbook(n=20):
+    """Alternating book/chapter headers, bare page numbers, hyphenated breaks."""
+    return [
+        ("Introduction to Algorithms" if i % 2 == 0 else "Chapter 3: Sorting") + "\n"
+        + stubs.synthetic_page_text(i, 60) + "\n"
+        + f"Step {i + 1} of the partition is an algo-\nrithm that sorts {i + 5} keys in linear time.\n"
+        + f"{i + 1}"
+        for i in range(n)
+    ]
+
+
+def roman_frontmatter(n=6):
+    numerals = ["i", "ii", "iii", "iv", "v", "vi"]
+    return [f"Preface\n{stubs.synthetic_page_text(i, 40)}\n{numerals[i]}" for i in range(n)]
+
+
+def short_handout():
+    """Two pages: too few to call anything a running header."""
+    return ["Thermodynamics\nEnergy is conserved.\n1", "Thermodynamics\nEntropy increases.\n2"]
+
+
+def answer_key(n=4):
+    """Years, option letters and numerals near the edges are content; only the last line is a page number."""
+    return [
+        f"Quiz {i + 1} answers\n{1945 + i}\nVitamin:\n{stubs.synthetic_page_text(i, 30)}\n"
+        f"{'CBDA'[i]}\n{'vxil'[i]}\nPage {i + 1}\n{i + 10}"
+        for i in range(n)
+    ]
+
+
+def layout_whitespace():
+    return ["Heading   with    gaps\t\there\n\n\n\n\nNext   paragraph   text.   "]
+
+
+def check(name, pages, absent=(), present=()):
+    cleaned, stats = clean_pages(pages)
+    text = "\n".join(cleaned)
+    assert len(cleaned) == len(pages), f"{name}: page count changed"
+    for needle in absent:
+        assert needle not in text, f"{name}: {needle!r} should have been stripped"
+    for needle in present:
+        assert needle in text, f"{name}: {needle!r} must survive"
+    print(f"  ok  {name:<22} saved {stats.chars_saved:>6} chars  {stats.to_dict()}")
+
+
+def corpus_checks():
+    print("corpus checks:")
+    check("lecture notes", lecture_notes(),
+          absent=("CS101 Data Structures", "Page 3 of 12"),
+          present=("Lecture 3", "Definition: a heap is a tree."))
+    check("textbook", textbook(),
+          absent=("Introduction to Algorithms", "Chapter 3: Sorting", "\n7\n", "algo-\nrithm"),
+          present=("algorithm that sorts 7 keys in linear time",))
+    check("roman front matter", roman_frontmatter(),
+          absent=("Preface", "\niv", "\nvi"), present=("Page topic 3:",))
+    check("short handout", short_handout(),
+          absent=("\n1",), present=("Thermodynamics", "Energy is conserved."))
+    check("answer key", answer_key(),
+          absent=("Page 2", "\n11"), present=("1945\n", "1947\n", "\nC\nv", "\nD\ni"))
+    check("layout whitespace", layout_whitespace(),
+          absent=("   ", "\n\n\n"), present=("Heading with gaps here\n\nNext paragraph text.",))
+
+
+def throughput(num_pages: int):
+    pages = lecture_notes(num_pages) + textbook(num_pages)
+    size = sum(map(len, pages))
+    start = time.perf_counter()
+    _, stats = clean_pages(pages)
+    elapsed = time.perf_counter() - start
+    print(f"\n{len(pages)} pages, {size / 1e6:.1f} MB in {elapsed * 1000:.0f} ms "
+          f"({size / 1e6 / elapsed:.0f} MB/s)")
+    print(f"saved {stats.chars_saved} chars ({100 * stats.chars_saved / size:.1f}%), "
+          f"~{stats.tokens_saved} prompt tokens")
+
+
+if __name__ == "__main__":
+    corpus_checks()
+    throughput(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,779 @@
+# ================================================================
+#  OFFLINE STUBS FOR BENCHMARKS
+#  A local stand-in for the Groq client so benchmarks run without
+#  network access or API keys.
+# ================================================================
+
+import asyncio
+import bisect
+import collections
+import contextlib
+import json
+import os
+import random
+import re
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+from pymongo.errors import OperationFailure
+
+# Make the repo root importable when scripts run as `python benchmarks/x.py`
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# Services read these at import time; never talk to the real providers.
+os.environ.setdefault("GROQ_API_KEY", "stub-key")
+os.environ.setdefault("MONGO_URI", "mongodb://127.0.0.1:27017/?serverSelectionTimeoutMS=500")
+os.environ.setdefault("MONGO_SERVER_SELECTION_TIMEOUT_MS", "500")
+# A fresh extraction cache per run, so timings never depend on earlier runs
+os.environ.setdefault("PDF_CACHE_DIR", tempfile.mkdtemp(prefix="bench-pdf-cache-"))
+
+
+# ================================================================
+#  CANNED RESPONSES (one per generator prompt)
+# ================================================================
+def default_responder(prompt: str) -> str:
+    if "Mermaid.js" in prompt:
+        return "graph TD\nA[Topic] --> B(Detail one)\nA --> C(Detail two)"
+    if "Flashcards" in prompt:
+        return json.dumps([{"front": f"Term {i}", "back": f"Definition {i}"} for i in range(8)])
+    if "multiple-choice" in prompt:
+        return json.dumps([
+            {
+                "question": f"Question {i}?",
+                "options": ["A", "B", "C", "D"],
+                "correctAnswer": "A",
+                "explanation": "Because A.",
+            }
+            for i in range(5)
+        ])
+    if "Cornell" in prompt:
+        return json.dumps({
+            "title": "Notes",
+            "summary": "Stub notes.",
+            "sections": [{"heading": "Core", "points": ["Point one", "Point two"]}],
+        })
+    if "Document Analyst" in prompt:
+        return json.dumps({
+            "document_type": "Academic",
+            "emoji": "📄",
+            "title": "Stub Summary",
+            "overview": "A stub overview.",
+            "quick_stats": [],
+            "sections": [{"heading": "Part", "content": "Content.", "bullets": ["One", "Two"]}],
+            "key_takeaways": ["Takeaway"],
+        })
+    if "Exam Tutor" in prompt:
+        # Quote the first sentence of the context, like a well-behaved model
+        context = prompt.split("CONTEXT TEXT:", 1)[-1].split("USER QUESTION:", 1)[0]
+        lines = [l for l in context.strip().splitlines() if l.strip() and not l.startswith("[Passage")]
+        evidence = (lines[0].split(". ")[0] if lines else "").strip()
+        return json.dumps({
+            "success": True,
+            "answer": "The answer.",
+            "evidence": evidence,
+            "follow_ups": ["Why?", "How?", "When?"],
+        })
+    return json.dumps([{
+        "title": "Introduction",
+        "paragraph": "Stub explanation.",
+        "bullets": ["Fact"],
+        "examples": ["Example"],
+        "faqs": [],
+        "important_terms": [],
+    }])
+
+
+# ================================================================
+#  FAKE GROQ CLIENT (mirrors client.chat.completions.create)
+# ================================================================
+class _Message:
+    def __init__(self, content):
+        self.content = content
+
+
+class _Choice:
+    def __init__(self, content):
+        self.message = _Message(content)
+
+
+class _Completion:
+    def __init__(self, content):
+        self.choices = [_Choice(content)]
+
+
+class _Delta:
+    def __init__(self, content):
+        self.content = content
+
+
+class _StreamChoice:
+    def __init__(self, content):
+        self.delta = _Delta(content)
+
+
+class _StreamChunk:
+    def __init__(self, content):
+        self.choices = [_StreamChoice(content)]
+
+
+async def _stream_pieces(owner, prompt, model=None):
+    """
+    Emit the canned response a few characters at a time. The first
+    piece arrives after `first_token_latency`; the rest are spread over
+    the remaining completion time, like a real streaming model.
+    """
+    text = owner.respond(prompt, model)
+    size = owner.stream_chunk_chars
+    pieces = [text[i:i + size] for i in range(0, len(text), size)] or [""]
+    total = owner.latency_for(prompt, model)
+    first = min(owner.first_token_latency, total)
+    gap = (total - first) / max(len(pieces) - 1, 1)
+
+    try:
+        await asyncio.sleep(first)
+        for n, piece in enumerate(pieces):
+            if n:
+                await asyncio.sleep(gap)
+            yield _StreamChunk(piece)
+    finally:
+        owner.in_flight -= 1
+
+
+def provider_error(status: int):
+    """Build the same exception type the Groq SDK raises for `status`."""
+    import groq
+    import httpx
+
+    request = httpx.Request("POST", "https://api.groq.com/openai/v1/chat/completions")
+    response = httpx.Response(status, request=request, headers={"retry-after": "0"})
+    cls = {429: groq.RateLimitError, 400: groq.BadRequestError}.get(
+        status, groq.InternalServerError if status >= 500 else groq.APIStatusError
+    )
+    return cls(f"stub error {status}", response=response, body=None)
+
+
+class _Completions:
+    def __init__(self, owner):
+        self._owner = owner
+
+    async def create(self, model, messages, temperature=None, stream=False, **kwargs):
+        owner = self._owner
+        owner.calls += 1
+        owner.calls_by_model[model] = owner.calls_by_model.get(model, 0) + 1
+        owner.prompt_chars += len(messages[-1]["content"])
+        owner.in_flight += 1
+        owner.max_in_flight = max(owner.max_in_flight, owner.in_flight)
+        try:
+            await owner.inject_faults()
+        except BaseException:
+            owner.in_flight -= 1
+            raise
+        if stream:
+            return _stream_pieces(owner, messages[-1]["content"], model)
+        try:
+            prompt = messages[-1]["content"]
+            await asyncio.sleep(owner.latency_for(prompt, model))
+            return _Completion(owner.respond(prompt, model))
+        finally:
+            owner.in_flight -= 1
+
+
+class _Chat:
+    def __init__(self, owner):
+        self.completions = _Completions(owner)
+
+
+class FakeGroq:
+    """
+    Async stand-in for `groq.AsyncGroq`.
+    - latency: fixed seconds per completion.
+    - per_char_latency: extra seconds per prompt character (models prompt size cost).
+    - first_token_latency / stream_chunk_chars: shape of `stream=True` responses.
+    Fault injection (seeded, reproducible):
+    - fail_rate / fail_status: fraction of calls that raise a provider error.
+    - slow_rate / slow_latency: fraction of calls that stall first (latency tail).
+    Per model (dicts keyed by model name):
+    - model_latency: overrides `latency` for that model.
+    - garble_rate: fraction of answers replaced by prose with no JSON.
+    """
+
+    def __init__(self, latency=0.5, per_char_latency=0.0, responder=default_responder,
+                 first_token_latency=0.05, stream_chunk_chars=8,
+                 fail_rate=0.0, fail_status=503, slow_rate=0.0, slow_latency=5.0, seed=42,
+                 model_latency=None, garble_rate=None):
+        self.latency = latency
+        self.model_latency = model_latency or {}
+        self.garble_rate = garble_rate or {}
+        self.per_char_latency = per_char_latency
+        self.responder = responder
+        self.first_token_latency = first_token_latency
+        self.stream_chunk_chars = stream_chunk_chars
+        self.fail_rate = fail_rate
+        self.fail_status = fail_status
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.rng = random.Random(seed)
+        self.failures_injected = 0
+        self.calls = 0
+        self.calls_by_model = {}
+        self.garbled = 0
+        self.prompt_chars = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.chat = _Chat(self)
+
+    def latency_for(self, prompt: str, model: str = None) -> float:
+        return self.model_latency.get(model, self.latency) + self.per_char_latency * len(prompt)
+
+    def respond(self, prompt: str, model: str = None) -> str:
+        rate = self.garble_rate.get(model, 0.0)
+        if rate and self.rng.random() < rate:
+            self.garbled += 1
+            return "Sure! Here is what you asked for, explained in plain words."
+        return self.responder(prompt)
+
+    async def inject_faults(self):
+        if self.slow_rate and self.rng.random() < self.slow_rate:
+            await asyncio.sleep(self.slow_latency)
+        if self.fail_rate and self.rng.random() < self.fail_rate:
+            self.failures_injected += 1
+            await asyncio.sleep(self.latency / 10)
+            raise provider_error(self.fail_status)
+
+
+def install_fake_llm(**kwargs) -> FakeGroq:
+    """Swap the Groq client used by services.ai_service for a FakeGroq."""
+    from services import ai_service
+
+    fake = FakeGroq(**kwargs)
+    ai_service.client = fake
+    return fake
+
+
+# ================================================================
+#  SYNTHETIC DOCUMENTS
+# ================================================================
+LOREM = (
+    "Photosynthesis converts light energy into chemical energy stored in glucose. "
+    "Chlorophyll in the thylakoid membranes absorbs red and blue wavelengths. "
+    "The Calvin cycle fixes carbon dioxide using ATP and NADPH from the light reactions. "
+    "Stomata regulate gas exchange and water loss through transpiration. "
+)
+
+
+def synthetic_page_text(page_no: int, words: int = 350) -> str:
+    body = (LOREM * (words // 40 + 1)).split()[:words]
+    return f"Chapter {page_no // 10 + 1}\nPage topic {page_no}: " + " ".join(body)
+
+
+def make_pdf(num_pages: int, words_per_page: int = 350, overrides: dict = None) -> bytes:
+    """Build an in-memory text PDF. `overrides` maps page index -> replacement text."""
+    import fitz
+
+    overrides = overrides or {}
+    doc = fitz.open()
+    for i in range(num_pages):
+        page = doc.new_page()
+        text = overrides.get(i, synthetic_page_text(i, words_per_page))
+        page.insert_textbox(fitz.Rect(40, 40, 560, 800), text, fontsize=8)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+
+# ================================================================
+#  REAL HTTP SERVER (for measurements ASGITransport cannot make,
+#  e.g. streaming time-to-first-byte, which it buffers away)
+# ================================================================
+@contextlib.contextmanager
+def serve_app(app):
+    """Run `app` under uvicorn in a background thread; yields the base URL."""
+    import uvicorn
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="on")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+
+    while not server.started:
+        time.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+
+
+# ================================================================
+#  IN-MEMORY MONGODB STAND-IN
+#  Enough of the PyMongo collection API for the history/jobs code:
+#  insert_one/insert_many, find (filter, projection, sort, skip,
+#  limit), find_one, update_one ($set/$unset/$max), count_documents,
+#  create_index, plus bulk_write on the blocking flavour. Every call
+#  costs one simulated round trip (`latency` seconds); the async
+#  flavour sleeps with asyncio, the blocking flavour with time.sleep,
+#  like the sync driver would.
+#  A compound index {eq_field: 1, a: d, b: d} is kept as sorted
+#  buckets, walked in index order, with a range seek for keyset
+#  predicates; `docs_examined` counts what each query touched.
+#  A text index {eq_field: 1, field: "text"} keeps postings per
+#  (eq value, term), so $text only touches matching documents; terms
+#  are OR-ed and scored by frequency (no phrases or negation).
+# ================================================================
+def _get_path(doc, path):
+    for part in path.split("."):
+        if not isinstance(doc, dict) or part not in doc:
+            return None
+        doc = doc[part]
+    return doc
+
+
+def _match_value(value, cond):
+    if isinstance(cond, dict) and cond and all(k.startswith("$") for k in cond):
+        for op, arg in cond.items():
+            if op == "$in" and value not in arg:
+                return False
+            if op == "$nin" and value in arg:
+                return False
+            if op == "$ne" and value == arg:
+                return False
+            if op == "$exists" and (value is not None) != bool(arg):
+                return False
+            if op == "$regex":
+                flags = re.IGNORECASE if "i" in cond.get("$options", "") else 0
+                if not isinstance(value, str) or not re.search(arg, value, flags):
+                    return False
+            if op in ("$lt", "$lte", "$gt", "$gte"):
+                if value is None:
+                    return False
+                if op == "$lt" and not value < arg:
+                    return False
+                if op == "$lte" and not value <= arg:
+                    return False
+                if op == "$gt" and not value > arg:
+                    return False
+                if op == "$gte" and not value >= arg:
+                    return False
+        return True
+    return value == cond
+
+
+def match(doc, query) -> bool:
+    for key, cond in (query or {}).items():
+        if key == "$or":
+            if not any(match(doc, q) for q in cond):
+                return False
+        elif key == "$and":
+            if not all(match(doc, q) for q in cond):
+                return False
+        elif key == "$text":
+            continue  # resolved by the text index (MemoryCursor._text_scan)
+        elif not _match_value(_get_path(doc, key), cond):
+            return False
+    return True
+
+
+def project(doc, projection):
+    if not projection:
+        return dict(doc)
+    # {"$meta": ...} entries are computed fields, filled in by the cursor
+    include = [k for k, v in projection.items() if v and k != "_id" and not isinstance(v, dict)]
+    if include or projection.get("_id") == 1:
+        out = {}
+        for path in include:
+            value = _get_path(doc, path)
+            if value is None:
+                continue
+            *parents, leaf = path.split(".")
+            target = out
+            for part in parents:
+                target = target.setdefault(part, {})
+            target[leaf] = value
+        if projection.get("_id", 1) and "_id" in doc:
+            out["_id"] = doc["_id"]
+        return out
+    return {k: v for k, v in doc.items() if k not in projection}
+
+
+class MemoryIndex:
+    """{field: 1, sort keys...} as value -> [(sort key tuple, seq, doc)], kept ascending."""
+
+    def __init__(self, field, sort_keys):
+        self.field = field
+        self.sort_keys = sort_keys
+        self.buckets = {}
+        self._seq = 0
+
+    def key(self, doc):
+        return tuple(_get_path(doc, k) for k, _ in self.sort_keys)
+
+    def add(self, doc):
+        self._seq += 1
+        bisect.insort(self.buckets.setdefault(_get_path(doc, self.field), []), (self.key(doc), self._seq, doc))
+
+    def plan(self, query, sort):
+        """(bucket, reverse) if this index serves `query` sorted by `sort`, else None."""
+        value = (query or {}).get(self.field)
+        if value is None or isinstance(value, dict):
+            return None
+        # Buckets are ascending; an index is walkable in either direction
+        same_direction = len({d for _, d in sort}) == 1
+        prefix = self.sort_keys[:len(sort)]
+        if sort and same_direction and sort in (prefix, [(k, -d) for k, d in prefix]):
+            return self.buckets.get(value, []), sort[0][1] < 0
+        return None
+
+    def seek(self, query, bucket, reverse):
+        """Start position for {"$or": [{a: {$lt: x}}, {a: x, b: {$lt: y}}]} style keyset bounds."""
+        clauses = (query or {}).get("$or")
+        if not clauses or len(clauses) != 2 or len(self.sort_keys) < 2:
+            return None
+        (a, _), (b, _) = self.sort_keys[:2]
+        first, second = clauses
+        op = "$lt" if reverse else "$gt"
+        try:
+            bound = (first[a][op], second[b][op])
+        except (KeyError, TypeError):
+            return None
+        if reverse:
+            return bisect.bisect_left(bucket, (bound,)) - 1
+        return bisect.bisect_left(bucket, (bound, float("inf")))
+
+
+def text_terms(text: str):
+    """Lowercased, stopword-free, crudely stemmed terms (Mongo stems too)."""
+    from services.retrieval import tokenize
+    return [w[:-1] if len(w) > 3 and w.endswith("s") else w for w in tokenize(text)]
+
+
+class MemoryTextIndex:
+    """{field: 1, text_field: "text"} as (value, term) -> {_id: (doc, term frequency)}."""
+
+    def __init__(self, field, text_field):
+        self.field = field
+        self.text_field = text_field
+        self.postings = {}
+
+    def add(self, doc):
+        value = _get_path(doc, self.field)
+        text = _get_path(doc, self.text_field)
+        if not isinstance(text, str):
+            return
+        for term, tf in collections.Counter(text_terms(text)).items():
+            self.postings.setdefault((value, term), {})[doc["_id"]] = (doc, tf)
+
+    def search(self, query):
+        """[(doc, score)] for query["$text"], restricted to the equality prefix."""
+        value = (query or {}).get(self.field)
+        if value is None or isinstance(value, dict):
+            raise OperationFailure("text index with a prefix requires an equality match on the prefix field")
+        hits = {}
+        for term in set(text_terms(query["$text"]["$search"])):
+            for doc_id, (doc, tf) in self.postings.get((value, term), {}).items():
+                score = hits.get(doc_id, (doc, 0.0))[1]
+                hits[doc_id] = (doc, score + tf)
+        return list(hits.values())
+
+
+class MemoryCursor:
+    def __init__(self, collection, query, projection):
+        self._collection = collection
+        self._query = query
+        self._projection = projection
+        self._sort = []
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key, direction=None):
+        self._sort = list(key) if isinstance(key, (list, tuple)) else [(key, direction or 1)]
+        return self
+
+    def skip(self, n):
+        self._skip = n
+        return self
+
+    def limit(self, n):
+        self._limit = n
+        return self
+
+    def _results(self):
+        collection = self._collection
+        if "$text" in (self._query or {}):
+            return self._text_scan()
+        for index in collection.indexes.values():
+            plan = index.plan(self._query, self._sort)
+            if plan:
+                return self._index_scan(index, *plan)
+
+        # Collection scan + in-memory sort
+        collection.docs_examined += len(collection.docs)
+        docs = [d for d in collection.docs if match(d, self._query)]
+        for key, direction in reversed(self._sort):
+            docs.sort(key=lambda d: (_get_path(d, key) is not None, _get_path(d, key)), reverse=direction < 0)
+        docs = docs[self._skip:]
+        if self._limit:
+            docs = docs[:self._limit]
+        return [project(d, self._projection) for d in docs]
+
+    def _text_scan(self):
+        collection = self._collection
+        if collection.text_index is None:
+            raise OperationFailure("text index required for $text query")
+        hits = collection.text_index.search(self._query)
+        collection.docs_examined += len(hits)
+
+        # Matches are filtered and sorted in memory, like Mongo's TEXT stage
+        hits = [(d, score) for d, score in hits if match(d, self._query)]
+        for key, direction in reversed(self._sort):
+            hits.sort(key=lambda h: (_get_path(h[0], key) is not None, _get_path(h[0], key)),
+                      reverse=direction < 0)
+        hits = hits[self._skip:]
+        if self._limit:
+            hits = hits[:self._limit]
+
+        meta = [k for k, v in (self._projection or {}).items() if isinstance(v, dict) and "$meta" in v]
+        out = []
+        for doc, score in hits:
+            row = project(doc, self._projection)
+            for key in meta:
+                row[key] = float(score)
+            out.append(row)
+        return out
+
+    def _index_scan(self, index, bucket, reverse):
+        start = index.seek(self._query, bucket, reverse)
+        if start is None:
+            start = len(bucket) - 1 if reverse else 0
+        positions = range(start, -1, -1) if reverse else range(start, len(bucket))
+
+        wanted = self._skip + (self._limit or len(bucket))
+        out = []
+        for i in positions:
+            self._collection.docs_examined += 1
+            doc = bucket[i][2]
+            if match(doc, self._query):
+                out.append(doc)
+                if len(out) >= wanted:
+                    break
+        return [project(d, self._projection) for d in out[self._skip:]]
+
+    # Blocking driver
+    def __iter__(self):
+        self._collection._blocking_round_trip()
+        return iter(self._results())
+
+    # Async driver
+    async def to_list(self, length=None):
+        await self._collection._round_trip()
+        results = self._results()
+        return results[:length] if length else results
+
+    def __aiter__(self):
+        async def gen():
+            for doc in await self.to_list():
+                yield doc
+        return gen()
+
+
+class _InsertManyResult:
+    def __init__(self, ids):
+        self.inserted_ids = ids
+
+
+class MemoryCollection:
+    """Async collection stand-in (AsyncMongoClient API)."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.docs = []
+        self.indexes = {}
+        self.text_index = None
+        self.docs_examined = 0
+        self.round_trips = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def _round_trip(self):
+        self.round_trips += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+
+    def _blocking_round_trip(self):
+        self.round_trips += 1
+        time.sleep(self.latency)
+
+    # --- operations (shared by both flavours) ---
+    def _insert(self, doc):
+        doc.setdefault("_id", os.urandom(12).hex())
+        self.docs.append(doc)
+        for index in self.indexes.values():
+            index.add(doc)
+        if self.text_index is not None:
+            self.text_index.add(doc)
+        return doc["_id"]
+
+    def _create_index(self, keys, name=None):
+        name = name or "_".join(f"{k}_{d}" for k, d in keys)
+        if any(d == "text" for _, d in keys):
+            if self.text_index is None:
+                self.text_index = MemoryTextIndex(keys[0][0], keys[-1][0])
+                for doc in self.docs:
+                    self.text_index.add(doc)
+            return name
+        if len(keys) >= 2 and name not in self.indexes:
+            index = MemoryIndex(keys[0][0], [(k, d) for k, d in keys[1:]])
+            for doc in self.docs:
+                index.add(doc)
+            self.indexes[name] = index
+        return name
+
+    def _update(self, query, update):
+        """Apply `update` to the first match; returns that document (None if nothing matched)."""
+        for doc in self.docs:
+            if match(doc, query):
+                for path, value in update.get("$set", {}).items():
+                    *parents, leaf = path.split(".")
+                    target = doc
+                    for part in parents:
+                        target = target.setdefault(part, {})
+                    target[leaf] = value
+                for path in update.get("$unset", {}):
+                    *parents, leaf = path.split(".")
+                    target = doc
+                    for part in parents:
+                        target = target.get(part, {})
+                    target.pop(leaf, None)
+                for path, value in update.get("$max", {}).items():
+                    *parents, leaf = path.split(".")
+                    target = doc
+                    for part in parents:
+                        target = target.setdefault(part, {})
+                    if target.get(leaf) is None or value > target[leaf]:
+                        target[leaf] = value
+                for path, value in update.get("$inc", {}).items():
+                    *parents, leaf = path.split(".")
+                    target = doc
+                    for part in parents:
+                        target = target.setdefault(part, {})
+                    target[leaf] = target.get(leaf, 0) + value
+                return doc
+        return None
+
+    def find(self, query=None, projection=None):
+        return MemoryCursor(self, query, projection)
+
+    async def insert_one(self, doc):
+        await self._round_trip()
+        return self._insert(doc)
+
+    async def insert_many(self, docs, ordered=True):
+        await self._round_trip()
+        return _InsertManyResult([self._insert(d) for d in docs])
+
+    async def find_one(self, query=None, projection=None):
+        await self._round_trip()
+        for doc in self.docs:
+            if match(doc, query):
+                return project(doc, projection)
+        return None
+
+    async def update_one(self, query, update):
+        await self._round_trip()
+        self._update(query, update)
+
+    async def find_one_and_update(self, query, update, projection=None, return_document=False):
+        # One round trip, applied atomically (no await between match and write)
+        await self._round_trip()
+        before = next((dict(d) for d in self.docs if match(d, query)), None)
+        doc = self._update(query, update)
+        if doc is None:
+            return None
+        return project(doc if return_document else before, projection)
+
+    async def count_documents(self, query):
+        await self._round_trip()
+        return sum(1 for d in self.docs if match(d, query))
+
+    async def create_index(self, keys, name=None, **kwargs):
+        await self._round_trip()
+        return self._create_index(keys, name)
+
+
+class BlockingMemoryCollection(MemoryCollection):
+    """Same data and latency, but every call blocks the thread (sync MongoClient API)."""
+
+    def insert_one(self, doc):
+        self._blocking_round_trip()
+        return self._insert(doc)
+
+    def find_one(self, query=None, projection=None):
+        self._blocking_round_trip()
+        for doc in self.docs:
+            if match(doc, query):
+                return project(doc, projection)
+        return None
+
+    def bulk_write(self, requests, ordered=True):
+        self._blocking_round_trip()
+        by_id = {doc["_id"]: doc for doc in self.docs}
+        for op in requests:
+            # pymongo UpdateOne keeps its arguments in _filter / _doc
+            doc = by_id.get(op._filter.get("_id"))
+            if doc is not None:
+                self._update({"_id": doc["_id"]}, op._doc)
+
+
+def install_memory_mongo(latency: float = 0.002):
+    """Point history and job storage at in-memory collections; returns {name: collection}."""
+    import db.mongo
+    import routes.history
+    import services.history_service
+    from services.jobs import job_manager
+
+    history = MemoryCollection(latency)
+    jobs = MemoryCollection(latency)
+    db.mongo.history_collection_async = history
+    db.mongo.jobs_collection = jobs
+    routes.history.history_collection_async = history
+    services.history_service.history_collection_async = history
+    services.history_service.history_writer.collection = history
+    job_manager.collection = jobs
+    return {"history": history, "jobs": jobs}
+
+
+# ================================================================
+#  TEST AUTH (RS256 tokens accepted by auth_utils)
+# ================================================================
+def install_test_auth():
+    """Swap in a fresh RSA key pair; returns token(user_id) -> 'Bearer ...' header value."""
+    import jwt
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    import auth_utils
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    auth_utils.set_public_key(key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    ).decode())
+
+    def token(user_id: str, ttl: int = 3600) -> str:
+        now = int(time.time())
+        claims = {"sub": user_id, "email": f"{user_id}@example.edu", "iat": now, "exp": now + ttl}
+        return "Bearer " + jwt.encode(claims, key, algorithm="RS256")
+
+    return token
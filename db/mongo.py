@@ -1,4 +1,4 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, AsyncMongoClient
 import certifi
 import os
 
@@ -14,10 +14,29 @@ MONGO_URI = os.getenv(
 
 client = MongoClient(MONGO_URI, tlsCAFile=certifi.where())
 
+# -----------------------------
+# ⚡ Async client (history, jobs)
+# Used from async routes so Atlas round trips never block the event
+# loop. Connections are opened lazily; main.py's lifespan pings on
+# startup and closes the pool on shutdown.
+# -----------------------------
+async_client = AsyncMongoClient(
+    MONGO_URI,
+    tlsCAFile=certifi.where(),
+    maxPoolSize=int(os.getenv("MONGO_MAX_POOL_SIZE", "50")),
+    minPoolSize=int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+    maxIdleTimeMS=int(os.getenv("MONGO_MAX_IDLE_MS", "60000")),
+    waitQueueTimeoutMS=int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000")),
+    serverSelectionTimeoutMS=int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+    connectTimeoutMS=int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000")),
+    socketTimeoutMS=int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "10000")),
+)
+
 # -----------------------------
 # 📌 Main Database
 # -----------------------------
 db = client["ai-study-db"]
+async_db = async_client["ai-study-db"]
 
 # -----------------------------
 # 📘 Collections
@@ -29,3 +48,22 @@ users_collection = db["users"]
 
 # 📜 For history (summaries, notes, mcq, qna)
 history_collection = db["history"]
+history_collection_async = async_db["history"]
+
+# ⚡ Shared LLM result cache (optional tier, see services/cache.py)
+llm_cache_collection = db["llm_cache"]
+
+# ⏳ Background job records (see services/jobs.py)
+jobs_collection = async_db["jobs"]
+
+
+async def connect_async():
+    """Warm the async pool at startup; the app still starts if Mongo is down."""
+    try:
+        await async_client.admin.command("ping")
+    except Exception as e:
+        print(f"⚠️ MongoDB not reachable at startup: {e}")
+
+
+async def close_async():
+    await async_client.close()
@@ -4,42 +4,75 @@
 from dotenv import load_dotenv
 load_dotenv()
 
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
-from starlette.responses import Response
+from starlette.responses import Response, PlainTextResponse
 
 # 📌 IMPORTS (Updated to match your "routes" folder structure)
 from routes.summarize import router as summarize_router   # Matches summarize.py
 from routes.study_assistant import router as study_router # Matches study_assistant.py
 from routes.history import router as history_router       # Matches history.py
 from routes.webhooks import router as webhooks_router     # Matches webhooks.py
+from routes.documents import router as documents_router   # Matches documents.py
+from routes.jobs import router as jobs_router             # Matches jobs.py
+from services.ai_service import llm_cache, inflight
+from services.llm_governor import llm_governor
+from services.llm_resilience import llm_caller
+from services.model_router import model_router
+from services.jobs import job_manager
+from services.pdf_service import shutdown_pool, MAX_UPLOAD_MB
+from services.history_service import history_writer, ensure_history_indexes
+from services.extraction_cache import extraction_cache
+from services.metrics import MetricsMiddleware, registry, CONTENT_TYPE
+from db.mongo import connect_async, close_async
 
 # ------------------------------------------------------------
-# Middleware: Allow large PDF uploads (20 MB)
+# Middleware: Allow large PDF uploads (MAX_UPLOAD_MB, default 20 MB)
 # ------------------------------------------------------------
 class LimitUploadSizeMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
-        MAX_UPLOAD_SIZE = 20 * 1024 * 1024  # 20MB limit
+        MAX_UPLOAD_SIZE = MAX_UPLOAD_MB * 1024 * 1024
         content_length = request.headers.get("content-length")
 
         if content_length and int(content_length) > MAX_UPLOAD_SIZE:
             return Response(
-                content="File too large. Max allowed is 20 MB",
+                content=f"File too large. Max allowed is {MAX_UPLOAD_MB} MB",
                 status_code=413
             )
 
         return await call_next(request)
 
 
+# ------------------------------------------------------------
+# Lifespan: open the async MongoDB pool, ensure indexes, start the
+# background job workers (resuming unfinished jobs); on shutdown
+# stop them and the PDF process pool, flush buffered history and
+# close the Mongo pool
+# ------------------------------------------------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await connect_async()
+    await ensure_history_indexes()
+    await job_manager.start()
+    yield
+    await job_manager.stop()
+    shutdown_pool()
+    await history_writer.close()
+    await close_async()
+
+
 # ------------------------------------------------------------
 # Create FastAPI app
 # ------------------------------------------------------------
 app = FastAPI(
     title="AI Study Assistant API",
     description="Backend for PDF Summarizer, Notes, MCQs, and Mind Maps",
-    version="2.0"
+    version="2.0",
+    lifespan=lifespan
 )
 
 
@@ -59,6 +92,9 @@ app.add_middleware(
     allow_headers=["*"],          
 )
 
+# 3. Metrics (Outermost): request/stage histograms + Server-Timing header
+app.add_middleware(MetricsMiddleware)
+
 
 # ------------------------------------------------------------
 # Routers (Grouped with prefixes)
@@ -76,10 +112,72 @@ app.include_router(webhooks_router, prefix="/api/webhooks", tags=["Webhooks"])
 # 4. User History -> http://localhost:8000/api/history/get
 app.include_router(history_router, prefix="/api/history", tags=["History"]) 
 
+# 5. Documents (upload once, reuse by doc_id) -> http://localhost:8000/api/documents/upload
+app.include_router(documents_router, prefix="/api/documents", tags=["Documents"])
+
+# 6. Background jobs (poll status/progress) -> http://localhost:8000/api/jobs/{job_id}
+app.include_router(jobs_router, prefix="/api/jobs", tags=["Jobs"])
+
 
 # ------------------------------------------------------------
 # Test Route
 # ------------------------------------------------------------
 @app.get("/")
 def home():
-    return {"message": "AI Study Assistant Backend is Running!"}
\ No newline at end of file
+    return {"message": "AI Study Assistant Backend is Running!"}
+
+
+# ------------------------------------------------------------
+# Cache Stats (hits / misses / evictions of the LLM result cache)
+# ------------------------------------------------------------
+@app.get("/api/cache/stats")
+def cache_stats():
+    return llm_cache.stats()
+
+
+
+# ------------------------------------------------------------
+# LLM Stats (admission queue, retries, circuit breaker, hedging,
+# coalesced duplicate requests, model routing)
+# ------------------------------------------------------------
+@app.get("/api/llm/stats")
+def llm_stats():
+    return {
+        "governor": llm_governor.stats(),
+        "client": llm_caller.stats(),
+        "singleflight": inflight.stats(),
+        "router": model_router.stats(),
+    }
+
+
+# ------------------------------------------------------------
+# Prometheus metrics: request/stage latency histograms, LLM token
+# counters, plus these cache/queue gauges (read at scrape time)
+# ------------------------------------------------------------
+registry.callback("llm_cache_entries", "Entries in the in-memory LLM result cache.",
+                  lambda: len(llm_cache.memory))
+registry.callback("llm_in_flight", "Provider calls holding an admission slot.",
+                  lambda: llm_governor.stats()["in_flight"])
+registry.callback("llm_queue_depth", "Requests waiting for an LLM admission slot.",
+                  lambda: llm_governor.stats()["queue_depth"])
+registry.callback("llm_shed_total", "Requests rejected with 429 by the admission controller.",
+                  lambda: llm_governor.shed, kind="counter")
+registry.callback("llm_coalesced_total", "Duplicate prompts served by an in-flight completion.",
+                  lambda: inflight.coalesced, kind="counter")
+registry.callback("llm_routes_total", "LLM calls by task, chosen model and reason (task/long_input/disabled).",
+                  lambda: model_router.routes, labelnames=("task", "model", "reason"), kind="counter")
+registry.callback("llm_escalations_total", "Unparseable small-model answers retried on the large model.",
+                  lambda: model_router.escalations, labelnames=("task",), kind="counter")
+registry.callback("history_queue_depth", "History records buffered for the next batch write.",
+                  lambda: history_writer.stats()["queue_depth"])
+registry.callback("history_dropped_total", "History records dropped because the buffer was full.",
+                  lambda: history_writer.dropped, kind="counter")
+registry.callback("jobs_queued", "Background jobs waiting for a worker.",
+                  lambda: job_manager.stats()["queued"])
+registry.callback("extraction_cache_bytes", "Size of the on-disk PDF extraction cache.",
+                  lambda: extraction_cache.stats()["size_mb"] * 2**20)
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
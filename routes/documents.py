@@ -0,0 +1,48 @@
+from fastapi import APIRouter, UploadFile, File, HTTPException
+from pydantic import BaseModel
+from services.pdf_service import extract_pages_async
+from services.document_store import put_pages, put_text, get_document
+
+router = APIRouter()
+
+# ----------------------------
+# 📌 Request Models
+# ----------------------------
+
+class TextDocumentRequest(BaseModel):
+    text: str
+
+# ----------------------------
+# 📌 ROUTES
+# Upload once, then pass the returned `doc_id` to any /api/study route
+# instead of re-posting the full text.
+# ----------------------------
+
+# 1️⃣ Upload a PDF
+@router.post("/upload")
+async def upload_document(file: UploadFile = File(...)):
+    if not file.filename.lower().endswith(".pdf"):
+        raise HTTPException(status_code=400, detail="Please upload a valid PDF file")
+
+    pages = await extract_pages_async(file.file)
+    doc = put_pages(pages, filename=file.filename)
+    return doc.to_dict()
+
+
+# 2️⃣ Upload plain text
+@router.post("/text")
+async def upload_text(request: TextDocumentRequest):
+    if not request.text.strip():
+        raise HTTPException(status_code=400, detail="Text is empty")
+
+    doc = put_text(request.text)
+    return doc.to_dict()
+
+
+# 3️⃣ Document info (also tells the client whether the doc was evicted)
+@router.get("/{doc_id}")
+async def document_info(doc_id: str):
+    doc = get_document(doc_id)
+    if doc is None:
+        raise HTTPException(status_code=404, detail="Document not found or expired. Please upload it again.")
+    return doc.to_dict()
@@ -1,30 +1,66 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
-from db.mongo import history_collection
+from typing import List
+
+from fastapi import APIRouter, HTTPException, Query
+from services.history_service import history_writer, list_history, search_history, get_history_item
 # 👇 CHANGE THIS: Import from auth_utils, not security
-from auth_utils import get_current_user_optional 
+from auth_utils import RequiredUser
 
 router = APIRouter()
 
+MAX_PAGE_SIZE = 100
+
+
 @router.get("/get")
-async def get_user_history(req: Request):
+async def get_user_history(
+    user: dict = RequiredUser,
+    before: str = None,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE)
+):
+    """
+    Fetch one page of history for the logged-in user, newest first.
+    Items are lightweight (id, type, title, created_at); pass the
+    returned `next_before` as `?before=` to get the next page.
     """
-    Fetch the history for the logged-in user.
+    # Fetch the page from MongoDB (keyset pagination on created_at, _id)
+    try:
+        history_list, next_before = await list_history(user["_id"], before=before, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {"history": history_list, "next_before": next_before}
+
+
+@router.get("/search")
+async def search_user_history(
+    user: dict = RequiredUser,
+    q: str = Query(..., min_length=1, max_length=200),
+    type: List[str] = Query(None),
+    before: str = None,
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE)
+):
     """
-    # 1. Get the current user
-    user = await get_current_user_optional(req)
-
-    # 2. Security Check: If not logged in, reject access
-    if not user:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-
-    # 3. Fetch history from MongoDB
-    # We sort by 'created_at' descending (newest first) and limit to 50
-    cursor = history_collection.find({"user_id": user["_id"]}).sort("created_at", -1).limit(50)
-    
-    history_list = []
-    for doc in cursor:
-        # Convert ObjectId to string for JSON compatibility
-        doc["_id"] = str(doc["_id"])
-        history_list.append(doc)
-
-    return {"history": history_list}
\ No newline at end of file
+    Search the logged-in user's history (titles, topics, questions,
+    result text), newest first. Filter with `?type=make_notes&type=qna`;
+    pass the returned `next_before` as `?before=` for the next page.
+    """
+    try:
+        results, next_before = await search_history(user["_id"], q, types=type, before=before, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {"results": results, "next_before": next_before}
+
+
+@router.get("/stats")
+async def history_stats():
+    # Write-behind buffer: queue depth, batches, dropped records
+    return history_writer.stats()
+
+
+@router.get("/{history_id}")
+async def get_history_detail(history_id: str, user: dict = RequiredUser):
+    """Full record (input + result) of one history item."""
+    doc = await get_history_item(user["_id"], history_id)
+    if not doc:
+        raise HTTPException(status_code=404, detail="History item not found")
+    return doc
@@ -0,0 +1,29 @@
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException
+from services.jobs import job_manager, public_job
+from auth_utils import OptionalUser
+
+router = APIRouter()
+
+# ----------------------------
+# 📌 ROUTES
+# Poll a background job started with e.g. POST /api/pdf/summarize?async=1
+# ----------------------------
+@router.get("/stats")
+async def job_stats():
+    return job_manager.stats()
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: str, user: Optional[dict] = OptionalUser):
+    job = await job_manager.get(job_id)
+
+    # Jobs of signed-in users are only visible to that user
+    if job and job.get("user_id"):
+        if not user or str(user["_id"]) != job["user_id"]:
+            job = None
+
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return public_job(job)
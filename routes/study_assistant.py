@@ -1,17 +1,35 @@
-from fastapi import APIRouter, BackgroundTasks, Request
-from pydantic import BaseModel
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, model_validator
+from typing import List, Literal, Optional
 from services.ai_service import (
-    ai,
-    summarize_text,
+    ai_stream,
+    json_object,
+    json_array,
+    has_json,
+    summarize_document,
     generate_notes,
+    notes_prompt,
     explain_topic,
+    explain_prompt,
     answer_question,
+    qna_prompt,
+    finish_answer,
     generate_mindmap,
-    generate_flashcards
+    generate_flashcards,
+    generate_mcqs,
+    parse_failed,
+    MERMAID_HEADERS
 )
+from services.json_stream import JSONExtractor
 from services.history_service import save_history
-from auth_utils import get_current_user_optional
+from services.document_store import get_document
+from services.chunking import split_pages
+from services.retrieval import build_index
+from services.text_cleanup import normalize_whitespace
+from auth_utils import OptionalUser
 # Removed unused import: notes_collection 
+import asyncio
 import json
 
 router = APIRouter()
@@ -23,41 +41,81 @@ router = APIRouter()
 class ExplainRequest(BaseModel):
     topic: str
 
-class NoteRequest(BaseModel):
-    text: str
+class DocumentInput(BaseModel):
+    """Either the full `text`, or a `doc_id` from POST /api/documents/*."""
+    text: Optional[str] = None
+    doc_id: Optional[str] = None
 
-class MCQRequest(BaseModel):
-    text: str
+    @model_validator(mode="after")
+    def check_source(self):
+        if not self.text and not self.doc_id:
+            raise ValueError("Provide either 'text' or 'doc_id'")
+        return self
+
+class NoteRequest(DocumentInput):
+    pass
+
+class MCQRequest(DocumentInput):
     num_questions: int = 5
 
-class SummarizeTextRequest(BaseModel):
-    text: str
+class SummarizeTextRequest(DocumentInput):
+    pass
 
-class QnARequest(BaseModel):
-    text: str
+class QnARequest(DocumentInput):
     question: str
 
-class MindMapRequest(BaseModel):
-    text: str
+class MindMapRequest(DocumentInput):
+    pass
+
+class FlashcardRequest(DocumentInput):
+    pass
+
+StudyPackPart = Literal["notes", "mcqs", "flashcards", "mindmap"]
+
+class StudyPackRequest(DocumentInput):
+    include: List[StudyPackPart] = ["notes", "mcqs", "flashcards", "mindmap"]
+    num_questions: int = 5
+
+    @model_validator(mode="after")
+    def check_include(self):
+        if not self.include:
+            raise ValueError("'include' must name at least one part")
+        return self
+
 
-class FlashcardRequest(BaseModel):
-    text: str
+def resolve_document(request: DocumentInput):
+    """
+    Returns (text, doc). `doc` is the stored Document when the client sent
+    a doc_id, else None.
+    """
+    if request.doc_id:
+        doc = get_document(request.doc_id)
+        if doc is None:
+            raise HTTPException(status_code=404, detail="Document not found or expired. Please upload it again.")
+        return doc.text, doc
+    return request.text, None
+
+
+def history_input(text: str, doc, limit: int):
+    data = {"text": text[:limit] + "..."}
+    if doc is not None:
+        data["doc_id"] = doc.doc_id
+    return data
 
 # ----------------------------
 # 📌 ROUTES
+# Every route accepts `?regenerate=true` to skip the LLM result
+# cache and force a fresh completion.
 # ----------------------------
 
 # 1️⃣ Explain topic
 @router.post("/explain")
-async def explain_topic_route(request: ExplainRequest, req: Request, background_tasks: BackgroundTasks):
+async def explain_topic_route(request: ExplainRequest, background_tasks: BackgroundTasks, user: Optional[dict] = OptionalUser, regenerate: bool = False):
     try:
         # 1. Generate Explanation
-        explanation = explain_topic(request.topic)
+        explanation = await explain_topic(request.topic, use_cache=not regenerate)
         
-        # 2. Get User (Optional)
-        user = await get_current_user_optional(req)
-
-        # 3. Save History (if logged in)
+        # 2. Save History (if logged in)
         if user:
             background_tasks.add_task(
                 save_history,
@@ -68,6 +126,9 @@ async def explain_topic_route(request: ExplainRequest, req: Request, background_
             )
 
         return {"explanation": explanation}
+    except HTTPException:
+        # 429 from the LLM admission controller, 404 for unknown docs, ...
+        raise
     except Exception as e:
         print(f"Error in /explain: {e}") # Log error to terminal
         return {"error": f"Explain error: {str(e)}"}
@@ -75,25 +136,29 @@ async def explain_topic_route(request: ExplainRequest, req: Request, background_
 
 # 2️⃣ Make Notes
 @router.post("/make-notes")
-async def make_notes(request: NoteRequest, req: Request, background_tasks: BackgroundTasks):
+async def make_notes(request: NoteRequest, background_tasks: BackgroundTasks, user: Optional[dict] = OptionalUser, regenerate: bool = False):
+    # 0. Resolve the document (inline text or stored doc_id)
+    text, doc = resolve_document(request)
+
     try:
         # 1. Generate Notes (Returns Dict)
-        notes_data = generate_notes(request.text)
-
-        # 2. Get User (for history)
-        user = await get_current_user_optional(req)
+        notes_data = await generate_notes(text, use_cache=not regenerate)
 
+        # 2. Save History
         if user:
             background_tasks.add_task(
                 save_history,
                 user_id=str(user["_id"]),
                 action_type="make_notes",
-                input_data={"text": request.text[:200] + "..."}, 
+                input_data=history_input(text, doc, 200), 
                 result_data=notes_data
             )
 
         return {"notes_data": notes_data}
 
+    except HTTPException:
+        # 429 from the LLM admission controller, 404 for unknown docs, ...
+        raise
     except Exception as e:
         print(f"Error in /make-notes: {e}")
         return {"error": f"Notes error: {str(e)}"}
@@ -101,71 +166,36 @@ async def make_notes(request: NoteRequest, req: Request, background_tasks: Backg
 
 # 3️⃣ Make MCQs
 @router.post("/make-mcq")
-async def make_mcq(request: MCQRequest, req: Request, background_tasks: BackgroundTasks):
+async def make_mcq(request: MCQRequest, background_tasks: BackgroundTasks, user: Optional[dict] = OptionalUser, regenerate: bool = False):
+    # 0. Resolve the document (inline text or stored doc_id)
+    text, doc = resolve_document(request)
+
     try:
         # 1. Validation: Limit the number to avoid timeout/token errors
         count = max(1, min(request.num_questions, 20))
 
-        # 2. The Professional Prompt
-        prompt = (
-            f"You are a strict educational API that outputs only raw JSON.\n"
-            f"Task: Create exactly {count} professional multiple-choice questions "
-            f"based on the text provided below.\n\n"
-            
-            f"Constraints:\n"
-            f"1. Output MUST be a valid JSON array.\n"
-            f"2. Do NOT write 'Here are the questions' or any introductory text.\n"
-            f"3. Do NOT use Markdown formatting (no ```json code blocks).\n"
-            f"4. Each question must have 4 distinct options.\n"
-            f"5. The 'correctAnswer' must match one of the options exactly.\n\n"
-            
-            f"Required JSON Structure:\n"
-            f"[\n"
-            f"  {{\n"
-            f"    \"question\": \"Question text...\",\n"
-            f"    \"options\": [\"Option A\", \"Option B\", \"Option C\", \"Option D\"],\n"
-            f"    \"correctAnswer\": \"Option A\",\n"
-            f"    \"explanation\": \"Brief explanation of why this is correct.\"\n"
-            f"  }}\n"
-            f"]\n\n"
-            
-            f"Text to process:\n"
-            f"\"\"\"{request.text}\"\"\""
-        )
-
-        # 3. Call your AI function
-        raw_response = ai(prompt)
-        
-        # 4. Cleaning Step (Safety Net)
-        try:
-            # Find the first '[' and last ']' to ignore any extra text
-            start_index = raw_response.find('[')
-            end_index = raw_response.rfind(']') + 1
-            
-            if start_index != -1 and end_index != -1:
-                clean_json = raw_response[start_index:end_index]
-                mcqs = json.loads(clean_json)
-            else:
-                print("Error: No JSON brackets found in AI response")
-                mcqs = [] # Fallback if AI fails completely
-        except json.JSONDecodeError:
-            print(f"Error: JSON Decode failed. Raw response: {raw_response}")
+        # 2. Generate (prompt lives in services/ai_service.py); incomplete
+        #    questions from a truncated response are already dropped
+        mcqs = await generate_mcqs(text, count, use_cache=not regenerate)
+        if not isinstance(mcqs, list):
+            print(f"Error: No JSON array found. Raw response: {mcqs.get('raw_output')}")
             return {"error": "Failed to parse AI response into JSON."}
 
-        # 5. Get User & Save History
-        user = await get_current_user_optional(req)
-
+        # 3. Save History
         if user:
             background_tasks.add_task(
                 save_history,
                 user_id=str(user["_id"]),
                 action_type="make_mcq",
-                input_data={"text": request.text[:200] + "..."},
+                input_data=history_input(text, doc, 200),
                 result_data=mcqs
             )
         
         return {"mcqs": mcqs}
 
+    except HTTPException:
+        # 429 from the LLM admission controller, 404 for unknown docs, ...
+        raise
     except Exception as e:
         print(f"Error in /make-mcq: {e}")
         return {"error": f"MCQ error: {str(e)}"}
@@ -173,25 +203,29 @@ async def make_mcq(request: MCQRequest, req: Request, background_tasks: Backgrou
 
 # 4️⃣ Summarize text
 @router.post("/summarize-text")
-async def summarize_any_text(request: SummarizeTextRequest, req: Request, background_tasks: BackgroundTasks):
-    try:
-        # 1. Generate Summary
-        summary = summarize_text(request.text)
+async def summarize_any_text(request: SummarizeTextRequest, background_tasks: BackgroundTasks, user: Optional[dict] = OptionalUser, regenerate: bool = False):
+    # 0. Resolve the document (inline text or stored doc_id)
+    text, doc = resolve_document(request)
 
-        # 2. Get User
-        user = await get_current_user_optional(req)
+    try:
+        # 1. Generate Summary (map-reduce if the text is too large for one prompt)
+        pages = doc.pages if doc else split_pages(text)
+        summary = await summarize_document(pages, use_cache=not regenerate)
 
-        # 3. Save History
+        # 2. Save History
         if user:
             background_tasks.add_task(
                 save_history,
                 user_id=str(user["_id"]),
                 action_type="summarize",
-                input_data={"text": request.text[:200] + "..."},
+                input_data=history_input(text, doc, 200),
                 result_data=summary
             )
 
         return {"summary": summary}
+    except HTTPException:
+        # 429 from the LLM admission controller, 404 for unknown docs, ...
+        raise
     except Exception as e:
         print(f"Error in /summarize-text: {e}")
         return {"error": f"Summary error: {str(e)}"}
@@ -199,26 +233,30 @@ async def summarize_any_text(request: SummarizeTextRequest, req: Request, backgr
 
 # 5️⃣ PDF QnA / Ask Question
 @router.post("/qna") 
-async def qna(request: QnARequest, req: Request, background_tasks: BackgroundTasks):
+async def qna(request: QnARequest, background_tasks: BackgroundTasks, user: Optional[dict] = OptionalUser, regenerate: bool = False):
+    # 0. Resolve the document (inline text or stored doc_id)
+    text, doc = resolve_document(request)
+
     try:
-        # 1. Generate Answer
-        answer_data = answer_question(request.text, request.question)
+        # 1. Generate Answer (stored docs keep their retrieval index server-side)
+        index = doc.artifact("retrieval_index", lambda: build_index(doc.pages)) if doc else None
+        answer_data = await answer_question(text, request.question, use_cache=not regenerate, index=index)
         
-        # 2. Get User
-        user = await get_current_user_optional(req)
-
-        # 3. Save History
+        # 2. Save History
         if user:
             background_tasks.add_task(
                 save_history,
                 user_id=str(user["_id"]),
                 action_type="qna",
-                input_data={"question": request.question, "text": request.text[:100] + "..."},
+                input_data={"question": request.question, **history_input(text, doc, 100)},
                 result_data=answer_data
             )
 
         return {"answer_data": answer_data}
 
+    except HTTPException:
+        # 429 from the LLM admission controller, 404 for unknown docs, ...
+        raise
     except Exception as e:
         print(f"Error in /qna: {e}")
         return {"error": f"QnA error: {str(e)}"}
@@ -226,47 +264,283 @@ async def qna(request: QnARequest, req: Request, background_tasks: BackgroundTas
 
 # 6️⃣ AI Mind Map
 @router.post("/make-mindmap")
-async def make_mindmap_route(request: MindMapRequest, req: Request, background_tasks: BackgroundTasks):
+async def make_mindmap_route(request: MindMapRequest, background_tasks: BackgroundTasks, user: Optional[dict] = OptionalUser, regenerate: bool = False):
+    # 0. Resolve the document (inline text or stored doc_id)
+    text, doc = resolve_document(request)
+
     try:
         # 1. Generate Code
-        mermaid_code = generate_mindmap(request.text)
+        mermaid_code = await generate_mindmap(text, use_cache=not regenerate)
 
-        # 2. Get User & Save History
-        user = await get_current_user_optional(req)
-        
+        # 2. Save History
         if user:
             background_tasks.add_task(
                 save_history,
                 user_id=str(user["_id"]),
                 action_type="mindmap",
-                input_data={"text": request.text[:100] + "..."},
+                input_data=history_input(text, doc, 100),
                 result_data={"code": mermaid_code}
             )
 
         return {"mermaid_code": mermaid_code}
+    except HTTPException:
+        # 429 from the LLM admission controller, 404 for unknown docs, ...
+        raise
     except Exception as e:
         print(f"Error in /make-mindmap: {e}")
         return {"error": f"MindMap error: {str(e)}"}
     
 # 7️⃣ Generate Flashcards
 @router.post("/make-flashcards")
-async def make_flashcards_route(request: FlashcardRequest, req: Request, background_tasks: BackgroundTasks):
+async def make_flashcards_route(request: FlashcardRequest, background_tasks: BackgroundTasks, user: Optional[dict] = OptionalUser, regenerate: bool = False):
+    # 0. Resolve the document (inline text or stored doc_id)
+    text, doc = resolve_document(request)
+
     try:
         # Generate
-        cards = generate_flashcards(request.text)
+        cards = await generate_flashcards(text, use_cache=not regenerate)
 
         # Save History
-        user = await get_current_user_optional(req)
         if user:
             background_tasks.add_task(
                 save_history,
                 user_id=str(user["_id"]),
                 action_type="flashcards",
-                input_data={"text": request.text[:100] + "..."},
+                input_data=history_input(text, doc, 100),
                 result_data=cards
             )
 
         return {"flashcards": cards}
+    except HTTPException:
+        # 429 from the LLM admission controller, 404 for unknown docs, ...
+        raise
     except Exception as e:
         print(f"Error in /make-flashcards: {e}")
-        return {"error": f"Flashcard error: {str(e)}"}
\ No newline at end of file
+        return {"error": f"Flashcard error: {str(e)}"}
+
+
+# ----------------------------
+# 📡 STREAMING ROUTES
+# Same inputs as above, but tokens are forwarded as they arrive.
+# ?format=sse (default) -> Server-Sent Events
+# ?format=ndjson        -> one JSON object per line
+#
+# Events:
+#   token   {"text": "..."}                 raw model output piece
+#   section {"path": [...], "value": ...}   a JSON section that just became parseable
+#   done    {"result": ...}                 final parsed result (same as the normal route)
+# ----------------------------
+
+StreamFormat = Query("sse", alias="format", pattern="^(sse|ndjson)$")
+
+
+def encode_event(event: str, data: dict, fmt: str) -> str:
+    if fmt == "ndjson":
+        return json.dumps({"type": event, **data}, ensure_ascii=False) + "\n"
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def stream_generation(pieces, finish, fmt: str, result_box: dict, expect: str = None):
+    """Wrap an ai_stream() iterator into a streaming HTTP response; `expect` is the root ("{" or "[")."""
+
+    # Pull the first piece before sending headers, so admission errors
+    # (429 + Retry-After) reach the client as a real status code
+    try:
+        first = await pieces.__anext__()
+    except StopAsyncIteration:
+        first = ""
+
+    async def rest():
+        if first:
+            yield first
+        async for piece in pieces:
+            yield piece
+
+    async def body():
+        parser = JSONExtractor(expect)
+        parts = []
+
+        async for piece in rest():
+            parts.append(piece)
+            yield encode_event("token", {"text": piece}, fmt)
+            for path, value in parser.feed(piece):
+                yield encode_event("section", {"path": path, "value": value}, fmt)
+
+        result = finish("".join(parts).strip())
+        result_box["result"] = result
+        yield encode_event("done", {"result": result}, fmt)
+
+    media_type = "application/x-ndjson" if fmt == "ndjson" else "text/event-stream"
+    return StreamingResponse(
+        body(),
+        media_type=media_type,
+        # Stop proxies (nginx, Render) from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def save_streamed_history(user_id: str, action_type: str, input_data, result_box: dict):
+    """Background task: runs after the stream ends, saves only completed results."""
+    if "result" in result_box:
+        await save_history(user_id, action_type, input_data, result_box["result"])
+
+
+def schedule_stream_history(background_tasks, user, action_type, input_data, result_box):
+    if user:
+        background_tasks.add_task(
+            save_streamed_history,
+            user_id=str(user["_id"]),
+            action_type=action_type,
+            input_data=input_data,
+            result_box=result_box
+        )
+
+
+# 1️⃣ Explain topic (stream)
+@router.post("/explain/stream")
+async def explain_topic_stream(request: ExplainRequest, background_tasks: BackgroundTasks, user: Optional[dict] = OptionalUser, regenerate: bool = False, fmt: str = StreamFormat):
+    result_box = {}
+    schedule_stream_history(background_tasks, user, "explain", {"topic": request.topic}, result_box)
+
+    pieces = ai_stream(explain_prompt(request.topic), task="explain", use_cache=not regenerate,
+                       cacheable=lambda raw: has_json(raw, "["))
+    return await stream_generation(pieces, json_array, fmt, result_box, expect="[")
+
+
+# 2️⃣ Make Notes (stream)
+@router.post("/make-notes/stream")
+async def make_notes_stream(request: NoteRequest, background_tasks: BackgroundTasks, user: Optional[dict] = OptionalUser, regenerate: bool = False, fmt: str = StreamFormat):
+    text, doc = resolve_document(request)
+
+    result_box = {}
+    schedule_stream_history(background_tasks, user, "make_notes", history_input(text, doc, 200), result_box)
+
+    pieces = ai_stream(notes_prompt(text), task="notes", use_cache=not regenerate,
+                       cacheable=lambda raw: has_json(raw, "{"))
+    return await stream_generation(pieces, json_object, fmt, result_box, expect="{")
+
+
+# 5️⃣ PDF QnA (stream)
+@router.post("/qna/stream")
+async def qna_stream(request: QnARequest, background_tasks: BackgroundTasks, user: Optional[dict] = OptionalUser, regenerate: bool = False, fmt: str = StreamFormat):
+    text, doc = resolve_document(request)
+    index = doc.artifact("retrieval_index", lambda: build_index(doc.pages)) if doc else None
+    prompt, passages = qna_prompt(text, request.question, index=index)
+
+    result_box = {}
+    schedule_stream_history(
+        background_tasks, user, "qna",
+        {"question": request.question, **history_input(text, doc, 100)},
+        result_box
+    )
+
+    pieces = ai_stream(prompt, task="qna", use_cache=not regenerate, cacheable=lambda raw: has_json(raw, "{"))
+    return await stream_generation(pieces, lambda raw: finish_answer(raw, passages), fmt, result_box, expect="{")
+
+
+# ----------------------------
+# 📦 STUDY PACK (stream)
+# Notes, MCQs, flashcards and mind map from ONE request: the document
+# is resolved once, the generators run concurrently (each still
+# cached and model-routed on its own) and every artifact is sent as
+# soon as it is ready. Same ?format= as the streaming routes.
+#
+# Events:
+#   artifact {"name": "notes", "result": ...}   one finished part
+#   error    {"name": "mcqs", "detail": "..."}  a part that failed
+#   done     {"result": {"notes": ..., ...}}    every finished part
+#
+# A part whose output could not be parsed (force_json's error dict, a
+# mind map that is not Mermaid) is reported as an error, never as an
+# artifact, so it does not end up in the pack's history record.
+# ----------------------------
+
+PACK_CHECKS = {
+    "notes": lambda result: isinstance(result, dict) and not parse_failed(result),
+    "mcqs": lambda result: isinstance(result, list),
+    "flashcards": lambda result: isinstance(result, list),
+    "mindmap": lambda result: isinstance(result, str) and result.startswith(MERMAID_HEADERS),
+}
+
+
+async def run_pack_part(name: str, make):
+    try:
+        result = await make()
+    except Exception as e:
+        return name, None, e
+    if not PACK_CHECKS[name](result):
+        raw = result.get("raw_output") if isinstance(result, dict) else result
+        print(f"⚠️ Unusable {name} output in /study-pack. Raw response: {str(raw)[:200]}")
+        return name, None, ValueError("Failed to parse AI response.")
+    return name, result, None
+
+
+async def stream_study_pack(generators: dict, fmt: str, result_box: dict):
+    tasks = [asyncio.create_task(run_pack_part(name, make)) for name, make in generators.items()]
+    finished = asyncio.as_completed(tasks)
+
+    # Wait for the first part before sending headers, so admission errors
+    # (429 + Retry-After) reach the client as a real status code
+    first = await next(finished)
+    if isinstance(first[2], HTTPException):
+        for task in tasks:
+            task.cancel()
+        raise first[2]
+
+    async def parts():
+        yield first
+        for part in finished:
+            yield await part
+
+    async def body():
+        artifacts = {}
+        try:
+            async for name, result, error in parts():
+                if error is None:
+                    artifacts[name] = result
+                    yield encode_event("artifact", {"name": name, "result": result}, fmt)
+                else:
+                    print(f"Error in /study-pack ({name}): {error}")
+                    detail = error.detail if isinstance(error, HTTPException) else str(error)
+                    yield encode_event("error", {"name": name, "detail": detail}, fmt)
+        finally:
+            # Client went away: drop the parts still waiting (a completion
+            # already in flight finishes and is cached for next time)
+            for task in tasks:
+                task.cancel()
+
+        if artifacts:
+            result_box["result"] = artifacts
+        yield encode_event("done", {"result": artifacts}, fmt)
+
+    media_type = "application/x-ndjson" if fmt == "ndjson" else "text/event-stream"
+    return StreamingResponse(
+        body(),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# 8️⃣ Study pack (stream)
+@router.post("/study-pack")
+async def study_pack(request: StudyPackRequest, background_tasks: BackgroundTasks, user: Optional[dict] = OptionalUser, regenerate: bool = False, fmt: str = StreamFormat):
+    text, doc = resolve_document(request)
+    if doc is None:
+        # Stored documents are already cleaned at upload
+        text = normalize_whitespace(text)
+    use_cache = not regenerate
+    count = max(1, min(request.num_questions, 20))
+
+    makers = {
+        "notes": lambda: generate_notes(text, use_cache=use_cache),
+        "mcqs": lambda: generate_mcqs(text, count, use_cache=use_cache),
+        "flashcards": lambda: generate_flashcards(text, use_cache=use_cache),
+        "mindmap": lambda: generate_mindmap(text, use_cache=use_cache),
+    }
+    generators = {name: makers[name] for name in dict.fromkeys(request.include)}
+
+    # One history record for the whole pack, saved after the stream ends
+    result_box = {}
+    schedule_stream_history(background_tasks, user, "study_pack", history_input(text, doc, 200), result_box)
+
+    return await stream_study_pack(generators, fmt, result_box)
@@ -1,42 +1,65 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Request, BackgroundTasks
-from services.pdf_service import extract_text_from_pdf
-from services.ai_service import summarize_text
+import contextlib
+import os
+from typing import Optional
+
+from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks, Query
+from fastapi.responses import JSONResponse
+from services.pdf_service import extract_pages_async, extract_pages_from_path, spool_upload
+from services.ai_service import summarize_document
 from services.history_service import save_history
-from auth_utils import get_current_user_optional
+from services.document_store import put_pages
+from services.text_cleanup import cleanup_totals
+from services.extraction_cache import extraction_cache
+from services.jobs import job_manager, JOB_DIR
+from auth_utils import OptionalUser
 # Removed unused import: notes_collection
 
 router = APIRouter()
 
 @router.post("/summarize")
 async def summarize_pdf(
-    request: Request, 
     background_tasks: BackgroundTasks, 
-    file: UploadFile = File(...)
+    file: UploadFile = File(...),
+    user: Optional[dict] = OptionalUser,
+    regenerate: bool = False,
+    run_async: bool = Query(False, alias="async")
 ):
     # 1. Validate File Type
     if not file.filename.lower().endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Please upload a valid PDF file")
 
+    # ?async=1 -> queue a background job and answer at once (poll /api/jobs/{id})
+    if run_async:
+        return await submit_summarize_job(user, file, regenerate)
+
     # 2. Extract Text
     try:
-        raw_text = extract_text_from_pdf(file.file)
+        # Runs in the PDF process pool; the event loop stays responsive
+        pages = await extract_pages_async(file.file)
+    except HTTPException:
+        # 400 scanned PDF / 413 too large: keep the original status
+        raise
     except Exception as e:
         print(f"Error extracting PDF text: {e}") # Log for developer
         raise HTTPException(status_code=400, detail=f"Error reading PDF: {str(e)}")
 
-    if not raw_text.strip():
+    if not any(page.strip() for page in pages):
         raise HTTPException(status_code=400, detail="Could not extract text from PDF (file might be empty or scanned images).")
 
-    # 3. Generate Summary using AI
+    # Keep the extracted text server-side so follow-up study calls can use doc_id
+    doc = put_pages(pages, filename=file.filename)
+
+    # 3. Generate Summary using AI (chunked map-reduce for large PDFs)
     try:
-        summary = summarize_text(raw_text)
+        summary = await summarize_document(pages, use_cache=not regenerate)
+    except HTTPException:
+        # e.g. 429 from the LLM admission controller
+        raise
     except Exception as e:
         print(f"Error generating summary: {e}") # Log for developer
         raise HTTPException(status_code=500, detail=f"AI Error: {str(e)}")
 
     # 4. SAVE HISTORY (The Modern Way)
-    user = await get_current_user_optional(request)
-    
     if user:
         # Use background task for non-blocking save
         background_tasks.add_task(
@@ -50,5 +73,76 @@ async def summarize_pdf(
     # 5. Return Response
     return {
         "summary": summary,
-        "filename": file.filename
-    }
\ No newline at end of file
+        "filename": file.filename,
+        "doc_id": doc.doc_id
+    }
+
+
+
+# ----------------------------
+# ⏳ BACKGROUND JOB VARIANT
+# ----------------------------
+async def submit_summarize_job(user, file: UploadFile, regenerate: bool):
+    # The upload must outlive this request (and a restart), so spool it to JOB_DIR
+    path, digest = await spool_upload(file.file, directory=JOB_DIR)
+    try:
+        job = await job_manager.submit(
+            "pdf_summarize",
+            {"path": path, "digest": digest, "filename": file.filename, "regenerate": regenerate},
+            user_id=str(user["_id"]) if user else None,
+        )
+    except Exception as e:
+        os.unlink(path)
+        print(f"Error queueing summary job: {e}")
+        raise HTTPException(status_code=503, detail="Could not queue the job. Please try again.")
+
+    return JSONResponse(
+        status_code=202,
+        content={"job_id": job["_id"], "status": job["status"], "status_url": f"/api/jobs/{job['_id']}"},
+    )
+
+
+def remove_job_upload(job):
+    # Done or failed for good (retries keep it): the upload is no longer needed
+    with contextlib.suppress(OSError):
+        os.unlink(job["params"]["path"])
+
+
+@job_manager.handler("pdf_summarize", cleanup=remove_job_upload)
+async def run_summarize_job(job, progress):
+    params = job["params"]
+
+    pages = await extract_pages_from_path(
+        params["path"], params["digest"],
+        on_progress=lambda done, total: progress(pages_extracted=done, pages_total=total),
+    )
+    doc = put_pages(pages, filename=params["filename"])
+
+    summary = await summarize_document(
+        pages, use_cache=not params["regenerate"],
+        on_progress=lambda done, total: progress(chunks_summarized=done, chunks_total=total),
+    )
+
+    # Same history record as the synchronous path
+    if job.get("user_id"):
+        await save_history(
+            user_id=job["user_id"],
+            action_type="pdf_summarize",
+            input_data={"filename": params["filename"]},
+            result_data=summary
+        )
+
+    return {
+        "summary": summary,
+        "filename": params["filename"],
+        "doc_id": doc.doc_id
+    }
+
+
+@router.get("/stats")
+async def pdf_stats():
+    # Cleanup savings and extraction-cache hit ratios
+    return {
+        "cleanup": cleanup_totals.to_dict(),
+        "extraction_cache": extraction_cache.stats(),
+    }
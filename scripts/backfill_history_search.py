@@ -0,0 +1,69 @@
+# ================================================================
+#  BACKFILL: search_text for history records saved before search
+#  /api/history/search only sees records that have `search_text`;
+#  this fills it in for older ones (compressed results included)
+#  and makes sure the text index exists.
+#
+#  Run:  python scripts/backfill_history_search.py [--batch-size 500] [--limit N] [--dry-run]
+# ================================================================
+
+import argparse
+import os
+import sys
+
+from pymongo import UpdateOne
+
+# Make the repo root importable when run as `python scripts/x.py`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.history_codec import decode_record
+from services.history_service import history_search_text, HISTORY_TEXT_INDEX
+
+
+def backfill(collection, batch_size, limit=None, dry_run=False):
+    scanned = updated = 0
+    ops = []
+    cursor = collection.find({"search_text": {"$exists": False}},
+                             {"type": 1, "input": 1, "result": 1, "result_z": 1})
+    for doc in cursor:
+        if limit and scanned >= limit:
+            break
+        scanned += 1
+        try:
+            result = decode_record(dict(doc)).get("result")
+        except Exception as e:
+            print(f"⚠️ Skipping {doc['_id']}: {e}")
+            continue
+
+        text = history_search_text(doc.get("type", ""), doc.get("input"), result)
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"search_text": text}}))
+        updated += 1
+
+        if len(ops) >= batch_size:
+            if not dry_run:
+                collection.bulk_write(ops, ordered=False)
+            ops = []
+
+    if ops and not dry_run:
+        collection.bulk_write(ops, ordered=False)
+    return scanned, updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill in search_text for older history records.")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--dry-run", action="store_true", help="report only, write nothing")
+    args = parser.parse_args()
+
+    from db.mongo import history_collection
+
+    if not args.dry_run:
+        history_collection.create_index(HISTORY_TEXT_INDEX, name="user_search_text", default_language="english")
+    scanned, updated = backfill(history_collection, args.batch_size, args.limit, args.dry_run)
+    print(f"📊 History search backfill{' (dry run)' if args.dry_run else ''}: "
+          f"{scanned} scanned, {updated} updated")
+
+
+if __name__ == "__main__":
+    main()
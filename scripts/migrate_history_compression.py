@@ -0,0 +1,133 @@
+# ================================================================
+#  BACKFILL: compress (or restore) stored history results
+#  Rewrites existing `history` records into the compressed envelope
+#  used by save_history (services/history_codec.py) and prints a
+#  report: records scanned/converted, BSON bytes before/after,
+#  compression ratio and encode/decode cost per record.
+#
+#  Run:  python scripts/migrate_history_compression.py [--codec zlib|zstd]
+#            [--min-bytes 2048] [--batch-size 500] [--limit N] [--dry-run]
+#        python scripts/migrate_history_compression.py --decompress
+# ================================================================
+
+import argparse
+import os
+import sys
+import time
+
+import bson
+from pymongo import UpdateOne
+
+# Make the repo root importable when run as `python scripts/x.py`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.history_codec import encode_result, decode_record, HISTORY_COMPRESS_MIN_BYTES
+
+
+class Report:
+    def __init__(self):
+        self.scanned = 0
+        self.converted = 0
+        self.bytes_before = 0
+        self.bytes_after = 0
+        self.encode_s = 0.0
+        self.decode_s = 0.0
+
+    def print(self, label):
+        ratio = self.bytes_before / self.bytes_after if self.bytes_after else 0.0
+        per = max(self.converted, 1)
+        print(f"\n📊 {label}")
+        print(f"   records scanned   : {self.scanned}")
+        print(f"   records converted : {self.converted}")
+        print(f"   bytes before      : {self.bytes_before:,}")
+        print(f"   bytes after       : {self.bytes_after:,}")
+        print(f"   compression ratio : {ratio:.2f}x")
+        print(f"   encode per record : {1e6 * self.encode_s / per:.0f} µs")
+        print(f"   decode per record : {1e6 * self.decode_s / per:.0f} µs")
+
+
+def compress_all(collection, codec, min_bytes, batch_size, limit=None, dry_run=False):
+    report = Report()
+    ops = []
+    cursor = collection.find({"result_z": {"$exists": False}, "result": {"$ne": None}}, {"result": 1})
+    for doc in cursor:
+        if limit and report.scanned >= limit:
+            break
+        report.scanned += 1
+
+        start = time.perf_counter()
+        fields = encode_result(doc["result"], codec=codec, min_bytes=min_bytes)
+        report.encode_s += time.perf_counter() - start
+        if "result_z" not in fields:
+            continue  # small or incompressible: left as-is
+
+        # Round-trip check before anything is written
+        start = time.perf_counter()
+        restored = decode_record({"result_z": fields["result_z"]})["result"]
+        report.decode_s += time.perf_counter() - start
+        if restored != doc["result"]:
+            print(f"⚠️ Skipping {doc['_id']}: result does not round-trip through JSON")
+            continue
+
+        report.converted += 1
+        report.bytes_before += len(bson.encode({"result": doc["result"]}))
+        report.bytes_after += len(bson.encode(fields))
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": fields}))
+
+        if len(ops) >= batch_size:
+            if not dry_run:
+                collection.bulk_write(ops, ordered=False)
+            ops = []
+
+    if ops and not dry_run:
+        collection.bulk_write(ops, ordered=False)
+    return report
+
+
+def decompress_all(collection, batch_size, dry_run=False):
+    report = Report()
+    ops = []
+    for doc in collection.find({"result_z": {"$exists": True}}, {"result_z": 1}):
+        report.scanned += 1
+        start = time.perf_counter()
+        result = decode_record(dict(doc))["result"]
+        report.decode_s += time.perf_counter() - start
+
+        report.converted += 1
+        report.bytes_before += len(bson.encode({"result_z": doc["result_z"]}))
+        report.bytes_after += len(bson.encode({"result": result}))
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"result": result}, "$unset": {"result_z": ""}}))
+
+        if len(ops) >= batch_size:
+            if not dry_run:
+                collection.bulk_write(ops, ordered=False)
+            ops = []
+
+    if ops and not dry_run:
+        collection.bulk_write(ops, ordered=False)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compress or restore stored history results.")
+    parser.add_argument("--codec", default="zlib", choices=("zlib", "zstd"))
+    parser.add_argument("--min-bytes", type=int, default=HISTORY_COMPRESS_MIN_BYTES)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--dry-run", action="store_true", help="report only, write nothing")
+    parser.add_argument("--decompress", action="store_true", help="restore plain results")
+    args = parser.parse_args()
+
+    from db.mongo import history_collection
+
+    if args.decompress:
+        report = decompress_all(history_collection, args.batch_size, args.dry_run)
+        report.print("History results restored" + (" (dry run)" if args.dry_run else ""))
+    else:
+        report = compress_all(history_collection, args.codec, args.min_bytes,
+                              args.batch_size, args.limit, args.dry_run)
+        report.print(f"History results compressed with {args.codec}" + (" (dry run)" if args.dry_run else ""))
+
+
+if __name__ == "__main__":
+    main()
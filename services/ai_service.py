@@ -2,61 +2,228 @@
 #  AI SERVICES (WORLD-BEST EDUCATION EDITION) – PRODUCTION READY
 # ================================================================
 
+import asyncio
+import hashlib
 import json
-import re
-from groq import Groq
+import time
+from groq import AsyncGroq
 import os
 from dotenv import load_dotenv
+from services.cache import TTLCache, MongoCacheTier, TieredCache
+from services.chunking import chunk_pages, estimate_tokens
+from services.retrieval import get_index, locate_evidence
+from services.json_stream import extract_json
+from services.llm_governor import llm_governor
+from services.llm_resilience import llm_caller
+from services.singleflight import SingleFlight
+from services.model_router import model_router
+from services.metrics import stage, record, timed, count_tokens, llm_cache_lookups, llm_seconds
 
 load_dotenv()
 
 # Initialize Client
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+# AsyncGroq keeps the event loop free while a completion is in flight, so one
+# uvicorn worker can serve many LLM requests (and /, /api/history) at once.
+# Benchmarks swap this attribute for a local stub model.
+# Retries/timeouts are handled by services/llm_resilience, not the SDK.
+client = AsyncGroq(api_key=os.getenv("GROQ_API_KEY"), max_retries=0)
+
+# Default model; services/model_router picks the model for each call
+MODEL = model_router.large_model
+TEMPERATURE = 0.2
+
+# Completion length is unknown up front; budget this much per call
+COMPLETION_TOKEN_ESTIMATE = int(os.getenv("LLM_COMPLETION_TOKEN_ESTIMATE", "800"))
+
+
+def request_tokens(prompt: str) -> int:
+    """Token estimate used by the admission controller's per-minute budget."""
+    return estimate_tokens(prompt) + COMPLETION_TOKEN_ESTIMATE
+
+
+# ================================================================
+#  RESULT CACHE
+#  Key = (task, model, temperature, prompt-template version,
+#         hash of the whitespace-normalized prompt).
+#  Bump a task's version below whenever its prompt template changes
+#  so stale results are never served.
+# ================================================================
+PROMPT_VERSIONS = {
+    "general": 1,
+    "explain": 1,
+    "summarize": 1,
+    "notes": 1,
+    "qna": 1,
+    "mindmap": 1,
+    "flashcards": 1,
+    "mcq": 1,
+    "summary_merge": 1,
+}
+
+llm_cache = TieredCache(
+    TTLCache(
+        max_size=int(os.getenv("LLM_CACHE_SIZE", "512")),
+        ttl=float(os.getenv("LLM_CACHE_TTL", "86400")),
+    )
+)
+
+# Optional shared tier: results survive restarts and are shared by all workers
+if os.getenv("LLM_CACHE_MONGO", "").lower() in ("1", "true", "yes"):
+    from db.mongo import llm_cache_collection
+    llm_cache.shared = MongoCacheTier(
+        llm_cache_collection,
+        ttl=float(os.getenv("LLM_CACHE_TTL", "86400")),
+    )
+
+
+# Identical prompts already being generated share one upstream call
+inflight = SingleFlight()
+
+
+def normalize_prompt(prompt: str) -> str:
+    return " ".join(prompt.split())
+
+
+def cache_key(task: str, prompt: str, model: str = MODEL, temperature: float = TEMPERATURE) -> str:
+    digest = hashlib.sha256(normalize_prompt(prompt).encode("utf-8")).hexdigest()
+    version = PROMPT_VERSIONS.get(task, 1)
+    return f"{task}:{model}:{temperature}:v{version}:{digest}"
 
 
 # ================================================================
-#  UNIVERSAL AI CALLER (Stable)
+#  UNIVERSAL AI CALLER (Async, cached, resilient)
+#  use_cache=False skips the lookup (regenerate) but still stores
+#  the fresh result so later calls see the newest answer.
+#  Transient provider errors are retried; if the provider stays down
+#  LLMUnavailable (HTTP 503 + Retry-After) is raised.
+#  Identical concurrent prompts are coalesced into one completion.
+#  `model` defaults to the router's choice for (task, prompt).
+#  `cacheable(output)` returning False keeps an output out of the
+#  cache (e.g. no JSON in it), so the next call asks the model again.
 # ================================================================
-def ai(prompt: str):
-    try:
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
+async def cached_result(task: str, key: str, use_cache: bool):
+    if not use_cache:
+        llm_cache.bypassed += 1
+        llm_cache_lookups.inc(task, "bypass")
+        return None
+    with stage("cache"):
+        cached = await llm_cache.get(key)
+    llm_cache_lookups.inc(task, "miss" if cached is None else "hit")
+    return cached
+
+
+async def store_result(task: str, key: str, output: str, cacheable=None):
+    if cacheable is not None and not cacheable(output):
+        llm_cache.rejected += 1
+        print(f"⚠️ {task}: unusable output not cached")
+        return
+    await llm_cache.set(key, output)
+
+
+def count_usage(task: str, model: str, prompt: str, output: str, usage=None):
+    # Provider usage when reported, else the same estimate the governor uses
+    prompt_tokens = getattr(usage, "prompt_tokens", None) or estimate_tokens(prompt)
+    completion_tokens = getattr(usage, "completion_tokens", None) or estimate_tokens(output)
+    count_tokens(task, model, prompt_tokens, completion_tokens)
+
+
+async def ai(prompt: str, task: str = "general", use_cache: bool = True, model: str = None, cacheable=None):
+    model = model or model_router.choose(task, prompt)
+    key = cache_key(task, prompt, model)
+
+    cached = await cached_result(task, key, use_cache)
+    if cached is not None:
+        return cached
+
+    # Concurrent duplicates (same cache key) await the first caller's result
+    return await inflight.do(key, lambda: _complete(prompt, key, task, model, cacheable))
+
+
+async def _complete(prompt: str, key: str, task: str = "general", model: str = MODEL, cacheable=None):
+    # Waits for a slot (or raises 429) before touching the provider
+    waited = time.perf_counter()
+    async with llm_governor.admit(request_tokens(prompt)):
+        started = time.perf_counter()
+        record("llm_queue", started - waited)
+        with stage("llm"):
+            response = await llm_caller.call(lambda: client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=TEMPERATURE,
+            ))
+        llm_seconds.observe(time.perf_counter() - started, task, model)
+    output = response.choices[0].message.content.strip()
+    count_usage(task, model, prompt, output, getattr(response, "usage", None))
+
+    await store_result(task, key, output, cacheable)
+    return output
+
+
+# ================================================================
+#  STREAMING AI CALLER
+#  Yields text pieces as the model produces them. A cache hit is
+#  replayed as one piece; a completed stream is cached like ai().
+#  Opening the stream is retried like ai(); once tokens have been
+#  sent a failure just ends the stream (it is never cached), and
+#  `cacheable` works as in ai().
+# ================================================================
+async def ai_stream(prompt: str, task: str = "general", use_cache: bool = True, model: str = None,
+                    cacheable=None):
+    # Routed like ai(); there is no escalation once tokens have been sent
+    model = model or model_router.choose(task, prompt)
+    key = cache_key(task, prompt, model)
+
+    cached = await cached_result(task, key, use_cache)
+    if cached is not None:
+        yield cached
+        return
+
+    parts = []
+    # The slot is held for the whole stream
+    waited = time.perf_counter()
+    async with llm_governor.admit(request_tokens(prompt)):
+        started = time.perf_counter()
+        record("llm_queue", started - waited)
+        stream = await llm_caller.call(lambda: client.chat.completions.create(
+            model=model,
             messages=[{"role": "user", "content": prompt}],
-            temperature=0.2,
-        )
-        return response.choices[0].message.content.strip()
-    except Exception as e:
-        print(f"Groq API Error: {e}")
-        return "Error generating content."
+            temperature=TEMPERATURE,
+            stream=True,
+        ), hedge=False)
+        try:
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    parts.append(delta)
+                    yield delta
+        except Exception as e:
+            # Never cache a stream that broke half way
+            print(f"Groq API Error (stream): {e}")
+            return
+        finally:
+            elapsed = time.perf_counter() - started
+            record("llm", elapsed)
+            llm_seconds.observe(elapsed, task, model)
+
+    output = "".join(parts).strip()
+    count_usage(task, model, prompt, output)
+    await store_result(task, key, output, cacheable)
 
 
 # ================================================================
-#  SAFE JSON PARSER — FIXED (Handles both {} and [])
+#  SAFE JSON PARSER — single pass, shared with streaming + MCQ
+#  (see services/json_stream.py). `expect` restricts the root to
+#  "{" or "[" when the caller knows the shape.
 # ================================================================
-def force_json(output: str):
-    # 1. Try direct JSON parsing (cleanest)
-    try:
-        return json.loads(output)
-    except:
-        pass
-
-    # 2. Try extracting JSON Object {...}
-    try:
-        match = re.search(r"\{.*\}", output, re.DOTALL)
-        if match:
-            return json.loads(match.group(0))
-    except:
-        pass
-
-    # 3. Try extracting JSON Array [...]
-    try:
-        match = re.search(r"\[.*\]", output, re.DOTALL)
-        if match:
-            return json.loads(match.group(0))
-    except:
-        pass
-
-    # 4. Final fallback: Wrap as single explanation section
+def force_json(output: str, expect: str = None):
+    # 1. First JSON value in the output (prose around it is ignored,
+    #    truncated output is repaired)
+    with stage("parse"):
+        value = extract_json(output, expect=expect)
+    if value is not None:
+        return value
+
+    # 2. Final fallback: Wrap as single explanation section
     # This prevents the app from crashing if AI fails completely
     return {
         "title": "AI Error",
@@ -67,11 +234,64 @@ def force_json(output: str):
     }
 
 
+def parse_failed(result) -> bool:
+    """True for force_json's fallback object (the output held no JSON)."""
+    return isinstance(result, dict) and result.get("error") is True and "raw_output" in result
+
+
+# Every prompt names the root it wants; asking for it keeps prose such
+# as "see [1]" or "use {} for sets" from being taken as the answer
+def json_object(output: str):
+    return force_json(output, expect="{")
+
+
+def json_array(output: str):
+    return force_json(output, expect="[")
+
+
+def has_json(output: str, expect: str = None) -> bool:
+    """`cacheable` check for streamed JSON tasks."""
+    return not parse_failed(force_json(output, expect=expect))
+
+
+# ================================================================
+#  ROUTED CALL WITH ESCALATION
+#  ai() + parse. When the router's (small) model returns output that
+#  cannot be parsed, the prompt is sent once more to the large model.
+#  Only output that parses is cached: an unparseable answer is asked
+#  for again next time instead of being replayed from the cache.
+# ================================================================
+async def ai_parsed(prompt: str, task: str = "general", use_cache: bool = True,
+                    parse=force_json, failed=parse_failed):
+    # The cacheable check parses a fresh completion; keep that result
+    # instead of parsing the same output twice
+    parsed = {}
+
+    def cacheable(output):
+        parsed[output] = parse(output)
+        return not failed(parsed[output])
+
+    async def call(model):
+        output = await ai(prompt, task=task, use_cache=use_cache, model=model, cacheable=cacheable)
+        return parsed[output] if output in parsed else parse(output)
+
+    model = model_router.choose(task, prompt)
+    result = await call(model)
+    if not failed(result):
+        return result
+
+    larger = model_router.escalation(task, model)
+    if larger is None:
+        return result
+    print(f"🔁 {task}: {model} output did not parse, retrying on {larger}")
+    return await call(larger)
+
+
 # ================================================================
 #  EXPLAIN TOPIC — BEST IN THE WORLD
 # ================================================================
-def explain_topic(topic: str):
-    prompt = f"""
+def explain_prompt(topic: str) -> str:
+    return f"""
 You are an expert Professor and Communicator. Your goal is to explain the input deeply, clearly, and engagingly.
 
 ⚡ INTERNAL RULES ⚡
@@ -118,14 +338,16 @@ You are an expert Professor and Communicator. Your goal is to explain the input
 
 Input Topic/Question: "{topic}"
 """
-    raw = ai(prompt)
-    return force_json(raw)
+
+
+async def explain_topic(topic: str, use_cache: bool = True):
+    return await ai_parsed(explain_prompt(topic), task="explain", use_cache=use_cache, parse=json_array)
 
 
 # ================================================================
 #  STRUCTURED SUMMARY GENERATOR
 # ================================================================
-def summarize_text(text: str):
+async def summarize_text(text: str, use_cache: bool = True):
     prompt = f"""
 You are an expert Document Analyst. Your goal is to create a structured, visually appealing summary of the provided text.
 
@@ -164,15 +386,152 @@ You must return a valid JSON object. No Markdown. No text outside JSON.
 Input Text:
 {text}
 """
-    raw = ai(prompt)
-    return force_json(raw)
+    return await ai_parsed(prompt, task="summarize", use_cache=use_cache, parse=json_object)
 
 
 # ================================================================
-#  PREMIUM NOTES GENERATOR
+#  LARGE DOCUMENT SUMMARY (MAP-REDUCE)
+#  Map: each page-aligned chunk goes through summarize_text in
+#       parallel (bounded). Each chunk prompt is cached on its own,
+#       so re-uploading a PDF with one edited page only pays for
+#       that chunk plus the cheap merge.
+#  Reduce: partial summaries are merged into the same schema,
+#       in groups if they do not fit one prompt.
+#  A chunk or merge whose answer does not parse is retried once; if
+#  it fails again the summary is marked partial instead of silently
+#  leaving those pages out.
 # ================================================================
-def generate_notes(text: str):
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "6000"))
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "4"))
+
+
+def usable_summary(summary) -> bool:
+    return isinstance(summary, dict) and not summary.get("error")
+
+
+async def merge_summaries(partials: list, use_cache: bool = True):
     prompt = f"""
+You are an expert Document Analyst. Below are JSON summaries of consecutive parts of ONE document, in order.
+Merge them into a single structured summary of the whole document.
+
+⚡ MERGE RULES:
+- Pick ONE "document_type" and write ONE short, catchy "title" for the whole document.
+- "overview": 2-3 sentences covering the entire document, not just the first part.
+- "sections": combine overlapping sections, keep document order, max 8 sections.
+- "quick_stats": 2-4 stats relevant to the whole document.
+- "key_takeaways": the 3-5 most important insights overall.
+- Only include information present in the partial summaries.
+
+⚡ OUTPUT FORMAT (STRICT JSON, same schema as the parts):
+{{
+  "document_type": "Resume" | "Academic" | "General",
+  "emoji": "📄",
+  "title": "...",
+  "overview": "...",
+  "quick_stats": [{{"label": "...", "value": "..."}}],
+  "sections": [{{"heading": "...", "content": "...", "bullets": ["..."]}}],
+  "key_takeaways": ["..."]
+}}
+
+Partial Summaries:
+{json.dumps(partials, ensure_ascii=False)}
+"""
+    return await ai_parsed(prompt, task="summary_merge", use_cache=use_cache, parse=json_object)
+
+
+async def summarize_document(pages: list, use_cache: bool = True, on_progress=None):
+    """
+    Summarize a (possibly huge) document given as a list of page texts.
+    on_progress(done, total) is called as each chunk summary finishes.
+    If some parts could not be summarized, the result carries
+    "partial": True and "failed_chunks" (chunk index + page range).
+    """
+    with stage("prompt"):
+        chunks = chunk_pages(pages, max_tokens=SUMMARY_CHUNK_TOKENS)
+    done = 0
+
+    def report():
+        if on_progress:
+            on_progress(done, len(chunks))
+
+    async def retried(label, summarize):
+        # A bad answer is not cached, so one more call asks the model again
+        summary = await summarize(use_cache)
+        if not usable_summary(summary):
+            print(f"🔁 {label} did not parse, retrying once")
+            summary = await summarize(False)
+        return summary
+
+    if not chunks:
+        return force_json("")
+    if len(chunks) == 1:
+        summary = await retried("Summary", lambda cache: summarize_text(chunks[0].text, use_cache=cache))
+        done = 1
+        report()
+        return summary
+
+    # 1. MAP: summarize chunks concurrently, at most SUMMARY_CONCURRENCY at a time
+    semaphore = asyncio.Semaphore(SUMMARY_CONCURRENCY)
+
+    async def summarize_chunk(chunk):
+        nonlocal done
+        async with semaphore:
+            summary = await retried(f"Summary of chunk {chunk.index}",
+                                    lambda cache: summarize_text(chunk.text, use_cache=cache))
+        done += 1
+        report()
+        return summary
+
+    results = await asyncio.gather(*(summarize_chunk(c) for c in chunks))
+    # (summary, chunks it covers); chunks whose summary failed are reported
+    partials = [(r, [c]) for r, c in zip(results, chunks) if usable_summary(r)]
+    failed = [c for r, c in zip(results, chunks) if not usable_summary(r)]
+
+    if not partials:
+        return results[0]
+
+    # 2. REDUCE: merge groups that fit the budget until one summary remains
+    async def reduce_group(group):
+        if len(group) == 1:
+            return group[0]
+        summaries = [summary for summary, _ in group]
+        merged = await retried("Summary merge", lambda cache: merge_summaries(summaries, use_cache=cache))
+        return merged, [c for _, covered in group for c in covered]
+
+    while len(partials) > 1:
+        groups, group, group_tokens = [], [], 0
+        for partial in partials:
+            tokens = estimate_tokens(json.dumps(partial[0], ensure_ascii=False))
+            if group and group_tokens + tokens > SUMMARY_CHUNK_TOKENS:
+                groups.append(group)
+                group, group_tokens = [], 0
+            group.append(partial)
+            group_tokens += tokens
+        groups.append(group)
+
+        if len(groups) == len(partials):
+            # Every partial is too big to pair up; merge them all anyway
+            groups = [partials]
+
+        merged = await asyncio.gather(*(reduce_group(g) for g in groups))
+        partials = [m for m in merged if usable_summary(m[0])]
+        if not partials:
+            return merged[0][0]
+        failed += [c for summary, covered in merged if not usable_summary(summary) for c in covered]
+
+    summary = partials[0][0]
+    if failed:
+        failed.sort(key=lambda c: c.index)
+        print(f"⚠️ Summary is partial: {len(failed)} of {len(chunks)} chunks failed")
+        summary = {**summary, "partial": True, "failed_chunks": [c.to_dict() for c in failed]}
+    return summary
+
+
+# ================================================================
+#  PREMIUM NOTES GENERATOR
+# ================================================================
+def notes_prompt(text: str) -> str:
+    return f"""
 You are an expert Academic Tutor using the Cornell Note-Taking method.
 Analyze the provided text and organize it into a structured, exam-ready study guide.
 
@@ -208,15 +567,36 @@ Return ONLY a valid JSON object. No markdown blocks.
 Input Text:
 {text}
 """
-    raw = ai(prompt)
-    return force_json(raw)
+
+
+async def generate_notes(text: str, use_cache: bool = True):
+    return await ai_parsed(notes_prompt(text), task="notes", use_cache=use_cache, parse=json_object)
 
 
 # ================================================================
 #  STRICT QnA — ZERO HALLUCINATION
+#  Short texts are sent whole. Longer ones go through the BM25
+#  index (built once per document) and only the top-k passages are
+#  sent; "evidence_source" maps the quote back to chunk/page offsets.
 # ================================================================
-def answer_question(text: str, question: str):
-    prompt = f"""
+QNA_FULL_CONTEXT_TOKENS = int(os.getenv("QNA_FULL_CONTEXT_TOKENS", "3000"))
+QNA_TOP_K = int(os.getenv("QNA_TOP_K", "5"))
+
+
+@timed("prompt")
+def qna_prompt(text: str, question: str, index=None):
+    """Returns (prompt, passages). passages is None when the whole text is sent."""
+    passages = None
+    context = text
+
+    if estimate_tokens(text) > QNA_FULL_CONTEXT_TOKENS:
+        index = index or get_index(text)
+        passages = [chunk for _, chunk in index.search(question, k=QNA_TOP_K)] or index.chunks[:QNA_TOP_K]
+        # Document order reads more naturally than score order
+        passages.sort(key=lambda chunk: chunk.index)
+        context = "\n\n".join(f"[Passage {chunk.index + 1}]\n{chunk.text}" for chunk in passages)
+
+    return f"""
 You are an intelligent Exam Tutor. Answer the user's question based STRICTLY on the provided context text.
 
 ⚡ RULES:
@@ -241,19 +621,42 @@ OR (if answer not found):
 }}
 
 CONTEXT TEXT:
-{text}
+{context}
 
 USER QUESTION:
 {question}
-"""
-    raw = ai(prompt)
-    return force_json(raw)
+""", passages
+
+
+def finish_answer(raw: str, passages):
+    result = json_object(raw)
+
+    if passages and isinstance(result, dict) and result.get("evidence"):
+        chunk, quote_offset = locate_evidence(result["evidence"], passages)
+        if chunk is not None:
+            result["evidence_source"] = {**chunk.to_dict(), "quote_offset": quote_offset}
+
+    return result
+
+
+async def answer_question(text: str, question: str, use_cache: bool = True, index=None):
+    prompt, passages = qna_prompt(text, question, index=index)
+    return await ai_parsed(prompt, task="qna", use_cache=use_cache,
+                           parse=lambda raw: finish_answer(raw, passages))
 
 
 # ================================================================
 #  MIND MAP (MERMAID JS)
 # ================================================================
-def generate_mindmap(text: str):
+MERMAID_HEADERS = ("graph", "flowchart")
+
+
+def clean_mermaid(raw: str) -> str:
+    # Cleaning: Remove markdown wrappers if the AI adds them by mistake
+    return raw.replace("```mermaid", "").replace("```", "").strip()
+
+
+async def generate_mindmap(text: str, use_cache: bool = True):
     prompt = f"""
     You are an expert Visual Learning Assistant.
     Convert the following text into a **Mermaid.js** flowchart syntax (`graph TD`).
@@ -274,17 +677,14 @@ def generate_mindmap(text: str):
     INPUT TEXT:
     {text}
     """
-    raw = ai(prompt)
-    
-    # Cleaning: Remove markdown wrappers if the AI adds them by mistake
-    clean_code = raw.replace("```mermaid", "").replace("```", "").strip()
-    return clean_code
+    return await ai_parsed(prompt, task="mindmap", use_cache=use_cache,
+                           parse=clean_mermaid, failed=lambda code: not code.startswith(MERMAID_HEADERS))
 
 
 # ================================================================
 #  FLASHCARDS GENERATOR
 # ================================================================
-def generate_flashcards(text: str):
+async def generate_flashcards(text: str, use_cache: bool = True):
     prompt = f"""
     You are an expert Exam Prep Tutor.
     Create 6 to 8 high-quality Flashcards based on the provided text.
@@ -299,5 +699,58 @@ def generate_flashcards(text: str):
     INPUT TEXT:
     {text}
     """
-    raw = ai(prompt)
-    return force_json(raw)
\ No newline at end of file
+    return await ai_parsed(prompt, task="flashcards", use_cache=use_cache, parse=json_array)
+
+
+# ================================================================
+#  MCQ GENERATOR
+# ================================================================
+def mcq_prompt(text: str, count: int) -> str:
+    return (
+        f"You are a strict educational API that outputs only raw JSON.\n"
+        f"Task: Create exactly {count} professional multiple-choice questions "
+        f"based on the text provided below.\n\n"
+        
+        f"Constraints:\n"
+        f"1. Output MUST be a valid JSON array.\n"
+        f"2. Do NOT write 'Here are the questions' or any introductory text.\n"
+        f"3. Do NOT use Markdown formatting (no ```json code blocks).\n"
+        f"4. Each question must have 4 distinct options.\n"
+        f"5. The 'correctAnswer' must match one of the options exactly.\n\n"
+        
+        f"Required JSON Structure:\n"
+        f"[\n"
+        f"  {{\n"
+        f"    \"question\": \"Question text...\",\n"
+        f"    \"options\": [\"Option A\", \"Option B\", \"Option C\", \"Option D\"],\n"
+        f"    \"correctAnswer\": \"Option A\",\n"
+        f"    \"explanation\": \"Brief explanation of why this is correct.\"\n"
+        f"  }}\n"
+        f"]\n\n"
+        
+        f"Text to process:\n"
+        f"\"\"\"{text}\"\"\""
+    )
+
+
+async def generate_mcqs(text: str, count: int = 5, use_cache: bool = True):
+    """
+    List of complete questions, or force_json's error object when the
+    output held no JSON array.
+    """
+    # First JSON array in the output, repaired if the model was cut off
+    # mid-array; retried on the large model if a small one returned no
+    # array at all
+    mcqs = await ai_parsed(
+        mcq_prompt(text, count), task="mcq", use_cache=use_cache,
+        parse=json_array,
+        failed=lambda value: not isinstance(value, list),
+    )
+    if not isinstance(mcqs, list):
+        return mcqs
+
+    # Drop questions left incomplete by a truncated response
+    return [
+        q for q in mcqs
+        if isinstance(q, dict) and q.get("question") and q.get("options") and q.get("correctAnswer")
+    ]
@@ -0,0 +1,205 @@
+# ================================================================
+#  CACHE PRIMITIVES
+#  In-process LRU + TTL tier with counters, plus an optional
+#  MongoDB-backed shared tier (survives restarts, shared by workers).
+# ================================================================
+
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+
+class TTLCache:
+    """
+    Bounded LRU cache where every entry also expires after `ttl` seconds.
+    Optionally bounded by total weight too (e.g. bytes): pass `max_weight`
+    and a `weigher(value) -> int`.
+    Not thread-safe by design: it is only touched from the event loop.
+    """
+
+    def __init__(self, max_size: int = 512, ttl: float = 3600, max_weight: int = None, weigher=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_weight = max_weight
+        self.weigher = weigher
+        self.weight = 0
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def _weigh(self, value) -> int:
+        return self.weigher(value) if self.weigher else 0
+
+    def _remove(self, key):
+        _, value = self._data.pop(key)
+        self.weight -= self._weigh(value)
+        return value
+
+    def set(self, key, value, ttl: float = None):
+        if key in self._data:
+            self._remove(key)
+
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (expires_at, value)
+        self.weight += self._weigh(value)
+
+        # Evict least-recently-used entries, but never the one just added
+        while len(self._data) > 1 and (
+            len(self._data) > self.max_size
+            or (self.max_weight is not None and self.weight > self.max_weight)
+        ):
+            self._remove(next(iter(self._data)))
+            self.evictions += 1
+
+    def pop(self, key, default=None):
+        if key not in self._data:
+            return default
+        return self._remove(key)
+
+    def __contains__(self, key):
+        entry = self._data.get(key)
+        return entry is not None and entry[0] >= time.monotonic()
+
+    def __len__(self):
+        return len(self._data)
+
+    def clear(self):
+        self._data.clear()
+        self.weight = 0
+
+    def stats(self):
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "weight": self.weight,
+            "max_weight": self.max_weight,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class MongoCacheTier:
+    """
+    Shared cache tier stored in a MongoDB collection.
+    Expiry is enforced by a TTL index on 'expires_at'. Calls run in a
+    worker thread so the blocking pymongo driver never stalls the loop.
+    Any database error is treated as a miss: the cache must never break a request.
+    """
+
+    def __init__(self, collection, ttl: float = 86400):
+        self.collection = collection
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._index_ready = False
+
+    def _ensure_index(self):
+        if not self._index_ready:
+            self.collection.create_index("expires_at", expireAfterSeconds=0)
+            self._index_ready = True
+
+    def _get_sync(self, key):
+        self._ensure_index()
+        doc = self.collection.find_one({"_id": key}, {"value": 1, "expires_at": 1})
+        if doc is None:
+            return None
+        # The TTL monitor only runs once a minute, so double-check expiry.
+        expires_at = doc["expires_at"]
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        if expires_at < datetime.now(timezone.utc):
+            return None
+        return doc["value"]
+
+    def _set_sync(self, key, value):
+        self._ensure_index()
+        self.collection.replace_one(
+            {"_id": key},
+            {
+                "_id": key,
+                "value": value,
+                "expires_at": datetime.now(timezone.utc) + timedelta(seconds=self.ttl),
+            },
+            upsert=True,
+        )
+
+    async def get(self, key):
+        try:
+            value = await asyncio.to_thread(self._get_sync, key)
+        except Exception as e:
+            self.errors += 1
+            print(f"⚠️ Shared cache read failed: {e}")
+            value = None
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key, value):
+        try:
+            await asyncio.to_thread(self._set_sync, key, value)
+        except Exception as e:
+            self.errors += 1
+            print(f"⚠️ Shared cache write failed: {e}")
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "errors": self.errors}
+
+
+class TieredCache:
+    """Memory tier in front of an optional shared tier (read-through, write-both)."""
+
+    def __init__(self, memory: TTLCache, shared: MongoCacheTier = None):
+        self.memory = memory
+        self.shared = shared
+        self.bypassed = 0
+        self.rejected = 0   # outputs the caller refused to cache (unparseable)
+
+    async def get(self, key):
+        value = self.memory.get(key)
+        if value is not None or self.shared is None:
+            return value
+
+        value = await self.shared.get(key)
+        if value is not None:
+            # Promote so the next hit on this worker stays in-process
+            self.memory.set(key, value)
+        return value
+
+    async def set(self, key, value):
+        self.memory.set(key, value)
+        if self.shared is not None:
+            await self.shared.set(key, value)
+
+    def stats(self):
+        return {
+            "memory": self.memory.stats(),
+            "shared": self.shared.stats() if self.shared else None,
+            "bypassed": self.bypassed,
+            "rejected": self.rejected,
+        }
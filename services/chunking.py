@@ -0,0 +1,161 @@
+# ================================================================
+#  CHUNKING ENGINE
+#  Splits a document into LLM-sized chunks along page and heading
+#  boundaries, within a token budget.
+# ================================================================
+
+import hashlib
+import re
+
+# Rough token estimate for Llama-family tokenizers (~4 chars per token)
+CHARS_PER_TOKEN = 4
+
+# A chunk is also closed after any page whose content hash hits this
+# modulus. These content-defined anchors keep chunk boundaries stable
+# when one page is edited: boundaries only shift until the next anchor,
+# so unchanged chunks keep the same text (and the same cache key).
+ANCHOR_MODULUS = 16
+
+PAGE_BREAK = "\f"
+
+HEADING_RE = re.compile(
+    r"^(?:"
+    r"#{1,6}\s+\S.*"                                # Markdown heading
+    r"|(?i:chapter|section|unit|part)\s+[\w.]+.*"   # Chapter 3 / Section 2.1 (any case)
+    r"|\d+(?:\.\d+)*\.?\s+[A-Z].{0,80}"             # 2.1 Heading Text
+    r"|[A-Z][A-Z0-9 ,:&()'-]{3,80}"                 # ALL CAPS HEADING
+    r")$",
+    re.MULTILINE,
+)
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+class Chunk:
+    """A slice of the document. Pages are 1-based; offset is the char offset inside page_start."""
+
+    __slots__ = ("index", "text", "page_start", "page_end", "offset")
+
+    def __init__(self, index, text, page_start, page_end, offset=0):
+        self.index = index
+        self.text = text
+        self.page_start = page_start
+        self.page_end = page_end
+        self.offset = offset
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.text)
+
+    def to_dict(self):
+        return {
+            "chunk": self.index,
+            "page_start": self.page_start,
+            "page_end": self.page_end,
+            "offset": self.offset,
+        }
+
+
+def split_pages(text: str):
+    """Plain text has no page structure unless it carries form feeds."""
+    return text.split(PAGE_BREAK) if PAGE_BREAK in text else [text]
+
+
+def _is_anchor(page_text: str) -> bool:
+    digest = hashlib.blake2b(page_text.encode("utf-8"), digest_size=4).digest()
+    return int.from_bytes(digest, "big") % ANCHOR_MODULUS == 0
+
+
+def _split_blocks(text: str):
+    """
+    Yield (offset, block) pieces that start at heading lines or blank-line
+    paragraph breaks, in document order.
+    """
+    cuts = {0}
+    for m in HEADING_RE.finditer(text):
+        cuts.add(m.start())
+    for m in re.finditer(r"\n\s*\n", text):
+        cuts.add(m.end())
+
+    ordered = sorted(cuts) + [len(text)]
+    for start, end in zip(ordered, ordered[1:]):
+        if end > start:
+            yield start, text[start:end]
+
+
+def _split_oversized(text: str, max_chars: int):
+    """Split one oversized page into (offset, piece) parts, preferring headings and paragraphs."""
+    pieces = []
+    buf_start, buf = 0, ""
+
+    for offset, block in _split_blocks(text):
+        # A single block larger than the budget is hard-split on whitespace
+        while len(block) > max_chars:
+            cut = block.rfind(" ", 0, max_chars)
+            cut = cut if cut > max_chars // 2 else max_chars
+            if buf:
+                pieces.append((buf_start, buf))
+                buf = ""
+            pieces.append((offset, block[:cut]))
+            offset, block = offset + cut, block[cut:]
+
+        if buf and len(buf) + len(block) > max_chars:
+            pieces.append((buf_start, buf))
+            buf = ""
+        if not buf:
+            buf_start = offset
+        buf += block
+
+    if buf.strip():
+        pieces.append((buf_start, buf))
+    return pieces
+
+
+def chunk_pages(pages, max_tokens: int = 6000):
+    """
+    Group pages into chunks of at most `max_tokens`.
+    - Pages are never merged across a chunk that would overflow the budget.
+    - A page larger than the budget is split on heading / paragraph boundaries.
+    - Empty pages are skipped but still counted for page numbers.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    chunks = []
+    buf, buf_start, buf_end, buf_chars, buf_offset = [], None, None, 0, 0
+
+    def flush():
+        nonlocal buf, buf_start, buf_chars
+        if buf:
+            chunks.append(Chunk(len(chunks), "\n\n".join(buf), buf_start, buf_end, buf_offset))
+        buf, buf_start, buf_chars = [], None, 0
+
+    for page_no, raw in enumerate(pages, start=1):
+        page_text = raw.strip()
+        if not page_text:
+            continue
+        # Offsets point into the page as given, before any stripping
+        lead = len(raw) - len(raw.lstrip())
+
+        if len(page_text) > max_chars:
+            flush()
+            for offset, piece in _split_oversized(page_text, max_chars):
+                text = piece.strip()
+                offset += lead + len(piece) - len(piece.lstrip())
+                chunks.append(Chunk(len(chunks), text, page_no, page_no, offset))
+            continue
+
+        if buf and buf_chars + len(page_text) > max_chars:
+            flush()
+
+        if buf_start is None:
+            buf_start, buf_offset = page_no, lead
+        buf.append(page_text)
+        buf_chars += len(page_text) + 2
+        buf_end = page_no
+
+        if _is_anchor(page_text):
+            flush()
+
+    flush()
+    return chunks
@@ -0,0 +1,78 @@
+# ================================================================
+#  DOCUMENT STORE
+#  Upload a PDF or text once, then reference it by doc_id (content
+#  hash) from every study route. Extracted text and derived artifacts
+#  (chunks, retrieval index) live server-side with size-bounded
+#  LRU eviction.
+# ================================================================
+
+import hashlib
+import os
+import time
+
+from services.cache import TTLCache
+from services.chunking import split_pages
+
+
+class Document:
+    __slots__ = ("doc_id", "text", "pages", "filename", "created_at", "artifacts")
+
+    def __init__(self, doc_id, text, pages, filename=None):
+        self.doc_id = doc_id
+        self.text = text
+        self.pages = pages
+        self.filename = filename
+        self.created_at = time.time()
+        self.artifacts = {}
+
+    def artifact(self, name, factory):
+        """Return a derived artifact, building it on first use."""
+        value = self.artifacts.get(name)
+        if value is None:
+            value = self.artifacts[name] = factory()
+        return value
+
+    @property
+    def weight(self) -> int:
+        # Text + per-page copy + derived artifacts (the BM25 index is
+        # roughly the size of the text) ~= 3x the text size.
+        return 3 * len(self.text)
+
+    def to_dict(self):
+        return {
+            "doc_id": self.doc_id,
+            "filename": self.filename,
+            "pages": len(self.pages),
+            "chars": len(self.text),
+        }
+
+
+def document_id(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+documents = TTLCache(
+    max_size=int(os.getenv("DOCUMENT_STORE_MAX_DOCS", "1000")),
+    ttl=float(os.getenv("DOCUMENT_STORE_TTL", str(6 * 3600))),
+    max_weight=int(os.getenv("DOCUMENT_STORE_MAX_MB", "256")) * 1024 * 1024,
+    weigher=lambda doc: doc.weight,
+)
+
+
+def put_pages(pages, filename=None) -> Document:
+    text = "\n\n".join(page for page in pages if page.strip()).strip()
+    doc_id = document_id(text)
+
+    doc = documents.get(doc_id)
+    if doc is None:
+        doc = Document(doc_id, text, list(pages), filename)
+        documents.set(doc_id, doc)
+    return doc
+
+
+def put_text(text: str) -> Document:
+    return put_pages(split_pages(text))
+
+
+def get_document(doc_id: str):
+    return documents.get(doc_id)
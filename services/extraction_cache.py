@@ -0,0 +1,184 @@
+# ================================================================
+#  PDF EXTRACTION CACHE (local disk)
+#  docs/<sha256 of file>.json  -> ordered page keys of that PDF
+#  pages/<ab>/<page key>.txt   -> extracted text of one page
+#  A page key hashes the page's content stream, size and fonts, so a
+#  re-upload skips PyMuPDF entirely and an edited PDF only re-parses
+#  the pages whose content changed. Total size is bounded; the least
+#  recently used files are evicted first.
+# ================================================================
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+class ExtractionCache:
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._files = None          # path -> (size, last_used), loaded lazily
+        self._total = 0
+
+        self.doc_hits = 0
+        self.doc_misses = 0
+        self.page_hits = 0
+        self.page_misses = 0
+        self.evictions = 0
+
+    # ------------------------------------------------------------
+    #  Paths / index
+    # ------------------------------------------------------------
+    def _doc_path(self, digest):
+        return os.path.join(self.root, "docs", f"{digest}.json")
+
+    def _page_path(self, key):
+        return os.path.join(self.root, "pages", key[:2], f"{key}.txt")
+
+    def _load_index(self):
+        """Scan the cache dir once per process (called with the lock held)."""
+        if self._files is not None:
+            return
+        self._files = {}
+        for folder, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(folder, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                self._files[path] = (st.st_size, st.st_mtime)
+                self._total += st.st_size
+
+    def _touch(self, path):
+        size, _ = self._files.get(path, (0, 0))
+        self._files[path] = (size, time.time())
+
+    def _read(self, path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = f.read()
+        except OSError:
+            self._forget(path)
+            return None
+        self._touch(path)
+        return data
+
+    def _write(self, path, data: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write-then-rename: readers never see a half-written entry
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+        self._forget(path)
+        size = os.path.getsize(path)
+        self._files[path] = (size, time.time())
+        self._total += size
+
+    def _forget(self, path):
+        size, _ = self._files.pop(path, (0, 0))
+        self._total -= size
+
+    def _evict(self):
+        if self._total <= self.max_bytes:
+            return
+        for path, _ in sorted(self._files.items(), key=lambda item: item[1][1]):
+            if self._total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            self._forget(path)
+            self.evictions += 1
+
+    # ------------------------------------------------------------
+    #  Public API (blocking; call from a thread)
+    # ------------------------------------------------------------
+    def get_document(self, digest):
+        """Pages of a previously seen file, or None."""
+        with self._lock:
+            self._load_index()
+            raw = self._read(self._doc_path(digest))
+            pages = None
+            if raw is not None:
+                pages = [self._read(self._page_path(key)) for key in json.loads(raw)]
+                if any(page is None for page in pages):
+                    pages = None  # some pages were evicted: fall back to page-level reuse
+            if pages is None:
+                self.doc_misses += 1
+            else:
+                self.doc_hits += 1
+                self.page_hits += len(pages)
+            return pages
+
+    def get_pages(self, keys):
+        """Cached text per page key, None where missing."""
+        with self._lock:
+            self._load_index()
+            pages = [self._read(self._page_path(key)) for key in keys]
+            found = sum(page is not None for page in pages)
+            self.page_hits += found
+            self.page_misses += len(pages) - found
+            return pages
+
+    def put_document(self, digest, keys, pages):
+        with self._lock:
+            self._load_index()
+            for key, text in zip(keys, pages):
+                path = self._page_path(key)
+                if path in self._files:
+                    self._touch(path)
+                else:
+                    self._write(path, text)
+            self._write(self._doc_path(digest), json.dumps(keys))
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._load_index()
+            for path in list(self._files):
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+                self._forget(path)
+
+    def stats(self):
+        with self._lock:
+            self._load_index()
+            docs = self.doc_hits + self.doc_misses
+            pages = self.page_hits + self.page_misses
+            return {
+                "doc_hits": self.doc_hits,
+                "doc_misses": self.doc_misses,
+                "doc_hit_ratio": round(self.doc_hits / docs, 3) if docs else 0.0,
+                "page_hits": self.page_hits,
+                "page_misses": self.page_misses,
+                "page_hit_ratio": round(self.page_hits / pages, 3) if pages else 0.0,
+                "evictions": self.evictions,
+                "size_mb": round(self._total / 2**20, 2),
+                "max_mb": round(self.max_bytes / 2**20, 2),
+            }
+
+
+def page_key(page) -> str:
+    """Hash of what determines a page's text: content stream, size and fonts."""
+    h = hashlib.sha256(page.read_contents())
+    h.update(repr(tuple(page.rect)).encode())
+    for font in page.get_fonts():
+        # (xref, ext, type, basefont, name, encoding): xrefs differ between files
+        h.update(repr(font[2:]).encode())
+    return h.hexdigest()
+
+
+extraction_cache = ExtractionCache(
+    root=os.getenv("PDF_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "ai-study-pdf-cache"),
+    max_bytes=int(os.getenv("PDF_CACHE_MAX_MB", "512")) * 1024 * 1024,
+)
@@ -0,0 +1,95 @@
+# ================================================================
+#  HISTORY RESULT COMPRESSION
+#  Large `result` payloads (notes, summaries, MCQ arrays, mermaid
+#  code) can be stored as compressed JSON instead of raw documents:
+#
+#    {"result": null, "result_z": {"v": 1, "codec": "zlib", "data": <binary>}}
+#
+#  decode_record() turns either form back into a plain `result`, so
+#  readers never care how a record was stored. `v` versions the
+#  envelope; unknown versions/codecs are reported, not guessed.
+# ================================================================
+
+import json
+import os
+import zlib
+
+from bson import Binary
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+ENVELOPE_VERSION = 1
+
+# off | zlib | zstd  (zstd needs the `zstandard` package)
+HISTORY_COMPRESSION = os.getenv("HISTORY_COMPRESSION", "off").lower()
+
+# Results smaller than this (serialized bytes) are stored as-is
+HISTORY_COMPRESS_MIN_BYTES = int(os.getenv("HISTORY_COMPRESS_MIN_BYTES", "2048"))
+
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def _codec(name: str) -> str:
+    if name == "zstd" and zstandard is None:
+        print("⚠️ HISTORY_COMPRESSION=zstd but 'zstandard' is not installed; using zlib")
+        return "zlib"
+    return name if name in ("zlib", "zstd") else "off"
+
+
+DEFAULT_CODEC = _codec(HISTORY_COMPRESSION)
+
+
+def serialize(result) -> bytes:
+    return json.dumps(result, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def compress(raw: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    return zlib.compress(raw, ZLIB_LEVEL)
+
+
+def decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise ValueError("record is zstd-compressed but 'zstandard' is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == "zlib":
+        return zlib.decompress(data)
+    raise ValueError(f"unknown history codec: {codec}")
+
+
+def encode_result(result, codec: str = None, min_bytes: int = None) -> dict:
+    """
+    Storage fields for `result`: {"result": result} when small (or
+    compression is off), else {"result": None, "result_z": envelope}.
+    """
+    codec = DEFAULT_CODEC if codec is None else _codec(codec)
+    min_bytes = HISTORY_COMPRESS_MIN_BYTES if min_bytes is None else min_bytes
+    if codec == "off":
+        return {"result": result}
+
+    raw = serialize(result)
+    if len(raw) < min_bytes:
+        return {"result": result}
+
+    data = compress(raw, codec)
+    if len(data) >= len(raw):
+        # Incompressible: keep it readable
+        return {"result": result}
+    return {"result": None, "result_z": {"v": ENVELOPE_VERSION, "codec": codec, "data": Binary(data)}}
+
+
+def decode_record(doc: dict) -> dict:
+    """Replace a `result_z` envelope with the decoded `result` (in place)."""
+    envelope = doc.pop("result_z", None)
+    if envelope is None:
+        return doc
+    if envelope.get("v") != ENVELOPE_VERSION:
+        raise ValueError(f"unsupported history envelope version: {envelope.get('v')}")
+    doc["result"] = json.loads(decompress(bytes(envelope["data"]), envelope["codec"]))
+    return doc
@@ -1,26 +1,347 @@
-from db.mongo import history_collection
+import asyncio
+import os
+from collections import deque
 from datetime import datetime, timezone
 
-def save_history(user_id: str, action_type: str, input_data, result_data):
+from bson import ObjectId
+from pymongo import DESCENDING
+from pymongo.errors import BulkWriteError
+
+from db.mongo import history_collection_async
+from services.history_codec import encode_result, decode_record
+from services.metrics import stage, detach
+
+
+# ================================================================
+#  HISTORY WRITE-BEHIND BUFFER
+#  save_history() only appends to a bounded in-memory buffer; one
+#  flusher task writes it with insert_many(ordered=False) whenever
+#  `batch_size` records are waiting or `flush_interval` has passed,
+#  so N requests cost about N / batch_size Mongo round trips.
+#  When the buffer is full, callers wait up to `enqueue_timeout`
+#  (backpressure) and the record is then dropped and counted.
+#  close() flushes everything that is left (app shutdown).
+# ================================================================
+class HistoryWriter:
+    def __init__(self, collection, batch_size: int = 100, flush_interval: float = 1.0,
+                 max_queue: int = 10000, enqueue_timeout: float = 0.5):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.enqueue_timeout = enqueue_timeout
+
+        self._buffer = deque()
+        self._wake = asyncio.Event()
+        self._space = asyncio.Condition()
+        self._task = None
+        self._flushing = None
+
+        self.enqueued = 0
+        self.written = 0
+        self.failed = 0
+        self.dropped = 0
+        self.backpressured = 0
+        self.batches = 0
+        self.max_depth = 0
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def put(self, doc: dict):
+        self._ensure_started()
+        if len(self._buffer) >= self.max_queue:
+            self.backpressured += 1
+            try:
+                async with self._space:
+                    await asyncio.wait_for(
+                        self._space.wait_for(lambda: len(self._buffer) < self.max_queue),
+                        self.enqueue_timeout,
+                    )
+            except asyncio.TimeoutError:
+                self.dropped += 1
+                if self.dropped % 100 == 1:
+                    print(f"⚠️ History buffer full, {self.dropped} record(s) dropped so far")
+                return
+
+        self._buffer.append(doc)
+        self.enqueued += 1
+        self.max_depth = max(self.max_depth, len(self._buffer))
+        if len(self._buffer) >= self.batch_size:
+            self._wake.set()
+
+    # ------------------------------------------------------------
+    #  Flushing
+    # ------------------------------------------------------------
+    async def _run(self):
+        detach()
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self._drain()
+
+    async def _drain(self):
+        while self._buffer:
+            batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+            async with self._space:
+                self._space.notify_all()
+            # Shielded: a shutdown mid-write must not lose the batch
+            self._flushing = asyncio.ensure_future(self._flush(batch))
+            await asyncio.shield(self._flushing)
+
+    async def _flush(self, batch):
+        self.batches += 1
+        try:
+            with stage("db"):
+                await self.collection.insert_many(batch, ordered=False)
+            self.written += len(batch)
+        except BulkWriteError as e:
+            inserted = e.details.get("nInserted", 0)
+            self.written += inserted
+            self.failed += len(batch) - inserted
+            print(f"❌ Error saving history: {len(batch) - inserted} of {len(batch)} records failed")
+        except Exception as e:
+            self.failed += len(batch)
+            print(f"❌ Error saving history: {e}")
+
+    async def close(self):
+        """Stop the flusher and write out everything still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._flushing is not None:
+            await asyncio.gather(self._flushing, return_exceptions=True)
+        await self._drain()
+
+    def stats(self):
+        return {
+            "queue_depth": len(self._buffer),
+            "max_depth": self.max_depth,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "backpressured": self.backpressured,
+            "batches": self.batches,
+            "avg_batch": round(self.written / self.batches, 1) if self.batches else 0.0,
+        }
+
+
+history_writer = HistoryWriter(
+    history_collection_async,
+    batch_size=int(os.getenv("HISTORY_BATCH_SIZE", "100")),
+    flush_interval=float(os.getenv("HISTORY_FLUSH_INTERVAL", "1.0")),
+    max_queue=int(os.getenv("HISTORY_MAX_QUEUE", "10000")),
+    enqueue_timeout=float(os.getenv("HISTORY_ENQUEUE_TIMEOUT", "0.5")),
+)
+
+
+def history_title(action_type: str, input_data, result_data) -> str:
+    """Short label stored with each record so history lists never need `result`."""
+    if isinstance(result_data, dict) and isinstance(result_data.get("title"), str):
+        return result_data["title"][:120]
+    if isinstance(input_data, dict):
+        for key in ("topic", "question", "filename", "text"):
+            value = input_data.get(key)
+            if isinstance(value, str) and value.strip():
+                return value.strip()[:120]
+    return action_type.replace("_", " ").title()
+
+
+# search_text keeps the first N characters of labels + result text
+SEARCH_TEXT_MAX_CHARS = int(os.getenv("HISTORY_SEARCH_MAX_CHARS", "4000"))
+
+
+def _strings(value):
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _strings(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from _strings(item)
+
+
+def history_search_text(action_type: str, input_data, result_data) -> str:
+    """
+    Plain text the history text index covers: title, topic/question/
+    filename and the result's strings (headings, summaries, answers),
+    capped so one huge document cannot bloat the index.
+    """
+    parts = [history_title(action_type, input_data, result_data)]
+    if isinstance(input_data, dict):
+        parts += [input_data[k] for k in ("topic", "question", "filename") if isinstance(input_data.get(k), str)]
+    parts += _strings(result_data)
+
+    out, seen, size = [], set(), 0
+    for part in parts:
+        part = part.strip()
+        if not part or part in seen:
+            continue
+        seen.add(part)
+        out.append(part[:SEARCH_TEXT_MAX_CHARS - size])
+        size += len(out[-1]) + 1
+        if size >= SEARCH_TEXT_MAX_CHARS:
+            break
+    return "\n".join(out)
+
+
+async def save_history(user_id: str, action_type: str, input_data, result_data):
     """
     Saves a user's interaction to the MongoDB 'history' collection.
-    Designed to run as a Background Task.
+    Designed to run as a Background Task: the record is buffered and
+    written in a batch by history_writer.
     """
     try:
         doc = {
             "user_id": user_id,
             "type": action_type,
+            "title": history_title(action_type, input_data, result_data),
             "input": input_data,
-            "result": result_data,
+            # Plain text for /api/history/search (kept outside result_z)
+            "search_text": history_search_text(action_type, input_data, result_data),
+            # Large results may be stored compressed (HISTORY_COMPRESSION)
+            **encode_result(result_data),
             # Uses modern timezone-aware UTC (Best practice)
             "created_at": datetime.now(timezone.utc)
         }
-        
-        history_collection.insert_one(doc)
-        
+
+        with stage("db"):
+            await history_writer.put(doc)
+
         # Optional: Uncomment this line if you want to see confirmations in your terminal
-        # print(f"✅ History saved for {action_type}")
+        # print(f"✅ History queued for {action_type}")
 
     except Exception as e:
         # This is crucial for background tasks so you know if something breaks
-        print(f"❌ Error saving history: {e}")
\ No newline at end of file
+        print(f"❌ Error saving history: {e}")
+
+
+# ================================================================
+#  READS: keyset pagination + projected list items
+#  Pages are ordered by (created_at, _id) newest first, and the next
+#  page starts strictly after the last item's pair, so page 100 costs
+#  the same index walk as page 1 (no skip).
+# ================================================================
+HISTORY_INDEX = [("user_id", 1), ("created_at", DESCENDING), ("_id", DESCENDING)]
+
+# List items carry only these fields; the full record is at /api/history/{id}
+LIST_PROJECTION = {
+    "type": 1, "title": 1, "created_at": 1,
+    # Fallback labels for records saved before `title` existed
+    "input.topic": 1, "input.question": 1, "input.filename": 1,
+}
+
+
+# Compound text index: the user_id equality prefix keeps each search
+# inside one user's postings instead of the whole collection's
+HISTORY_TEXT_INDEX = [("user_id", 1), ("search_text", "text")]
+
+
+async def ensure_history_indexes():
+    try:
+        await history_collection_async.create_index(HISTORY_INDEX, name="user_created_at")
+        await history_collection_async.create_index(
+            HISTORY_TEXT_INDEX, name="user_search_text", default_language="english"
+        )
+    except Exception as e:
+        print(f"⚠️ Could not ensure history indexes: {e}")
+
+
+def _as_object_id(value: str):
+    return ObjectId(value) if ObjectId.is_valid(value) else value
+
+
+def encode_cursor(doc) -> str:
+    """`before` token for the page after `doc`: '<created_at ISO>,<_id>'."""
+    return f"{doc['created_at'].isoformat()},{doc['_id']}"
+
+
+def decode_cursor(before: str):
+    created_at, _, doc_id = before.rpartition(",")
+    try:
+        return datetime.fromisoformat(created_at), _as_object_id(doc_id)
+    except ValueError:
+        raise ValueError("Invalid 'before' cursor") from None
+
+
+def list_item(doc) -> dict:
+    title = doc.get("title") or history_title(doc.get("type", ""), doc.get("input"), None)
+    return {
+        "_id": str(doc["_id"]),
+        "type": doc.get("type"),
+        "title": title,
+        "created_at": doc.get("created_at"),
+    }
+
+
+def _keyset(query: dict, before: str = None) -> dict:
+    if before:
+        created_at, doc_id = decode_cursor(before)
+        query["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": doc_id}},
+        ]
+    return query
+
+
+async def _page(query: dict, projection: dict, limit: int):
+    cursor = (
+        history_collection_async.find(query, projection)
+        .sort([("created_at", DESCENDING), ("_id", DESCENDING)])
+        .limit(limit + 1)  # one extra row tells us whether a next page exists
+    )
+    with stage("db"):
+        docs = await cursor.to_list(limit + 1)
+    next_before = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+    return docs[:limit], next_before
+
+
+async def list_history(user_id: str, before: str = None, limit: int = 50):
+    """One page of a user's history, newest first; returns (items, next_before)."""
+    docs, next_before = await _page(_keyset({"user_id": user_id}, before), LIST_PROJECTION, limit)
+    return [list_item(doc) for doc in docs], next_before
+
+
+async def search_history(user_id: str, q: str, types=None, before: str = None, limit: int = 20):
+    """
+    Full-text search over one user's history ($text on search_text),
+    newest first with the same keyset cursor as list_history; each item
+    also carries its text score. Returns (items, next_before).
+    """
+    q = (q or "").strip()
+    if not q:
+        raise ValueError("Search query 'q' must not be empty")
+
+    query = {"user_id": user_id, "$text": {"$search": q}}
+    if types:
+        query["type"] = {"$in": list(types)}
+    projection = {**LIST_PROJECTION, "score": {"$meta": "textScore"}}
+
+    docs, next_before = await _page(_keyset(query, before), projection, limit)
+    items = []
+    for doc in docs:
+        item = list_item(doc)
+        item["score"] = round(doc.get("score", 0.0), 3)
+        items.append(item)
+    return items, next_before
+
+
+async def get_history_item(user_id: str, history_id: str):
+    with stage("db"):
+        doc = await history_collection_async.find_one({"_id": _as_object_id(history_id), "user_id": user_id})
+    if doc:
+        doc["_id"] = str(doc["_id"])
+        doc.pop("search_text", None)
+        try:
+            decode_record(doc)
+        except Exception as e:
+            print(f"❌ Could not decode history result {history_id}: {e}")
+            doc["result"] = None
+    return doc
@@ -0,0 +1,405 @@
+# ================================================================
+#  BACKGROUND JOBS
+#  Long-running work (large-PDF summaries) runs in an in-process
+#  worker pool instead of holding the HTTP connection open. Every job
+#  has a record in MongoDB (status, progress, result), so clients poll
+#  GET /api/jobs/{id}, and jobs that were queued or running when the
+#  process stopped are picked up again on the next start.
+#  A job that hits a transient LLM error (429 from the admission
+#  controller, 503 from an open circuit) goes back to 'queued' with a
+#  growing delay instead of failing; every run counts as an attempt.
+#
+#  Several app processes may share the collection. A worker claims a
+#  job with one atomic find_one_and_update and holds a lease on it,
+#  renewed while the job runs. Other processes only take over a
+#  'running' job once its lease has expired (its owner crashed); a
+#  clean shutdown hands running jobs back to 'queued' at once.
+#
+#  JOB_DIR must be a persistent path in production: uploads of queued
+#  jobs wait there, and the system temp dir is often wiped on restart.
+# ================================================================
+
+import asyncio
+import contextlib
+import os
+import socket
+import tempfile
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ReturnDocument
+
+from db.mongo import jobs_collection
+from services.llm_governor import LLMOverloaded
+from services.llm_resilience import LLMUnavailable
+from services.metrics import stage, detach
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+
+# A job interrupted or retried this many times is marked failed
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+# Delay before re-running a job after a transient LLM error; doubles
+# per attempt, never below the error's Retry-After
+JOB_RETRY_DELAY = float(os.getenv("JOB_RETRY_DELAY", "5"))
+JOB_RETRY_MAX_DELAY = float(os.getenv("JOB_RETRY_MAX_DELAY", "300"))
+
+# A running job whose owner has not renewed its lease for this long is
+# taken over by another worker; also how often unfinished jobs are swept
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+
+# Errors that mean "try again later", not "this job cannot succeed"
+RETRYABLE = (LLMOverloaded, LLMUnavailable)
+
+# Uploads for queued jobs live here until the job finishes
+JOB_DIR = os.getenv("JOB_DIR") or os.path.join(tempfile.gettempdir(), "ai-study-jobs")
+
+UNFINISHED = ("queued", "running")
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def _aware(moment: datetime) -> datetime:
+    # Mongo hands datetimes back naive (UTC)
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+def _claimable(now: datetime) -> dict:
+    """Jobs a worker may take: queued ones, and running ones whose owner stopped renewing."""
+    return {"$or": [
+        {"status": "queued"},
+        {"status": "running", "$or": [{"lease_until": {"$lt": now}}, {"lease_until": None}]},
+    ]}
+
+
+class JobManager:
+    """
+    handler(kind, cleanup=None) registers `async def run(job, progress) -> result`.
+    `progress(**counters)` records monotonic progress counters, e.g.
+    progress(pages_extracted=120, pages_total=300).
+    `cleanup(job)` runs once the job is finished for good (done or
+    failed), e.g. to delete its spooled upload; never before a retry.
+    """
+
+    def __init__(self, collection, workers: int = 2):
+        self.collection = collection
+        self.workers = workers
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.lease = JOB_LEASE_SECONDS
+        self._handlers = {}
+        self._cleanups = {}
+        self._queue = asyncio.Queue()
+        self._pending = set()  # ids queued here or waiting on a retry timer
+        self._tasks = []
+        self._sweeper = None
+        self._writes = set()   # pending progress writes (keep references)
+        self._timers = set()   # delayed re-queues of retried jobs
+
+        self.retry_delay = JOB_RETRY_DELAY
+        self.retry_max_delay = JOB_RETRY_MAX_DELAY
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.resumed = 0
+        self.retried = 0
+        self.lost_claims = 0   # another worker claimed the job first
+
+    def handler(self, kind: str, cleanup=None):
+        def register(fn):
+            self._handlers[kind] = fn
+            if cleanup is not None:
+                self._cleanups[kind] = cleanup
+            return fn
+        return register
+
+    # ------------------------------------------------------------
+    #  Lifecycle
+    # ------------------------------------------------------------
+    def _ensure_workers(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def start(self):
+        """Start the workers and pick up jobs left unfinished by a stopped or crashed process."""
+        if not os.getenv("JOB_DIR"):
+            print(f"⚠️ JOB_DIR is not set; queued uploads live in {JOB_DIR} and may not survive a restart")
+        self._ensure_workers()
+        resumed = await self._recover()
+        if resumed:
+            print(f"🔁 Resuming {resumed} background job(s)")
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep())
+
+    async def stop(self):
+        """Cancel the workers; running jobs go back to 'queued' and resume on next start."""
+        # Jobs waiting out a retry delay stay 'queued' and resume too
+        tasks = [*self._tasks, *self._timers] + ([self._sweeper] if self._sweeper else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        self._timers = set()
+        self._sweeper = None
+        self._pending.clear()
+        self._queue = asyncio.Queue()
+        if self._writes:
+            await asyncio.gather(*self._writes, return_exceptions=True)
+
+    async def _recover(self) -> int:
+        """Queue every claimable job not already queued here; returns how many."""
+        try:
+            cursor = self.collection.find(_claimable(_now()), {"_id": 1}).sort("created_at", 1)
+            unfinished = await cursor.to_list(None)
+        except Exception as e:
+            print(f"⚠️ Could not resume background jobs: {e}")
+            return 0
+        queued = 0
+        for job in unfinished:
+            if self._enqueue(job["_id"]):
+                queued += 1
+        self.resumed += queued
+        return queued
+
+    async def _sweep(self):
+        # Jobs whose owner crashed become claimable when their lease runs out
+        detach()
+        while True:
+            await asyncio.sleep(self.lease)
+            await self._recover()
+
+    # ------------------------------------------------------------
+    #  Submit / read
+    # ------------------------------------------------------------
+    async def submit(self, kind: str, params: dict, user_id: str = None) -> dict:
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job type: {kind}")
+        now = _now()
+        job = {
+            "_id": uuid.uuid4().hex,
+            "type": kind,
+            "status": "queued",
+            "user_id": user_id,
+            "params": params,
+            "progress": {},
+            "attempts": 0,
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        with stage("db"):
+            await self.collection.insert_one(job)
+        self.submitted += 1
+        self._ensure_workers()
+        self._enqueue(job["_id"])
+        return job
+
+    async def get(self, job_id: str):
+        return await self.collection.find_one({"_id": job_id})
+
+    # ------------------------------------------------------------
+    #  Workers
+    # ------------------------------------------------------------
+    def _enqueue(self, job_id) -> bool:
+        if job_id in self._pending:
+            return False
+        self._pending.add(job_id)
+        self._queue.put_nowait(job_id)
+        return True
+
+    async def _update(self, job_id, fields: dict, **ops):
+        fields["updated_at"] = _now()
+        await self.collection.update_one({"_id": job_id}, {"$set": fields, **ops})
+
+    async def _settle(self, job, fields: dict):
+        """Write the outcome of this worker's run; a no-op if another worker has taken the job over."""
+        fields["updated_at"] = _now()
+        await self.collection.update_one(
+            {"_id": job["_id"], "owner": self.owner, "attempts": job["attempts"]},
+            {"$set": fields},
+        )
+
+    async def _claim(self, job):
+        """Atomically mark the job running under this worker; None if someone else got it first."""
+        now = _now()
+        return await self.collection.find_one_and_update(
+            {"_id": job["_id"], "attempts": job["attempts"], **_claimable(now)},
+            {
+                "$set": {
+                    "status": "running",
+                    "owner": self.owner,
+                    "lease_until": now + timedelta(seconds=self.lease),
+                    "started_at": now,
+                    "updated_at": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _heartbeat(self, job):
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            await self.collection.update_one(
+                {"_id": job["_id"], "owner": self.owner, "status": "running"},
+                {"$set": {"lease_until": _now() + timedelta(seconds=self.lease)}},
+            )
+
+    def _cleanup(self, job):
+        cleanup = self._cleanups.get(job["type"])
+        if cleanup is None:
+            return
+        try:
+            cleanup(job)
+        except Exception as e:
+            print(f"⚠️ Job {job['_id']} cleanup failed: {e}")
+
+    def retryable(self, job, error) -> bool:
+        """True when `error` sends the job back to the queue instead of failing it."""
+        return isinstance(error, RETRYABLE) and job["attempts"] < JOB_MAX_ATTEMPTS
+
+    def _retry_delay(self, attempts: int, error) -> float:
+        delay = min(self.retry_delay * 2 ** (attempts - 1), self.retry_max_delay)
+        try:
+            retry_after = float(error.headers["Retry-After"])
+        except (AttributeError, KeyError, TypeError, ValueError):
+            retry_after = 0.0
+        return max(delay, retry_after)
+
+    def _requeue_later(self, job_id, delay: float):
+        async def requeue():
+            await asyncio.sleep(delay)
+            self._queue.put_nowait(job_id)
+
+        self._pending.add(job_id)
+        timer = asyncio.create_task(requeue())
+        self._timers.add(timer)
+        timer.add_done_callback(self._timers.discard)
+
+    def _progress(self, job):
+        def progress(**counters):
+            job["progress"].update(counters)
+            # $max keeps counters monotonic even if writes land out of order
+            write = asyncio.ensure_future(self._update(
+                job["_id"], {}, **{"$max": {f"progress.{k}": v for k, v in counters.items()}}
+            ))
+            self._writes.add(write)
+            write.add_done_callback(self._writes.discard)
+        return progress
+
+    async def _worker(self):
+        detach()
+        while True:
+            job_id = await self._queue.get()
+            self._pending.discard(job_id)
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Job worker error ({job_id}): {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id):
+        job = await self.get(job_id)
+        if not job or job["status"] not in UNFINISHED:
+            return
+        if job["status"] == "running" and job.get("lease_until") and _aware(job["lease_until"]) > _now():
+            # Another worker holds it
+            return
+
+        # Resumed after a restart while waiting out a retry delay
+        if job["status"] == "queued" and job.get("retry_at"):
+            wait = (_aware(job["retry_at"]) - _now()).total_seconds()
+            if wait > 0:
+                self._requeue_later(job_id, wait)
+                return
+
+        if job["attempts"] >= JOB_MAX_ATTEMPTS:
+            now = _now()
+            gave_up = await self.collection.find_one_and_update(
+                {"_id": job_id, "attempts": job["attempts"], **_claimable(now)},
+                {"$set": {"status": "failed", "error": "Job was interrupted too many times",
+                          "finished_at": now, "updated_at": now}},
+            )
+            if gave_up is not None:
+                self.failed += 1
+                self._cleanup(job)
+            return
+
+        claimed = await self._claim(job)
+        if claimed is None:
+            self.lost_claims += 1
+            return
+        job = claimed
+
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            result = await self._handlers[job["type"]](job, self._progress(job))
+        except asyncio.CancelledError:
+            # Shutdown: hand the job back so the next start (or another
+            # worker) resumes it without waiting for the lease to expire
+            with contextlib.suppress(Exception):
+                await self._settle(job, {"status": "queued", "lease_until": None})
+            raise
+        except Exception as e:
+            detail = getattr(e, "detail", None) or str(e)
+            if self.retryable(job, e):
+                self.retried += 1
+                delay = self._retry_delay(job["attempts"], e)
+                print(f"🔁 Job {job_id} retrying in {delay:.0f}s (attempt {job['attempts']}/{JOB_MAX_ATTEMPTS}): {detail}")
+                await self._settle(job, {
+                    "status": "queued",
+                    "error": detail,
+                    "lease_until": None,
+                    "retry_at": _now() + timedelta(seconds=delay),
+                })
+                self._requeue_later(job_id, delay)
+                return
+
+            self.failed += 1
+            print(f"❌ Job {job_id} failed: {detail}")
+            await self._settle(job, {"status": "failed", "error": detail, "finished_at": _now()})
+            self._cleanup(job)
+            return
+        finally:
+            heartbeat.cancel()
+
+        self.completed += 1
+        await self._settle(job, {"status": "done", "result": result, "error": None, "finished_at": _now()})
+        self._cleanup(job)
+
+    def stats(self):
+        return {
+            "workers": len(self._tasks),
+            "queued": self._queue.qsize(),
+            "waiting_retry": len(self._timers),
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "resumed": self.resumed,
+            "retried": self.retried,
+            "lost_claims": self.lost_claims,
+        }
+
+
+def public_job(job: dict) -> dict:
+    """Job record as returned to clients (no internal params)."""
+    return {
+        "job_id": job["_id"],
+        "type": job["type"],
+        "status": job["status"],
+        "progress": job.get("progress", {}),
+        "result": job.get("result"),
+        "error": job.get("error"),
+        "retry_at": job.get("retry_at"),
+        "created_at": job.get("created_at"),
+        "updated_at": job.get("updated_at"),
+    }
+
+
+job_manager = JobManager(jobs_collection, workers=JOB_WORKERS)
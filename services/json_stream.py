@@ -0,0 +1,346 @@
+# ================================================================
+#  INCREMENTAL JSON EXTRACTOR
+#  One balanced-bracket scanner for every place we read JSON out of
+#  model output (force_json, the MCQ route, streaming routes).
+#
+#  - feed(piece) consumes output as it streams and reports each
+#    section as soon as it is complete:
+#      root array  [ a, b ]        -> ([0], a), ([1], b)
+#      root object {"k": v}        -> (["k"], v)
+#      root object {"k": [x, y]}   -> (["k", 0], x), (["k", 1], y)
+#  - finish() returns the root value; a truncated root (model hit its
+#    token limit) is repaired by trimming the unfinished member and
+#    closing the open brackets. A repair that leaves nothing useful
+#    (an empty root, e.g. a stray "[" in prose) is dropped and the
+#    scan restarts after that opener.
+#  - A trivial root (empty, or an array of scalars such as the "[1]"
+#    in "as noted in [1]") does not end the search: it is only
+#    returned when no better root follows.
+#  - extract_json(text) is the one-shot entry point. An opener whose
+#    text stops being JSON before the end of the output (prose) is
+#    skipped at C speed. A truncated root is first closed by counting
+#    brackets with str/regex calls (cut at the last comma); the Python
+#    bracket-by-bracket scan is only the fallback when that does not
+#    parse.
+#
+#  The scanner only visits structural characters ({}[]",) and jumps
+#  over string bodies with a regex, so Python-level work is a small
+#  fraction of the text length. Braces inside strings never count.
+# ================================================================
+
+import json
+import re
+
+from services.metrics import json_repairs
+
+STRUCTURAL_RE = re.compile(r'[{}\[\]",]')
+OPENER_RE = {None: re.compile(r"[{\[]"), "{": re.compile(r"\{"), "[": re.compile(r"\[")}
+STRING_END_RE = re.compile(r'(?:[^"\\]|\\.)*"', re.DOTALL)
+STRING_BODY_RE = re.compile(r'(?:[^"\\]|\\.)*', re.DOTALL)
+NON_BRACKET_RE = re.compile(r"[^{}\[\]]+")
+CLOSERS = {"{": "}", "[": "]"}
+
+# json.loads calls one repair may spend before giving up on a root
+MAX_REPAIR_ATTEMPTS = 3
+
+_decoder = json.JSONDecoder()
+
+# Frame layout (lists are cheaper than objects on this hot path)
+KIND, MEMBER_START, INDEX, KEY_SPAN, STREAMED = range(5)
+
+
+class JSONExtractor:
+    """
+    expect: "{" or "[" to only accept a root of that kind, None for either.
+    sections: report sections from feed(); one-shot extraction turns this
+        off and lets the C decoder try each root candidate first.
+    A root that closes but does not parse (e.g. "{braces}" in prose) is
+    skipped and scanning continues after it; a trivial root is kept as
+    the fallback answer.
+    """
+
+    def __init__(self, expect: str = None, sections: bool = True):
+        self.buffer = ""
+        self.value = None
+        self._fallback = None      # first trivial root, used if nothing better follows
+        self._expect = expect
+        self._sections = sections
+        self._pos = 0
+        self._root = None          # index of the root opener, None until found
+        self._done = False
+        self._in_string = False
+        self._string_start = None
+        self._stack = []
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    # ------------------------------------------------------------
+    #  Incremental scanning
+    # ------------------------------------------------------------
+    def feed(self, piece: str):
+        """Add text; return a list of (path, value) sections completed by it."""
+        self.buffer += piece
+        events = []
+        buf = self.buffer
+        i = self._pos
+
+        while not self._done:
+            if self._in_string:
+                m = STRING_END_RE.match(buf, i)
+                if m is None:
+                    # String still open: resume after the last complete escape
+                    i = STRING_BODY_RE.match(buf, i).end()
+                    break
+                i = m.end()
+                self._in_string = False
+                self._capture_key(i - 1)
+                continue
+
+            if self._root is None:
+                m = OPENER_RE[self._expect].search(buf, i)
+                if m is None:
+                    i = len(buf)
+                    break
+                i = m.start()
+                if not self._sections:
+                    try:
+                        value, end = _decoder.raw_decode(buf, i)
+                    except ValueError as e:
+                        if not _truncated(buf, e):
+                            # Not JSON from here on (prose like "[1 for details")
+                            i += 1
+                            continue
+                        value = _close_truncated(buf, i, e)
+                        if value is not None:
+                            json_repairs.inc("repaired")
+                            self.value = value
+                            self._done = True
+                            break
+                        # truncated somewhere odd: scan it bracket by bracket
+                    else:
+                        if not _trivial(value):
+                            self.value = value
+                            self._done = True
+                            break
+                        self._keep_fallback(value)
+                        i = end
+                        continue
+                self._root = i
+                self._stack.append([buf[i], i + 1, 0, None, False])
+                i += 1
+                continue
+
+            m = STRUCTURAL_RE.search(buf, i)
+            if m is None:
+                i = len(buf)
+                break
+            i = m.start()
+            ch = buf[i]
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch == "{" or ch == "[":
+                self._stack.append([ch, i + 1, 0, None, False])
+            elif ch == ",":
+                self._close_member(i, events)
+            else:
+                self._close_member(i, events)
+                self._stack.pop()
+                if not self._stack:
+                    self._close_root(i)
+            i += 1
+
+        self._pos = i
+        return events
+
+    def finish(self):
+        """Return the parsed root value (repairing a truncated one), or None."""
+        while self.value is None and self._root is not None and self._stack:
+            self.value = self._repair()
+            if self.value is None:
+                # Nothing useful behind this opener: look for a root after it
+                self._pos = self._root + 1
+                self._root = None
+                self._stack = []
+                self._in_string = False
+                self.feed("")
+        return self.value if self.value is not None else self._fallback
+
+    # ------------------------------------------------------------
+    def _capture_key(self, end):
+        """The first string of an object member is its key."""
+        frame = self._stack[-1]
+        if frame[KIND] == "{" and frame[KEY_SPAN] is None:
+            frame[KEY_SPAN] = (self._string_start, end)
+
+    def _keep_fallback(self, value):
+        if self._fallback is None:
+            self._fallback = value
+
+    def _close_root(self, end):
+        try:
+            # One-shot mode already knows raw_decode failed on this root
+            if self._sections:
+                value = json.loads(self.buffer[self._root:end + 1])
+                if not _trivial(value):
+                    self.value = value
+                    self._done = True
+                    return
+                self._keep_fallback(value)
+        except ValueError:
+            pass
+        # Balanced but not JSON (prose in braces) or trivial: keep looking after it
+        self._root = None
+
+    def _close_member(self, end, events):
+        frame = self._stack[-1]
+        kind, member_start, index, key_span, _ = frame
+        depth = len(self._stack)
+
+        frame[MEMBER_START] = end + 1
+        frame[INDEX] = index + 1
+        frame[KEY_SPAN] = None
+
+        if depth > 2 or not self._sections:
+            return
+        text = self.buffer[member_start:end].strip()
+        if not text:
+            return
+
+        try:
+            if kind == "[":
+                value = json.loads(text)
+                if depth == 1:
+                    events.append(([index], value))
+                else:
+                    # Array directly under a root object key
+                    parent = self._stack[-2]
+                    if parent[KIND] == "{" and parent[KEY_SPAN] is not None:
+                        start, stop = parent[KEY_SPAN]
+                        events.append(([json.loads(self.buffer[start:stop + 1]), index], value))
+                        parent[STREAMED] = True
+            elif depth == 1:
+                member = json.loads("{" + text + "}")
+                for key, value in member.items():
+                    # Arrays were already streamed element by element
+                    if not (isinstance(value, list) and frame[STREAMED]):
+                        events.append(([key], value))
+                frame[STREAMED] = False
+        except ValueError:
+            # Malformed section: finish() / the final parse will deal with it
+            pass
+
+    def _repair(self):
+        """
+        Close a truncated root. Tries, cheapest guess first and at most
+        MAX_REPAIR_ATTEMPTS times:
+        1. dropping the unfinished member of the innermost container;
+        2. the text as-is with the open string and brackets closed;
+        3. dropping the unfinished member of each outer container.
+        """
+        body = self.buffer[self._root:]
+        stack = self._stack
+
+        def trimmed(depth):
+            head = body[:stack[depth][MEMBER_START] - self._root].rstrip().rstrip(",")
+            return head + "".join(CLOSERS[f[KIND]] for f in reversed(stack[:depth + 1]))
+
+        def candidates():
+            yield trimmed(len(stack) - 1)
+            yield body + ('"' if self._in_string else "") + "".join(CLOSERS[f[KIND]] for f in reversed(stack))
+            for depth in range(len(stack) - 2, -1, -1):
+                yield trimmed(depth)
+
+        for attempt, candidate in enumerate(candidates()):
+            if attempt >= MAX_REPAIR_ATTEMPTS:
+                break
+            try:
+                value = json.loads(candidate)
+            except ValueError:
+                continue
+            if _useful(value):
+                json_repairs.inc("repaired")
+                return value
+        json_repairs.inc("failed")
+        return None
+
+
+def _useful(value) -> bool:
+    # "[]" from a stray "[1 for details" in prose is not an answer
+    return isinstance(value, (dict, list)) and len(value) > 0
+
+
+def _trivial(value) -> bool:
+    # "[1]" / "[]" / "{}" from prose: a real answer has members, and an
+    # array answer holds objects or arrays
+    if not _useful(value):
+        return True
+    return isinstance(value, list) and not any(isinstance(v, (dict, list)) for v in value)
+
+
+def _truncated(buf: str, error: ValueError) -> bool:
+    """raw_decode failed because the text ran out, not because it stopped being JSON."""
+    pos = getattr(error, "pos", None)
+    if pos is None:
+        return False
+    return str(error).startswith("Unterminated string") or pos >= len(buf.rstrip())
+
+
+def _closers(head: str):
+    """Closing brackets for `head`, counted with str/regex calls only; None if it is not a clean prefix."""
+    # Without escapes, quotes in a JSON prefix alternate open/close:
+    # every other piece of a split on '"' is outside the strings
+    if "\\" in head:
+        head = head.replace("\\\\", "").replace('\\"', "")
+    pieces = head.split('"')
+    if len(pieces) % 2 == 0:
+        return None
+    skeleton = NON_BRACKET_RE.sub("", "".join(pieces[::2]))
+    while True:
+        reduced = skeleton.replace("[]", "").replace("{}", "")
+        if reduced == skeleton:
+            break
+        skeleton = reduced
+    if "]" in skeleton or "}" in skeleton:
+        return None
+    return "".join(CLOSERS[c] for c in reversed(skeleton))
+
+
+def _close_truncated(buf: str, start: int, error: ValueError):
+    """
+    Fast path for a root that raw_decode rejected because the text ran
+    out: cut back to the last comma before the break and close the
+    brackets. None when the error is not at the end (prose) or the cut
+    does not parse.
+    """
+    if not _truncated(buf, error):
+        return None
+
+    comma = buf.rfind(",", start, error.pos)
+    if comma < 0:
+        return None
+    head = buf[start:comma].rstrip()
+    closers = _closers(head)
+    if closers is None:
+        return None
+    try:
+        value = json.loads(head + closers)
+    except ValueError:
+        return None
+    return value if _useful(value) else None
+
+
+# ================================================================
+#  ONE-SHOT EXTRACTION
+# ================================================================
+def extract_json(text: str, expect: str = None):
+    """
+    Return the first JSON value (object or array, or only `expect`)
+    embedded in `text`, repairing it if truncated; None if there is none.
+    """
+    extractor = JSONExtractor(expect, sections=False)
+    extractor.feed(text)
+    return extractor.finish()
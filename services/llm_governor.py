@@ -0,0 +1,194 @@
+# ================================================================
+#  LLM ADMISSION CONTROLLER
+#  Caps concurrent provider calls, queues the overflow (FIFO, with a
+#  deadline), budgets tokens-per-minute and sheds load with a fast
+#  429 + Retry-After instead of letting every request hit the
+#  provider's rate limit at once.
+# ================================================================
+
+import asyncio
+import contextlib
+import math
+import os
+import time
+from collections import deque
+
+from fastapi import HTTPException
+
+TPM_WINDOW = 60.0
+
+
+class LLMOverloaded(HTTPException):
+    """Raised when a request cannot be admitted in time. Maps to HTTP 429."""
+
+    def __init__(self, retry_after: float, reason: str):
+        retry_after = max(1, math.ceil(retry_after))
+        super().__init__(
+            status_code=429,
+            detail=f"AI service is busy ({reason}). Please retry in {retry_after}s.",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+class LLMGovernor:
+    """
+    max_in_flight: concurrent provider calls.
+    max_queue: requests allowed to wait for a slot; beyond that, shed at once.
+    queue_timeout: longest a request may wait before it is shed.
+    tokens_per_minute: rolling 60 s token budget (0 = unlimited).
+    """
+
+    def __init__(self, max_in_flight: int = 8, max_queue: int = 64,
+                 queue_timeout: float = 30.0, tokens_per_minute: int = 0):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.tokens_per_minute = tokens_per_minute
+
+        self._in_flight = 0
+        self._queue = deque()          # FIFO of waiting tickets
+        self._window = deque()         # (admitted_at, tokens) inside the TPM window
+        self._window_tokens = 0
+        self._cond = asyncio.Condition()
+
+        self.admitted = 0
+        self.completed = 0
+        self.shed = 0
+        self.timed_out = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.service_total = 0.0
+
+    # ------------------------------------------------------------
+    #  Budget helpers
+    # ------------------------------------------------------------
+    def _trim_window(self, now):
+        while self._window and now - self._window[0][0] >= TPM_WINDOW:
+            self._window_tokens -= self._window.popleft()[1]
+
+    def _tokens_fit(self, tokens, now) -> bool:
+        if not self.tokens_per_minute:
+            return True
+        self._trim_window(now)
+        # A single oversized request may still run on an empty window
+        return not self._window or self._window_tokens + tokens <= self.tokens_per_minute
+
+    def _token_wait(self, tokens, now) -> float:
+        """Seconds until enough of the window expires for `tokens` to fit."""
+        if self._tokens_fit(tokens, now):
+            return 0.0
+        freed = 0
+        for admitted_at, used in self._window:
+            freed += used
+            if self._window_tokens - freed + tokens <= self.tokens_per_minute:
+                return admitted_at + TPM_WINDOW - now
+        return TPM_WINDOW
+
+    def _can_start(self, tokens, now) -> bool:
+        return self._in_flight < self.max_in_flight and self._tokens_fit(tokens, now)
+
+    def _retry_after(self, tokens, now) -> float:
+        avg_service = self.service_total / self.completed if self.completed else 5.0
+        queue_drain = avg_service * (len(self._queue) + 1) / self.max_in_flight
+        return max(queue_drain, self._token_wait(tokens, now))
+
+    def _start(self, tokens, now, waited):
+        self._in_flight += 1
+        self.admitted += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+        if self.tokens_per_minute:
+            self._window.append((now, tokens))
+            self._window_tokens += tokens
+
+    # ------------------------------------------------------------
+    #  Admission
+    # ------------------------------------------------------------
+    async def _acquire(self, tokens):
+        now = time.monotonic()
+        if not self._queue and self._can_start(tokens, now):
+            self._start(tokens, now, 0.0)
+            return
+
+        if len(self._queue) >= self.max_queue:
+            self.shed += 1
+            raise LLMOverloaded(self._retry_after(tokens, now), "queue full")
+
+        # No point queueing if the token budget cannot free up before the deadline
+        token_wait = self._token_wait(tokens, now)
+        if token_wait > self.queue_timeout:
+            self.shed += 1
+            raise LLMOverloaded(token_wait, "token budget")
+
+        ticket = object()
+        self._queue.append(ticket)
+        enqueued = now
+        deadline = enqueued + self.queue_timeout
+
+        try:
+            async with self._cond:
+                while True:
+                    now = time.monotonic()
+                    if self._queue[0] is ticket and self._can_start(tokens, now):
+                        self._start(tokens, now, now - enqueued)
+                        return
+
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self.timed_out += 1
+                        raise LLMOverloaded(self._retry_after(tokens, now), "queue timeout")
+
+                    # Wake on release, or when the token window frees up
+                    wake = remaining
+                    if self._queue[0] is ticket and self._in_flight < self.max_in_flight:
+                        wake = min(remaining, max(self._token_wait(tokens, now), 0.01))
+                    try:
+                        await asyncio.wait_for(self._cond.wait(), wake)
+                    except asyncio.TimeoutError:
+                        pass
+        finally:
+            self._queue.remove(ticket)
+            # The next ticket may now be at the head
+            async with self._cond:
+                self._cond.notify_all()
+
+    async def _release(self, started):
+        self._in_flight -= 1
+        self.completed += 1
+        self.service_total += time.monotonic() - started
+        async with self._cond:
+            self._cond.notify_all()
+
+    @contextlib.asynccontextmanager
+    async def admit(self, tokens: int = 0):
+        """`async with governor.admit(tokens):` around one provider call."""
+        await self._acquire(tokens)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            await self._release(started)
+
+    def stats(self):
+        self._trim_window(time.monotonic())
+        return {
+            "in_flight": self._in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queue_depth": len(self._queue),
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "timed_out": self.timed_out,
+            "avg_wait_ms": round(1000 * self.wait_total / self.admitted, 1) if self.admitted else 0.0,
+            "max_wait_ms": round(1000 * self.wait_max, 1),
+            "tokens_last_minute": self._window_tokens,
+            "tokens_per_minute": self.tokens_per_minute,
+        }
+
+
+llm_governor = LLMGovernor(
+    max_in_flight=int(os.getenv("LLM_MAX_IN_FLIGHT", "8")),
+    max_queue=int(os.getenv("LLM_MAX_QUEUE", "64")),
+    queue_timeout=float(os.getenv("LLM_QUEUE_TIMEOUT", "30")),
+    tokens_per_minute=int(os.getenv("LLM_TOKENS_PER_MINUTE", "0")),
+)
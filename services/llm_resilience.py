@@ -0,0 +1,265 @@
+# ================================================================
+#  RESILIENT LLM CALLS
+#  Per-call timeouts, classified retries with jittered exponential
+#  backoff, a circuit breaker that fails fast while the provider is
+#  down, and optional hedged requests to cut the latency tail.
+# ================================================================
+
+import asyncio
+import math
+import os
+import random
+import time
+from collections import deque
+
+import groq
+from fastapi import HTTPException
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class LLMUnavailable(HTTPException):
+    """The provider failed after retries, or the circuit is open. Maps to HTTP 503."""
+
+    def __init__(self, retry_after: float, reason: str):
+        retry_after = max(1, math.ceil(retry_after))
+        super().__init__(
+            status_code=503,
+            detail=f"AI service is temporarily unavailable ({reason}). Please retry in {retry_after}s.",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+def is_retryable(exc: Exception) -> bool:
+    """Timeouts, connection drops, 429 and 5xx are transient; other errors are not."""
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError, ConnectionError, groq.APIConnectionError)):
+        return True
+    status = getattr(exc, "status_code", None)
+    return status in RETRYABLE_STATUS
+
+
+def retry_after_hint(exc: Exception) -> float:
+    """Seconds the provider asked us to wait (Retry-After header), else 0."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after", 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class CircuitBreaker:
+    """
+    closed    -> calls flow; `failure_threshold` consecutive transient
+                 failures open the circuit.
+    open      -> calls fail fast until `reset_timeout` has passed.
+    half_open -> one probe call is let through; success closes the
+                 circuit, failure re-opens it. A cancelled probe, or
+                 one rejected for our own fault (4xx), frees the slot
+                 for the next call, and a probe older than
+                 `reset_timeout` is treated as lost.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._probe_in_flight = False
+        self._probe_started = 0.0
+
+    def retry_after(self) -> float:
+        return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def before_call(self) -> bool:
+        """Raises while the circuit is open; True when this call is the half-open probe."""
+        if self.state == "open":
+            if self.retry_after() > 0:
+                raise LLMUnavailable(self.retry_after(), "circuit open")
+            self.state = "half_open"
+
+        if self.state == "half_open":
+            now = time.monotonic()
+            if self._probe_in_flight and now - self._probe_started < self.reset_timeout:
+                raise LLMUnavailable(1, "circuit half-open")
+            self._probe_in_flight = True
+            self._probe_started = now
+            return True
+        return False
+
+    def release_probe(self):
+        """The call ended without a verdict on the provider (cancelled, 4xx): let another call probe."""
+        self._probe_in_flight = False
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self._probe_in_flight = False
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.times_opened += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "times_opened": self.times_opened,
+            "retry_after_s": round(self.retry_after(), 1) if self.state == "open" else 0,
+        }
+
+
+class ResilientCaller:
+    """
+    call(factory) runs `await factory()` (one provider request) with:
+    - timeout: seconds per attempt;
+    - max_retries: extra attempts for transient errors, sleeping a
+      full-jitter backoff uniform(0, min(backoff_max, backoff_base * 2**n))
+      or the provider's Retry-After, whichever is longer;
+    - hedge: if an attempt is still running after the observed p95
+      latency, start a duplicate and keep whichever finishes first.
+    """
+
+    def __init__(self, timeout: float = 60.0, max_retries: int = 3,
+                 backoff_base: float = 0.5, backoff_max: float = 8.0,
+                 hedge: bool = False, hedge_min_delay: float = 1.0,
+                 breaker: CircuitBreaker = None):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.breaker = breaker or CircuitBreaker()
+        self._latencies = deque(maxlen=200)
+
+        self.attempts = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.failures = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    # ------------------------------------------------------------
+    def hedge_delay(self) -> float:
+        """p95 of recent successful latencies (never below hedge_min_delay)."""
+        if len(self._latencies) < 20:
+            return max(self.hedge_min_delay, self.timeout / 2)
+        ordered = sorted(self._latencies)
+        p95 = ordered[int(0.95 * (len(ordered) - 1))]
+        return max(self.hedge_min_delay, p95)
+
+    def backoff(self, attempt: int, exc: Exception) -> float:
+        ceiling = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return max(random.uniform(0, ceiling), retry_after_hint(exc))
+
+    async def _attempt(self, factory):
+        self.attempts += 1
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(factory(), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        self._latencies.append(time.monotonic() - started)
+        return result
+
+    async def _hedged_attempt(self, factory):
+        primary = asyncio.ensure_future(self._attempt(factory))
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=self.hedge_delay())
+            if done:
+                return primary.result()
+
+            self.hedges += 1
+            backup = asyncio.ensure_future(self._attempt(factory))
+            tasks.append(backup)
+            pending = {primary, backup}
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # Also runs when the caller is cancelled: stop paying for
+            # completions nobody will read
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def call(self, factory, hedge: bool = None):
+        hedge = self.hedge if hedge is None else hedge
+        attempt = 0
+
+        while True:
+            probe = self.breaker.before_call()
+            try:
+                result = await (self._hedged_attempt(factory) if hedge else self._attempt(factory))
+            except Exception as e:
+                if not is_retryable(e):
+                    # Our fault (bad request, auth): says nothing about the
+                    # provider, so neither a success nor a failure
+                    if probe:
+                        self.breaker.release_probe()
+                    self.failures += 1
+                    raise
+                self.breaker.record_failure()
+
+                if attempt >= self.max_retries or self.breaker.state == "open":
+                    self.failures += 1
+                    print(f"Groq API Error (giving up after {attempt + 1} attempts): {e!r}")
+                    raise LLMUnavailable(self.breaker.retry_after() or self.backoff_max, "provider error") from e
+
+                delay = self.backoff(attempt, e)
+                print(f"Groq API Error (attempt {attempt + 1}, retrying in {delay:.2f}s): {e!r}")
+                self.retries += 1
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                # Cancelled (e.g. the client left a /stream route): no verdict
+                if probe:
+                    self.breaker.release_probe()
+                raise
+
+            self.breaker.record_success()
+            return result
+
+    def stats(self):
+        return {
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "failures": self.failures,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "hedge_delay_s": round(self.hedge_delay(), 2),
+            "breaker": self.breaker.stats(),
+        }
+
+
+llm_caller = ResilientCaller(
+    timeout=float(os.getenv("LLM_TIMEOUT", "60")),
+    max_retries=int(os.getenv("LLM_MAX_RETRIES", "3")),
+    backoff_base=float(os.getenv("LLM_BACKOFF_BASE", "0.5")),
+    backoff_max=float(os.getenv("LLM_BACKOFF_MAX", "8")),
+    hedge=os.getenv("LLM_HEDGE", "").lower() in ("1", "true", "yes"),
+    hedge_min_delay=float(os.getenv("LLM_HEDGE_MIN_DELAY", "1.0")),
+    breaker=CircuitBreaker(
+        failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+        reset_timeout=float(os.getenv("LLM_BREAKER_RESET", "30")),
+    ),
+)
@@ -0,0 +1,296 @@
+# ================================================================
+#  METRICS (Prometheus text format, no client library)
+#  - Counters and fixed-bucket histograms kept in plain dicts keyed
+#    by label values; observe() is a bisect and two additions.
+#  - Gauges are callbacks read only when /metrics is scraped, so
+#    cache/queue sizes cost nothing on the request path.
+#  - stage("llm") times one step of the current request. Stages are
+#    summed per request, exported as `stage_seconds{route, stage}`
+#    and sent back in a `Server-Timing` header; work outside a
+#    request (background jobs) is recorded under route="background".
+#  Set METRICS_ENABLED=0 to turn the middleware and stages off.
+# ================================================================
+
+import bisect
+import contextvars
+import functools
+import inspect
+import os
+import re
+import time
+from contextlib import contextmanager
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1").lower() not in ("0", "false", "no")
+
+# Seconds; LLM calls routinely take several seconds, parsing a few µs
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+
+    def inc(self, *labels, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in self.values.items():
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.series = {}  # labels -> [count per bucket..., +Inf count, sum, count]
+
+    def observe(self, value: float, *labels):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 3)
+        # Non-cumulative here; render() accumulates
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        n = len(self.buckets)
+        for labels, series in self.series.items():
+            running = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:n + 1]):
+                running += count
+                le = 'le="' + _number(bound) + '"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {running}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(series[-2])}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {series[-1]}"
+
+
+class Callback:
+    """Gauge (or counter) read from `fn()` at scrape time: a number or {label values: number}."""
+
+    def __init__(self, name: str, help: str, fn, labelnames=(), kind: str = "gauge"):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.labelnames = tuple(labelnames)
+        self.kind = kind
+
+    def render(self):
+        try:
+            value = self.fn()
+        except Exception as e:
+            print(f"⚠️ Metric {self.name} failed: {e}")
+            return
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        items = value.items() if isinstance(value, dict) else [((), value)]
+        for labels, v in items:
+            labels = labels if isinstance(labels, tuple) else (labels,)
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(v or 0)}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def _add(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"metric already registered: {metric.name}")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._add(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def callback(self, name, help, fn, labelnames=(), kind="gauge"):
+        return self._add(Callback(name, help, fn, labelnames, kind))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.counter(
+    "http_requests_total", "HTTP requests by route, method and status.", ("route", "method", "status"))
+http_duration = registry.histogram(
+    "http_request_duration_seconds", "Time to the end of the response body.", ("route", "method"))
+stage_seconds = registry.histogram(
+    "stage_seconds", "Time spent per request stage (summed within a request).", ("route", "stage"))
+llm_tokens = registry.counter(
+    "llm_tokens_total", "LLM tokens by task, model and kind (prompt/completion).", ("task", "model", "kind"))
+llm_seconds = registry.histogram(
+    "llm_request_seconds", "Provider time per completion (to the last token for streams).", ("task", "model"))
+llm_cache_lookups = registry.counter(
+    "llm_cache_lookups_total", "LLM result cache lookups by task and result (hit/miss/bypass).", ("task", "result"))
+json_repairs = registry.counter(
+    "llm_json_repairs_total", "Truncated JSON roots closed by the extractor, by result (repaired/failed).", ("result",))
+
+
+# ================================================================
+#  STAGES
+# ================================================================
+_timings = contextvars.ContextVar("request_timings", default=None)
+
+_TOKEN_RE = re.compile(r"[^A-Za-z0-9_-]")
+_PARAM_RE = re.compile(r"{(\w+)(?::\w+)?}")
+
+
+class RequestTimings:
+    __slots__ = ("stages",)
+
+    def __init__(self):
+        self.stages = {}  # name -> [seconds, calls]
+
+    def add(self, name: str, seconds: float):
+        entry = self.stages.get(name)
+        if entry is None:
+            self.stages[name] = [seconds, 1]
+        else:
+            entry[0] += seconds
+            entry[1] += 1
+
+    def server_timing(self, total: float) -> str:
+        parts = []
+        for name, (seconds, calls) in self.stages.items():
+            desc = f';desc="x{calls}"' if calls > 1 else ""
+            parts.append(f"{_TOKEN_RE.sub('_', name)};dur={seconds * 1000:.1f}{desc}")
+        parts.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(parts)
+
+
+def record(name: str, seconds: float):
+    """Add `seconds` to stage `name` of the current request."""
+    timings = _timings.get()
+    if timings is None:
+        stage_seconds.observe(seconds, "background", name)
+    else:
+        timings.add(name, seconds)
+
+
+@contextmanager
+def stage(name: str):
+    if not METRICS_ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def detach():
+    """Stop attributing stages to the request that spawned this task (long-lived workers)."""
+    _timings.set(None)
+
+
+def timed(name: str):
+    """Decorator form of stage() for sync and async functions."""
+    def wrap(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def run_async(*args, **kwargs):
+                with stage(name):
+                    return await fn(*args, **kwargs)
+            return run_async
+
+        @functools.wraps(fn)
+        def run(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return run
+    return wrap
+
+
+def count_tokens(task: str, model: str, prompt_tokens: int, completion_tokens: int):
+    llm_tokens.inc(task, model, "prompt", amount=prompt_tokens)
+    llm_tokens.inc(task, model, "completion", amount=completion_tokens)
+
+
+# ================================================================
+#  MIDDLEWARE (plain ASGI, so streaming bodies pass straight through)
+#  Server-Timing carries the stages finished before the response
+#  headers; for /stream routes the LLM stage runs while the body is
+#  sent, so it only shows up in the histograms.
+# ================================================================
+def route_label(scope) -> str:
+    """'/api/history/{history_id}' for '/api/history/65f...': templates keep label cardinality bounded."""
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None:
+        return "unmatched"
+    # Routes of included routers only know their own path; recover the prefix
+    params = scope.get("path_params", {})
+    concrete = _PARAM_RE.sub(lambda m: str(params.get(m.group(1), m.group(0))), template)
+    path = scope["path"]
+    prefix = path[:-len(concrete)] if path.endswith(concrete) else ""
+    return prefix + template
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            return await self.app(scope, receive, send)
+
+        timings = RequestTimings()
+        token = _timings.set(timings)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                header = timings.server_timing(time.perf_counter() - start)
+                message = {**message, "headers": [*message.get("headers", ()), (b"server-timing", header.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _timings.reset(token)
+            elapsed = time.perf_counter() - start
+            route = route_label(scope)
+            method = scope["method"]
+            http_requests.inc(route, method, str(status))
+            http_duration.observe(elapsed, route, method)
+            for name, (seconds, _) in timings.stages.items():
+                stage_seconds.observe(seconds, route, name)
@@ -0,0 +1,92 @@
+# ================================================================
+#  MODEL ROUTER
+#  Picks the model per call from the task and the prompt size:
+#  - Light tasks (flashcards, mind maps, QnA by default) go to the
+#    small fast model while the prompt stays under a token limit.
+#  - Everything else, and light tasks on long documents, go to the
+#    large model.
+#  - A small-model answer that cannot be parsed is retried once on
+#    the large model (see ai_parsed in services/ai_service).
+#  Policy comes from the environment:
+#    LLM_SMALL_MODEL / LLM_LARGE_MODEL   model names
+#    LLM_SMALL_TASKS                     comma list of tasks for the small model
+#    LLM_SMALL_MAX_TOKENS                longest prompt the small model gets
+#    LLM_ROUTING=0                       always use the large model
+#    LLM_ESCALATE=0                      never retry a failed parse
+# ================================================================
+
+import os
+
+from services.chunking import estimate_tokens
+
+SMALL_MODEL = os.getenv("LLM_SMALL_MODEL", "llama-3.1-8b-instant")
+LARGE_MODEL = os.getenv("LLM_LARGE_MODEL", "llama-3.3-70b-versatile")
+
+
+def _flag(name: str, default: str = "1") -> bool:
+    return os.getenv(name, default).lower() not in ("0", "false", "no")
+
+
+class ModelRouter:
+    """
+    small_tasks: tasks the small model may take.
+    small_max_tokens: prompts estimated above this go to the large model.
+    enabled: False sends every call to the large model.
+    escalate: retry unparseable small-model output on the large model.
+    """
+
+    def __init__(self, small_model: str, large_model: str, small_tasks=(),
+                 small_max_tokens: int = 2500, enabled: bool = True, escalate: bool = True):
+        self.small_model = small_model
+        self.large_model = large_model
+        self.small_tasks = set(small_tasks)
+        self.small_max_tokens = small_max_tokens
+        self.enabled = enabled
+        self.escalate = escalate
+
+        self.routes = {}       # (task, model, reason) -> calls
+        self.escalations = {}  # task -> retries on the large model
+
+    def choose(self, task: str, prompt: str) -> str:
+        if not self.enabled:
+            model, reason = self.large_model, "disabled"
+        elif task not in self.small_tasks:
+            model, reason = self.large_model, "task"
+        elif estimate_tokens(prompt) > self.small_max_tokens:
+            model, reason = self.large_model, "long_input"
+        else:
+            model, reason = self.small_model, "task"
+        key = (task, model, reason)
+        self.routes[key] = self.routes.get(key, 0) + 1
+        return model
+
+    def escalation(self, task: str, model: str):
+        """Model to retry on after `model` gave unusable output, or None."""
+        if not self.escalate or model == self.large_model:
+            return None
+        self.escalations[task] = self.escalations.get(task, 0) + 1
+        return self.large_model
+
+    def stats(self):
+        by_model = {}
+        for (_, model, _), calls in self.routes.items():
+            by_model[model] = by_model.get(model, 0) + calls
+        return {
+            "enabled": self.enabled,
+            "small_model": self.small_model,
+            "large_model": self.large_model,
+            "small_tasks": sorted(self.small_tasks),
+            "small_max_tokens": self.small_max_tokens,
+            "calls_by_model": by_model,
+            "escalations": dict(self.escalations),
+        }
+
+
+model_router = ModelRouter(
+    small_model=SMALL_MODEL,
+    large_model=LARGE_MODEL,
+    small_tasks=[t.strip() for t in os.getenv("LLM_SMALL_TASKS", "flashcards,mindmap,qna").split(",") if t.strip()],
+    small_max_tokens=int(os.getenv("LLM_SMALL_MAX_TOKENS", "2500")),
+    enabled=_flag("LLM_ROUTING"),
+    escalate=_flag("LLM_ESCALATE"),
+)
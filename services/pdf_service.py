@@ -1,43 +1,250 @@
+import asyncio
+import contextlib
+import hashlib
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
 import fitz  # PyMuPDF
 from fastapi import HTTPException
 
-def extract_text_from_pdf(file_obj):
+from services.extraction_cache import extraction_cache, page_key
+from services.metrics import stage
+from services.text_cleanup import clean_pages
+
+# ------------------------------------------------------------
+# Upload spooling
+# Uploads are copied to a temp file in fixed-size chunks and PyMuPDF
+# opens them by path, so no request ever holds the whole PDF as bytes.
+# ------------------------------------------------------------
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Also the request-size limit in main.py, so both reject at the same size
+MAX_UPLOAD_MB = int(os.getenv("MAX_UPLOAD_MB", "20"))
+SPOOL_DIR = os.getenv("PDF_SPOOL_DIR") or None  # None = system temp dir
+
+# ------------------------------------------------------------
+# Process pool for page-parallel extraction
+# PyMuPDF holds the GIL while parsing, so threads would not help:
+# each worker process opens the PDF and extracts one page range.
+# ------------------------------------------------------------
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(os.cpu_count() or 1)))
+MIN_PAGES_PER_TASK = int(os.getenv("PDF_MIN_PAGES_PER_TASK", "16"))
+
+_pool = None
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        # 'spawn' avoids forking a process that already runs threads (uvicorn)
+        _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def spool_to_disk(file_obj, hasher=None, directory=None) -> str:
+    """
+    Copy an upload to a temp .pdf file chunk by chunk; returns its path.
+    `hasher` (e.g. hashlib.sha256()) is fed the same chunks on the way.
+    """
+    limit = MAX_UPLOAD_MB * 1024 * 1024
+    written = 0
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix=".pdf", dir=directory or SPOOL_DIR)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = file_obj.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > limit:
+                    raise HTTPException(status_code=413, detail=f"PDF is larger than {MAX_UPLOAD_MB} MB.")
+                out.write(chunk)
+                if hasher is not None:
+                    hasher.update(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
+
+
+@contextlib.contextmanager
+def spooled_pdf(file_obj):
+    """`with spooled_pdf(upload.file) as path:` - the temp file is removed afterwards."""
+    path = spool_to_disk(file_obj)
+    try:
+        yield path
+    finally:
+        with contextlib.suppress(OSError):
+            os.unlink(path)
+
+
+def _open_pdf(path):
+    pdf = fitz.open(path, filetype="pdf")
+    # Handle Password Protection (Try empty password)
+    if pdf.is_encrypted:
+        pdf.authenticate("")
+    return pdf
+
+
+def _page_count(path) -> int:
+    with _open_pdf(path) as pdf:
+        return pdf.page_count
+
+
+def _extract_pages(path, indexes=None):
+    """Worker entry point: text of the given pages (0-based; None = all), in order."""
+    with _open_pdf(path) as pdf:
+        indexes = range(pdf.page_count) if indexes is None else indexes
+        return [pdf[i].get_text("text", sort=True) for i in indexes]
+
+
+def _page_keys(path):
+    """Extraction-cache key of every page (cheap: no text layout)."""
+    with _open_pdf(path) as pdf:
+        return [page_key(page) for page in pdf]
+
+
+def split_ranges(page_count: int, workers: int, min_pages: int = MIN_PAGES_PER_TASK):
+    """Contiguous [start, stop) page ranges, one per worker, never smaller than min_pages."""
+    tasks = max(1, min(workers, page_count // max(min_pages, 1)))
+    size, extra = divmod(page_count, tasks)
+    ranges, start = [], 0
+    for n in range(tasks):
+        stop = start + size + (1 if n < extra else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+def _check_pages(pages):
+    # Check for "Scanned PDF" (Image-based)
+    if not any(text.strip() for text in pages):
+        raise HTTPException(
+            status_code=400, 
+            detail="No text found. This PDF might be scanned/image-based. Please upload a selectable text PDF."
+        )
+    return pages
+
+
+def _clean(pages):
+    """Strip headers/footers/page numbers and layout whitespace before prompting."""
+    pages, stats = clean_pages(pages)
+    # Totals are served by /api/pdf/stats
+    # print(f"🧹 PDF cleanup: saved {stats.chars_saved} chars (~{stats.tokens_saved} tokens)")
+    return pages
+
+
+async def parse_pages(path, workers: int = None, pool=None, indexes=None, on_progress=None):
+    """
+    Split the pages (all, or only `indexes`) into contiguous runs, parse
+    them in `pool` and reassemble in order. on_progress(done, total) is
+    called as each run finishes.
+    """
+    loop = asyncio.get_running_loop()
+    pool = pool or get_pool()
+    workers = workers or PDF_WORKERS
+    # Every parse runs in the pool: a thread would still hold the GIL
+    if indexes is None and workers > 1:
+        indexes = range(await loop.run_in_executor(pool, _page_count, path))
+    if indexes is not None:
+        indexes = list(indexes)
+
+    ranges = [None] if indexes is None else split_ranges(len(indexes), workers)
+    if len(ranges) == 1:
+        # One worker or a small PDF: a single task, no split
+        pages = await loop.run_in_executor(pool, _extract_pages, path, indexes)
+        if on_progress:
+            on_progress(len(pages), len(pages))
+        return pages
+
+    done = 0
+
+    async def run(start, stop):
+        nonlocal done
+        part = await loop.run_in_executor(pool, _extract_pages, path, indexes[start:stop])
+        done += len(part)
+        if on_progress:
+            on_progress(done, len(indexes))
+        return part
+
+    parts = await asyncio.gather(*(run(start, stop) for start, stop in ranges))
+    return [text for part in parts for text in part]
+
+
+async def parse_pages_cached(path, digest, on_progress=None):
+    """
+    parse_pages through the extraction cache: a known file is served
+    whole; otherwise only pages with an unseen page key are parsed.
+    """
+    loop = asyncio.get_running_loop()
+    pages = await loop.run_in_executor(None, extraction_cache.get_document, digest)
+    if pages is not None:
+        if on_progress:
+            on_progress(len(pages), len(pages))
+        return pages
+
+    keys = await loop.run_in_executor(get_pool(), _page_keys, path)
+    pages = await loop.run_in_executor(None, extraction_cache.get_pages, keys)
+    missing = [i for i, text in enumerate(pages) if text is None]
+    cached = len(pages) - len(missing)
+
+    def report(done, _):
+        if on_progress:
+            on_progress(cached + done, len(pages))
+
+    report(0, 0)
+    if missing:
+        for i, text in zip(missing, await parse_pages(path, indexes=missing, on_progress=report)):
+            pages[i] = text
+
+    await loop.run_in_executor(None, extraction_cache.put_document, digest, keys, pages)
+    return pages
+
+
+async def spool_upload(file_obj, directory=None):
+    """Spool an upload to disk off the event loop; returns (path, sha256 hex)."""
+    hasher = hashlib.sha256()
+    with stage("upload"):
+        path = await asyncio.to_thread(spool_to_disk, file_obj, hasher, directory)
+    return path, hasher.hexdigest()
+
+
+async def extract_pages_from_path(path, digest, on_progress=None):
+    """Cached, page-parallel extraction + cleanup of a spooled PDF."""
     try:
-        # 1. Read file bytes
-        file_bytes = file_obj.read()
-        
-        # 2. Open PDF from memory
-        with fitz.open(stream=file_bytes, filetype="pdf") as pdf:
-            
-            # 3. Handle Password Protection (Try empty password)
-            if pdf.is_encrypted:
-                pdf.authenticate("") 
-            
-            full_text = []
-
-            # 4. Iterate through pages
-            for page in pdf:
-                # 'sort=True' helps read text in natural reading order (columns/layouts)
-                text = page.get_text("text", sort=True)
-                
-                if text.strip():
-                    full_text.append(text)
-
-        # 5. Join pages with separation
-        final_output = "\n\n".join(full_text)
-
-        # 6. Check for "Scanned PDF" (Image-based)
-        if not final_output.strip():
-            raise HTTPException(
-                status_code=400, 
-                detail="No text found. This PDF might be scanned/image-based. Please upload a selectable text PDF."
-            )
-
-        return final_output.strip()
+        with stage("extract"):
+            pages = await parse_pages_cached(path, digest, on_progress)
+            return _clean(_check_pages(pages))
 
     except HTTPException as he:
-        # Re-raise HTTP exceptions (like the scanned PDF warning above)
         raise he
     except Exception as e:
         print(f"❌ PDF Extraction Error: {str(e)}")
-        raise HTTPException(status_code=400, detail="Failed to read PDF file. It may be corrupted.")
\ No newline at end of file
+        raise HTTPException(status_code=400, detail="Failed to read PDF file. It may be corrupted.")
+
+
+async def extract_pages_async(file_obj):
+    """
+    Returns the cleaned text of every page, in order (index 0 = page 1);
+    empty pages are kept as "" so page numbers stay aligned. The upload
+    is spooled to disk (and hashed), looked up in the extraction cache,
+    and any pages not cached are parsed in the process pool, so the
+    event loop stays free.
+    """
+    path, digest = await spool_upload(file_obj)
+    try:
+        return await extract_pages_from_path(path, digest)
+    finally:
+        with contextlib.suppress(OSError):
+            os.unlink(path)
+
@@ -0,0 +1,117 @@
+# ================================================================
+#  LEXICAL RETRIEVAL (BM25)
+#  Pure-Python passage index so QnA only sends the passages that
+#  matter for a question. No embeddings service needed.
+# ================================================================
+
+import hashlib
+import math
+import os
+import re
+from collections import Counter, defaultdict
+
+from services.cache import TTLCache
+from services.chunking import chunk_pages, split_pages
+
+PASSAGE_TOKENS = int(os.getenv("RETRIEVAL_PASSAGE_TOKENS", "300"))
+
+STOPWORDS = frozenset("""
+a an and are as at be been but by can did do does for from had has have how i if in into is it its
+of on or so that the their them then there these they this to was were what when where which who
+why will with would you your
+""".split())
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str):
+    return [w for w in WORD_RE.findall(text.lower()) if w not in STOPWORDS and len(w) > 1]
+
+
+class BM25Index:
+    """Okapi BM25 over a list of chunks, with an inverted index for sparse scoring."""
+
+    def __init__(self, chunks, k1: float = 1.5, b: float = 0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(list)  # term -> [(chunk_idx, tf)]
+        self.lengths = []
+
+        for idx, chunk in enumerate(chunks):
+            terms = tokenize(chunk.text)
+            self.lengths.append(len(terms))
+            for term, tf in Counter(terms).items():
+                self.postings[term].append((idx, tf))
+
+        n = len(chunks)
+        self.avgdl = (sum(self.lengths) / n) if n else 0.0
+        self.idf = {
+            term: math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+            for term, plist in self.postings.items()
+        }
+
+    def search(self, query: str, k: int = 5):
+        """Return up to k (score, chunk) pairs, best first."""
+        scores = defaultdict(float)
+        k1, b, avgdl = self.k1, self.b, self.avgdl or 1.0
+
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for idx, tf in self.postings[term]:
+                norm = k1 * (1 - b + b * self.lengths[idx] / avgdl)
+                scores[idx] += idf * tf * (k1 + 1) / (tf + norm)
+
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(score, self.chunks[idx]) for idx, score in best]
+
+
+# ================================================================
+#  INDEX CACHE (built once per document hash, LRU + TTL eviction)
+# ================================================================
+index_cache = TTLCache(
+    max_size=int(os.getenv("RETRIEVAL_INDEX_CACHE_SIZE", "32")),
+    ttl=float(os.getenv("RETRIEVAL_INDEX_CACHE_TTL", "3600")),
+)
+
+
+def document_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def build_index(pages) -> BM25Index:
+    return BM25Index(chunk_pages(pages, max_tokens=PASSAGE_TOKENS))
+
+
+def get_index(text: str) -> BM25Index:
+    key = document_hash(text)
+    index = index_cache.get(key)
+    if index is None:
+        index = build_index(split_pages(text))
+        index_cache.set(key, index)
+    return index
+
+
+def locate_evidence(evidence: str, passages):
+    """
+    Map the model's evidence quote back to one of the passages it was shown.
+    Returns (chunk, char position of the quote inside the chunk or None).
+    """
+    if not passages:
+        return None, None
+
+    words = evidence.split()
+    if words:
+        # Whitespace-insensitive exact match, so offsets point into the raw chunk text
+        pattern = re.compile(r"\s+".join(map(re.escape, words)), re.IGNORECASE)
+        for chunk in passages:
+            match = pattern.search(chunk.text)
+            if match:
+                return chunk, match.start()
+
+    # Paraphrased quote: fall back to the passage with the best term overlap
+    wanted = set(tokenize(evidence))
+    best = max(passages, key=lambda c: len(wanted.intersection(tokenize(c.text))))
+    return best, None
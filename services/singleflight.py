@@ -0,0 +1,42 @@
+# ================================================================
+#  SINGLE-FLIGHT REQUEST COALESCING
+#  Concurrent callers with the same key share one execution: the
+#  first caller starts it, the rest await the same result.
+# ================================================================
+
+import asyncio
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls = {}  # key -> asyncio.Task
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key, factory):
+        """Run `await factory()` once per key at a time; duplicates share its result."""
+        task = self._calls.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.leaders += 1
+            # A task (not the caller's coroutine) so one client disconnecting
+            # does not cancel the work everyone else is waiting for
+            task = asyncio.ensure_future(factory())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._finished(key, t))
+
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved even if every waiter went away
+
+    def stats(self):
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+        }
@@ -0,0 +1,158 @@
+# ================================================================
+#  PDF TEXT CLEANUP
+#  Strips page furniture (running headers, footers, page numbers)
+#  and layout whitespace before text reaches a prompt:
+#  - lines repeated at the top/bottom of many pages are dropped; on
+#    the outermost line digits are masked so "Page 3 of 40" matches
+#    "Page 4 of 40" (but "Lecture 3" under a header is kept);
+#  - page labels ("Page 3", "3 of 40", "- 3 -") near page edges are
+#    dropped; a bare number or roman numeral only on the outermost
+#    line, since "1945" or "I" inside the text is content;
+#  - words hyphenated across a line break are re-joined;
+#  - runs of spaces and blank lines are collapsed.
+#  Everything is a single pass over the lines plus one Counter, so
+#  the cost is linear in the document size.
+# ================================================================
+
+import re
+from collections import Counter
+
+from services.chunking import CHARS_PER_TOKEN
+
+# Only the first/last few non-empty lines of a page can be furniture
+EDGE_LINES = 3
+
+# A line is furniture if it sits on a page edge on at least this share
+# of pages (and on at least MIN_REPEATS pages); 0.4 still catches
+# headers that alternate between odd and even pages
+REPEAT_RATIO = 0.4
+MIN_REPEATS = 3
+
+DIGITS_RE = re.compile(r"\d+")
+ROMAN = r"(?=[ivxlc])c{0,3}(?:xc|xl|l?x{0,3})(?:ix|iv|v?i{0,3})"
+# Labelled page numbers: dropped anywhere in the edge lines
+PAGE_LABEL_RE = re.compile(
+    rf"^page\s*(?:\d{{1,4}}|{ROMAN})(?:\s*(?:of|/)\s*\d{{1,4}})?$"
+    r"|^\d{1,4}\s*(?:of|/)\s*\d{1,4}$"
+    r"|^[-–—]\s*\d{1,4}\s*[-–—]$",
+    re.IGNORECASE,
+)
+# Bare page numbers: only on the outermost line of a page
+BARE_PAGE_NUMBER_RE = re.compile(rf"^(?:\d{{1,4}}|{ROMAN})$", re.IGNORECASE)
+HYPHEN_BREAK_RE = re.compile(r"([a-z])-\n[ \t]*([a-z])")
+SPACES_RE = re.compile(r"[ \t ]+")
+BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+
+class CleanupStats:
+    __slots__ = ("chars_before", "chars_after", "furniture_lines", "page_numbers", "dehyphenated")
+
+    def __init__(self):
+        self.chars_before = 0
+        self.chars_after = 0
+        self.furniture_lines = 0
+        self.page_numbers = 0
+        self.dehyphenated = 0
+
+    @property
+    def chars_saved(self) -> int:
+        return self.chars_before - self.chars_after
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.chars_saved // CHARS_PER_TOKEN
+
+    def add(self, other):
+        for name in self.__slots__:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    def to_dict(self):
+        return {
+            "chars_before": self.chars_before,
+            "chars_after": self.chars_after,
+            "chars_saved": self.chars_saved,
+            "tokens_saved": self.tokens_saved,
+            "furniture_lines": self.furniture_lines,
+            "page_numbers": self.page_numbers,
+            "dehyphenated": self.dehyphenated,
+        }
+
+
+# Running totals across every cleaned document (served by /api/pdf/stats)
+cleanup_totals = CleanupStats()
+
+
+def line_key(line: str) -> str:
+    """Comparison key for furniture detection: case and spacing folded."""
+    return " ".join(line.split()).lower()
+
+
+def masked_key(key: str) -> str:
+    """line_key with digits masked; prefixed so it never collides with a plain key."""
+    return "#:" + DIGITS_RE.sub("#", key)
+
+
+def _edges(lines):
+    """(edge, outermost): indexes of the first/last EDGE_LINES and first/last non-empty lines."""
+    filled = [i for i, line in enumerate(lines) if line.strip()]
+    if not filled:
+        return set(), set()
+    return set(filled[:EDGE_LINES]) | set(filled[-EDGE_LINES:]), {filled[0], filled[-1]}
+
+
+def _keys(lines, i, outermost):
+    key = line_key(lines[i])
+    return (key, masked_key(key)) if i in outermost else (key,)
+
+
+def find_furniture(page_lines) -> set:
+    """Keys of edge lines that repeat on enough pages to be headers/footers."""
+    if len(page_lines) < MIN_REPEATS:
+        return set()
+    counts = Counter()
+    for lines in page_lines:
+        edge, outermost = _edges(lines)
+        # A set per page: a key counts once per page
+        counts.update({key for i in edge for key in _keys(lines, i, outermost)})
+    threshold = max(MIN_REPEATS, REPEAT_RATIO * len(page_lines))
+    return {key for key, n in counts.items() if n >= threshold and key not in ("", "#:")}
+
+
+def normalize_whitespace(text: str) -> str:
+    lines = [SPACES_RE.sub(" ", line).strip() for line in text.split("\n")]
+    return BLANK_LINES_RE.sub("\n\n", "\n".join(lines)).strip()
+
+
+def clean_pages(pages):
+    """
+    Return (cleaned_pages, CleanupStats). Page count and order are kept
+    (empty pages stay "") so page numbers still line up.
+    """
+    stats = CleanupStats()
+    page_lines = [page.split("\n") for page in pages]
+    furniture = find_furniture(page_lines)
+
+    cleaned = []
+    for page, lines in zip(pages, page_lines):
+        stats.chars_before += len(page)
+        edge, outermost = _edges(lines)
+        kept = []
+        for i, line in enumerate(lines):
+            if i in edge:
+                stripped = line.strip()
+                if PAGE_LABEL_RE.match(stripped) or (i in outermost and BARE_PAGE_NUMBER_RE.match(stripped)):
+                    stats.page_numbers += 1
+                    continue
+                if furniture and any(key in furniture for key in _keys(lines, i, outermost)):
+                    stats.furniture_lines += 1
+                    continue
+            kept.append(line)
+
+        text = normalize_whitespace("\n".join(kept))
+        text, joined = HYPHEN_BREAK_RE.subn(r"\1\2", text)
+        stats.dehyphenated += joined
+        stats.chars_after += len(text)
+        cleaned.append(text)
+
+    cleanup_totals.add(stats)
+    return cleaned, stats